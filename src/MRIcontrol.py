@@ -50,10 +50,29 @@ from MRIcontrolGui import Ui_MRIcontrol     #Main PyQT GUI for this application
 from numpy import NaN
 from TNMRmri import TNMR       #contains code to control TNMR software from Python
 from TNMRviewer import TNMRviewer #Class to display images from unpacked .tnt files
+from processTNT import TNTfile      #reads .tnt files, DATA is memory mapped
+from utils import interleaved_to_complex
 from ps5000aMRI import pico5000MRI      #create py picoscope
 import pyvisa       #Labview code to control other instruments including scopes, chillers, etc
 import lmfit        #Used for nonlinear least squares fitting
 import  dampedSin, multiExp  #fitting modules for NMR data based on  lmfit
+import fftBackend       #scipy.fft/pyFFTW/numpy FFTs selected by PYMRI_FFT_BACKEND
+import reconTNT     #shared scout reconstruction
+from dataViews import DataViewCache     #memoized spectra and mag/phase/real/imag traces for plotData
+import peakAnalysis     #vectorized F0, FWHM, integral and SNR of spectra
+import baseline     #polynomial baseline fit and in place subtraction for all FIDs
+from eccScan import ECCScan, AdaptiveScan, ScanAborted, analyzeFID, evaluationBudget       #parameter scans with acquisition overlapped with analysis, adaptive optimum search
+from recipeEngine import RecipeEngine, RecipeError, Delay, Until, runBlocking       #event driven recipe execution
+import recipePlanner        #recipe time estimates and reordering by temperature
+from recipeCompiler import compileRecipe        #static validation of recipes
+from protocolCache import ProtocolCache, tableArray, rfShapeAnalysis      #protocol templates read once, memoized derived values
+from mricore import Protocol, gradients, slices, diffusion, rf      #pulse sequence physics without Qt
+from mricore.protocol import timingArray, echoDelays, inversionDelays, formatTable
+import mricore.constants
+from timeSeries import TimeSeries       #ring buffer store and log for the monitor data
+import instrumentWorkers        #pyvisa instruments polled on worker threads, the GUI reads cached values
+import simInstruments       #simulated chiller and thermometer, PYMRI_SIMULATE_INSTRUMENTS=1
+import temperatureControl       #model based chiller setpoint control
 #from pyasn1_modules.rfc3852 import AttributeCertificateInfoV1
 
 
@@ -74,8 +93,8 @@ class MRIcontrol(QMainWindow):
     self.GammaPMHzperT=constants.physical_constants["proton gyromag. ratio over 2 pi"][0]   #in MHz/T 
     self.GammaPHzperT=1E6*constants.physical_constants["proton gyromag. ratio over 2 pi"][0]   #in Hz/T 
     self.GammaWaterProtonRadperT=constants.physical_constants["proton gyromag. ratio"][0]*(1-constants.physical_constants["proton mag. shielding correction"][0])                                                                                
-    self.Gamma=self.GammaWaterProtonRadperT
-    self.Gammaf=self.Gamma/2/np.pi
+    self.Gamma=mricore.constants.gamma
+    self.Gammaf=mricore.constants.gammaf
     self.TrueOrFalse=['True', 'False']
     self.ONorOFF=['ON', 'OFF']
 #************Shim parameters*****************    
@@ -94,8 +113,13 @@ class MRIcontrol(QMainWindow):
     self.ShimLockorFid = 1
     self.ShimStep = 100
     self.maxTecmagDACcount=2**15-4000        #maximum DAC count for tecmag receive channel, if signal is above this level it can be saturated. Currently set at 28768
+    self.TNMRdataType=np.complex64      #dtype of data fetched from TNMR, complex64 holds summed DAC counts exactly up to 2**24
+    self.readSavedTNTData=True      #after an autoSave in RunTNMRfile read the saved .tnt into self.tntData instead of a COM transfer, the file is not kept mapped
+    self.dataViews=DataViewCache()      #FFTs and traces of the plotted data, reused when the slice, phase, parameter or phase correction changes
     self.blRegionStart=0.9       #region of spectra used to calculate baseline, assumes all data beyond self.blRegionStart and below self.blRegionStart should be zero!!
     self.blRegionStop=0.99# we do not look at last data points in TechMag FIDs because they are arbitrarily set to 0
+    self.baselineOrder=0        #0=DC offset, 1=linear, 2=quadratic baseline
+    self.TechMagEndZeros=None       #number of points TecMag zeros at the end of each FID, None finds them from the data
     self.subtractFIDBackground=True 
 #******B0 compensation and Gradient PreEmphasis labels, mirrors values
     self.B0CompLabels={'DC.bx':self.ui.leDCbx, 'A0.bx':self.ui.leA0bx, 'A1.bx':self.ui.leA1bx,'A2.bx':self.ui.leA2bx,'A3.bx':self.ui.leA3bx,'A4.bx':self.ui.leA4bx, 'A5.bx':self.ui.leA5bx,'T1.bx':self.ui.leT1bx,'T2.bx':self.ui.leT2bx,'T3.bx':self.ui.leT3bx,'T4.bx':self.ui.leT4bx,'T5.bx':self.ui.leT5bx,\
@@ -231,6 +255,8 @@ class MRIcontrol(QMainWindow):
     self.closeActiveFile=True       #flag to close TNMR active file before opening a new one
     self.recipeRunning=False        #flag to indicate if recipe (queue) is running
     self.recipeAbort=False          #flag to stop/ abort current TNMR pulse sequence and recipe
+    self.recipeEngine=None          #RecipeEngine of the running or last recipe
+    self.recipeTickInterval=0.2     #interval(s) at which the recipe engine checks waits and starts steps
     self.TNMRjustFinished=False     #flag to indicate that the pulse sequence just finished
     self.TNMRbusyOld=False          #State of TNMR on previous inquiry
     self.UpdateBeforeRun=True       #flag to update pulse sequence before running
@@ -238,6 +264,7 @@ class MRIcontrol(QMainWindow):
     
     #File address for Basic sequence templates
     self.templateDirectory='C:\TNMR\data\StandardPulseSequences'
+    self.protocolCache=None     #ProtocolCache of the protocol templates, read once at startup, see openProtocol
 
     #Menu Actions
     #File
@@ -297,6 +324,7 @@ class MRIcontrol(QMainWindow):
     self.ui.pbClearRecipe.clicked.connect(self.clearRecipe)
     self.ui.pbAddFileToRecipe.clicked.connect(self.addFileToRecipe)
     self.ui.cbAddRecipeCommand.activated.connect(self.addRecipeCommand)
+    self.ui.cbAddRecipeCommand.addItem('Optimize Recipe Order')     #reorders recipe by temperature, see recipePlanner
     self.ui.pbGenerateSlices.clicked.connect(self.generateSlices)
     self.ui.pbGenerateTIarray.clicked.connect(self.generateTIarray)
     self.ui.pbGenerateTEarray.clicked.connect(self.generateTEarray)
@@ -455,12 +483,17 @@ class MRIcontrol(QMainWindow):
     self.TRarrayTypes=['Linear', 'PowerLaw']
     self.b_ValueArrayTypes=['Quadratic', 'Linear'] #, 'PowerLaw']
     
-    self.rm= pyvisa.ResourceManager('C:/windows/system32/visa64.dll')       #Use NI pyvisa to control all USB and RS232 instruments
+    if simInstruments.simulationEnabled():
+        self.rm=simInstruments.resourceManager()        #simulated PolyScience and Opsens with a thermal model
+    else:
+        self.rm= pyvisa.ResourceManager('C:/windows/system32/visa64.dll')       #Use NI pyvisa to control all USB and RS232 instruments
     self.ChillerOffsetTemperature=16
     self.ChillerOffsetSlope=0.125
     self.temperatureStableRange=4.0       #Maximum Temperature deviation from setpoint to temperature stable flag 
     self.temperatureStable=False
     self.temperatureSlope=0.001     #current temperature variation in degrees C per s
+    self.temperatureModel=recipePlanner.TemperatureModel()      #temperature ramp rate and settle time for recipe time estimates, fitted to the monitor data
+    self.shimDuration=600       #duration(s) of the last shim, used for recipe time estimates
     self.alphaAv=0.1    #running average weighting factor
     self.Tsp=20     #Chiller tmeperature setpoint
     self.ChillerMaxT=60     #chiller maximum temperature setpoint
@@ -471,14 +504,19 @@ class MRIcontrol(QMainWindow):
     self.TemperatureAverageFraction=0.01    #averages temperature change with ~1/self.TemperatureAverageFraction previous measurments to determin rate of change of temperature
     self.temperatureIntegralCoeff=0.001     #integral term for temperature control
     self.TcontrolErrorGain=2                #tmeprature error control gain, temperature setpoint= desiredTempperature-error*self.TcontrolErrorGain
+    self.chillerSetpointMargin=0.1      #controller setpoints stay this far inside the chiller limits
+    self.temperatureController=temperatureControl.TemperatureController(uMin=self.ChillerMinT+self.chillerSetpointMargin, uMax=self.ChillerMaxT-self.chillerSetpointMargin)     #feed-forward, overdrive and PI on a model fitted to the monitor data
+    self.controlInterval=10     #update the chiller setpoint every n updateIntervals when controlling temperature
+    self.instrumentCache=instrumentWorkers.ReadingCache()       #latest readings published by the instrument workers
+    self.instrumentWorkers=[]
+    self.readingMaxAge=10       #readings older than this(s) are reported as nan
+    self.instrumentPollInterval=1.0     #interval(s) at which the workers read the instruments
      
     try:        #open fiberoptic thermometer control
       self.Opsensport='COM10'
       self.OpsensVisaAddress='ASRL10::INSTR'
       self.OpsensBaudRate=9600
-      self.Opsens = self.rm.open_resource(self.OpsensVisaAddress, baud_rate=self.OpsensBaudRate)
-      self.Opsens.read_termination = '\n' 
-      self.Opsens.write_termination = '\r'
+      self.Opsens = instrumentWorkers.openOpsens(self.rm, self.OpsensVisaAddress, self.OpsensBaudRate)
       self.OpsensIDN=self.Opsens.query('*IDN?')
       self.message("<b>Opsens connected: </b>" +self.OpsensIDN)
       #self.Opsens.write('(2):enab')
@@ -489,7 +527,14 @@ class MRIcontrol(QMainWindow):
       self.Opsens.read()
       self.message("Opsens diagnostic Ch02:{}, {}, {}, {}, {} ".format(self.Opsens.read(),self.Opsens.read(),self.Opsens.read(),self.Opsens.read(),self.Opsens.read()))
       self.opsensConnected=True
-      self.opsensTemperature=float(self.readOpsensTemp())
+      try:
+          self.opsensTemperature=instrumentWorkers.readOpsensTemperature(self.Opsens)
+      except:
+          self.opsensTemperature=np.nan
+      self.OpsensWorker=instrumentWorkers.InstrumentWorker('Opsens', lambda: instrumentWorkers.openOpsens(self.rm, self.OpsensVisaAddress, self.OpsensBaudRate),
+                                                           instrumentWorkers.opsensPolls, self.instrumentCache, interval=self.instrumentPollInterval, resource=self.Opsens)
+      self.instrumentWorkers.append(self.OpsensWorker)      #from here on the worker thread owns self.Opsens
+      self.OpsensWorker.start()
       self.opsensTemperatureAv=self.opsensTemperature
       self.ui.cbMonitorTemperatures.setChecked(True)
     except:
@@ -503,14 +548,16 @@ class MRIcontrol(QMainWindow):
     self.PSTemperature=np.nan
     self.monitorPolyscience=False       #flag to determin if Polyscinece chiller is monitored
     try:
-      self.PS = self.rm.open_resource(self.PSport, baud_rate=self.PSBaudRate)
-      self.PS.read_termination = '\r' 
-      self.PS.write_termination = '\r'
+      self.PS = instrumentWorkers.openPolyScience(self.rm, self.PSport, self.PSBaudRate)
       self.PSfault=self.PS.query('RF')
       self.PSpumpspeed=self.PS.query('RM')
       self.PSoperating=self.PS.query('RO')
       self.message('PolyScience connected: operating={}, pumpspeed={}, fault={} '.format(self.PSoperating, self.PSpumpspeed,self.PSfault), bold=True)
       self.polycienceConnected=True
+      self.PSWorker=instrumentWorkers.InstrumentWorker('PolyScience', lambda: instrumentWorkers.openPolyScience(self.rm, self.PSport, self.PSBaudRate),
+                                                       instrumentWorkers.polySciencePolls, self.instrumentCache, interval=self.instrumentPollInterval, resource=self.PS)
+      self.instrumentWorkers.append(self.PSWorker)      #from here on the worker thread owns self.PS
+      self.PSWorker.start()
     except:
       self.message('Cannot open PolyScience')
       self.polycienceConnected=False
@@ -518,12 +565,13 @@ class MRIcontrol(QMainWindow):
       #raise
     #monitor array
     self.nDataArrayPoints=6     #number of columns in the recipe data array
-    self.dataArray=np.zeros((1,self.nDataArrayPoints))  #2d array containing [self.relTime, self.currentRecipeStep, self.Tsample, self.N2Flow, self.HeaterOutput])
+    self.monitorMaxRows=7*24*3600     #monitor data kept in memory, a week at 1 update per s, older rows are only in the log
+    self.monitorData=TimeSeries(['relTime', 'recipeStep', 'PSsetpoint', 'PSTemperature', 'opsensTemperature', 'TNMRbusy'], maxRows=self.monitorMaxRows)  #one row per monitor update
     self.dataHeader='[self.relTime, self.currentRecipeStep, self.PSsetpoint, , self.PSTemperature, self.opsensTemperature, self.TNMRbusy])'   #Header for recipe data array that is used for plots and is saved
     self.dataPlot=plotWindow(self)
     self.dataPlot.dplot.setLabel('bottom', "Time (s)") #**self.labelStyle)
     self.dataPlot.dplot.setLabel('left', "Temperature(C)") #, **self.labelStyle) 
-    self.arrayUpdateInterval=30 #update system data array every n updateIntervals
+    self.arrayUpdateInterval=30 #update monitor data plot every n updateIntervals, the monitor data itself is stored every update
     self.nUpdates = 1 #number of system updates, used to determine when to save array data and output to logfile
     self.currentRecipeStep=0
     self.sampleTemperature=20       #current sample temperature as read by sample thermometer
@@ -545,6 +593,11 @@ class MRIcontrol(QMainWindow):
     self.startTime = time.time()        #start time for recipe
     self.picoscopeIsOpen=False #flag to indicate picoscope is open
     self.ui.txtRecipe.append('# <b>MRIControl Recipe: </b>' + time.strftime("%c"))
+    try:
+        self.protocolCache=ProtocolCache(self.TNMR, self.templateDirectory, self.protocolList)
+        QTimer.singleShot(0, self.preloadProtocols)      #after the GUI is shown
+    except Exception:
+        self.message('Cannot cache protocol templates', color='red')
     self.ProtocolName='none'
     self.setupProtocol()
     
@@ -604,7 +657,7 @@ class MRIcontrol(QMainWindow):
             self.capturePicoscope()
         if self.shimmingInProgress:
             try:
-                shimUnits=self.TNMR.currentFile.GetNMRParameter('Shim Units')
+                shimUnits=self.TNMR.getNMRParameter('Shim Units')
                 if len(self.ShimUnits)<6:       #first 6 shim units are from previous data, so zero them
                     shimUnits=0
                 self.ShimUnits.append(int(shimUnits))
@@ -614,13 +667,13 @@ class MRIcontrol(QMainWindow):
             except:
                 pass
         self.ui.progressbarTNMR.setValue(int(100*self.TNMRRunTime/self.expectedRunTime))
-        actualScans1D = int(self.TNMR.currentFile.GetNMRParameter("Actual Scans 1D"))
-        actualPoints2D = int(self.TNMR.currentFile.GetNMRParameter("Actual Points 2D"))
-        actualPoints3D = int(self.TNMR.currentFile.GetNMRParameter("Actual Points 3D"))
-        actualPoints4D = int(self.TNMR.currentFile.GetNMRParameter("Actual Points 4D"))
-        self.TNMR.finishTime=self.TNMR.currentFile.GetNMRParameter('Exp. Finish Time')
+        actualScans1D = int(self.TNMR.getNMRParameter("Actual Scans 1D"))
+        actualPoints2D = int(self.TNMR.getNMRParameter("Actual Points 2D"))
+        actualPoints3D = int(self.TNMR.getNMRParameter("Actual Points 3D"))
+        actualPoints4D = int(self.TNMR.getNMRParameter("Actual Points 4D"))
+        self.TNMR.finishTime=self.TNMR.getNMRParameter('Exp. Finish Time')
         self.ui.leFinishTime.setText('{}'.format(self.TNMR.finishTime))
-        self.remainingTime=self.TNMR.currentFile.GetSequenceTime-self.TNMRRunTime
+        self.remainingTime=self.TNMR.getSequenceTime()-self.TNMRRunTime
         self.ui.leTimeRemaining.setText(str(timedelta(seconds=round(self.remainingTime))))
         self.ui.leActual_npts.setText('{},{},{},{}'.format(actualScans1D,actualPoints2D,actualPoints3D,actualPoints4D))
       if self.TNMRjustFinished:
@@ -640,18 +693,17 @@ class MRIcontrol(QMainWindow):
             self.dataPlot.show()
       else:
             self.dataPlot.hide()
-      if self.nUpdates==1:  #on first update reset dataArray
-          self.dataArray=np.zeros((1,self.nDataArrayPoints))
-          self.dataArray[0,:]=newdata
+      if self.nUpdates==1:  #on first update reset monitor data
+          self.monitorData.clear()
+      self.monitorData.append(newdata)
       if (self.nUpdates % self.arrayUpdateInterval)==0:
-        i=int(self.nUpdates/self.arrayUpdateInterval)
-        self.dataArray=np.vstack((self.dataArray, newdata))
-        self.dataPlot.plotData(self.dataArray)
-        if self.ui.rbControlTemperature.isChecked():
+        self.dataPlot.plotData(self.monitorData)
+      if (self.nUpdates % self.controlInterval)==0 and self.ui.rbControlTemperature.isChecked() and np.isfinite(self.opsensTemperature):
             self.desiredChillerSetpoint=self.calculateDesiredChillerSetPoint()
-            if np.absolute(self.PSsetpoint-self.desiredChillerSetpoint)>=0.1 and np.absolute(self.opsensTemperature-self.opsensTemperatureAv)<1:        #if the deisred setpoint deviates from the one that is set by more than 0.1C, change the setpoint, also make sure the current temp is close to the average temp
+            if np.absolute(self.PSsetpoint-self.desiredChillerSetpoint)>=0.05:        #if the desired setpoint deviates from the one that is set, change the setpoint
                 self.setPSsetpoint(tsp=self.desiredChillerSetpoint)
-                self.message('Changing Chiller Temperature Setpoint to {:.2f}C'.format(self.desiredChillerSetpoint))
+                if np.absolute(self.PSsetpoint-self.desiredChillerSetpoint)>=1:       #report large changes only, PI corrections are frequent
+                    self.message('Changing Chiller Temperature Setpoint to {:.2f}C'.format(self.desiredChillerSetpoint))
       self.nUpdates+=1      #number of updates, reset when recipes start
 #****************Code to control TNMR console**********************************    
 
@@ -659,20 +711,34 @@ class MRIcontrol(QMainWindow):
       self.TNMR.openConsole()
       self.message('TNMR console opened:', bold=True, ctime=True, color='green')
 
+  def preloadProtocols(self):
+      '''reads the protocol templates into the protocol cache, each template is closed in TNMR after it is read'''
+      try:
+          self.protocolCache.preload(message=self.message)
+      except Exception:
+          self.message('Cannot cache protocol templates', color='red')
+
   def openProtocol(self):
       '''action when user changes comboBox protocol: opens standard pulse sequence in the self.templateDirectory directory'''
       self.ProtocolName=self.ui.cbProtocol.currentText()
       if self.ProtocolName != 'none':
             pfile=self.templateDirectory + '\\' + self.ProtocolName + '.tnt'
-            self.openTNMRfile(file=pfile)
+            template=None
+            closeFirst=self.closeActiveFile
+            if self.protocolCache is not None:      #only parameters that differ from the cached template are sent to TNMR
+                template=self.protocolCache.select(self.ProtocolName, close=self.closeActiveFile)
+                closeFirst=False        #select has closed the active file if needed
+            self.openTNMRfile(file=pfile if template is None else template.fileName, template=template, closeFirst=closeFirst)
       else:
           self.setupProtocol()      #sets up the 'none' protocol
                 
-  def openTNMRfile(self, file=''):
-    '''Main routine to open and upack a .tnt file into TNMR and upack pulse sequence paarmeters, will close existing active file is self.closeActiveFile flag is set'''
+  def openTNMRfile(self, file='', template=None, closeFirst=None):
+    '''Main routine to open and upack a .tnt file into TNMR and upack pulse sequence paarmeters, will close existing active file is self.closeActiveFile flag is set
+    (closeFirst overrides the flag), template is the protocolCache.ProtocolTemplate of file already selected into TNMR, its data is memory mapped from the template file'''
     self.message(str(file))
     '''Load .tnt file into TNMR and unpack pulse sequence parameters'''
-    if self.closeActiveFile:        #if closeTNMRFile flag is set close current TNMR file before opening another one, prevents accumulation of a large number of files
+    closeFirst=self.closeActiveFile if closeFirst is None else closeFirst
+    if closeFirst and template is None:        #if closeTNMRFile flag is set close current TNMR file before opening another one, prevents accumulation of a large number of files
         self.TNMR.closeActiveFile()
     if file=='' or file==False:
         f, ft = QFileDialog.getOpenFileName(self,'Open NMR file', self.studyDirectory, "Tecmag Files (*.tnt)")        #Note self.FileName is a qString not a string
@@ -687,7 +753,8 @@ class MRIcontrol(QMainWindow):
     self.studyDirectory=os.path.dirname(self.NMRfileName)
     self.message('Current study directory:' + self.studyDirectory)
     try:
-        self.TNMR.openFile(self.NMRfileName)
+        if template is None:
+            self.TNMR.openFile(self.NMRfileName)
     except:
         self.message('MRIcontrol:Cannot open TNMR file', color='red')
         return
@@ -724,8 +791,8 @@ class MRIcontrol(QMainWindow):
     self.ui.leGradientOrientation.setText('{}'.format(self.TNMR.GradientOrientation))
     self.ui.cbGradOrientation.setCurrentText(self.TNMR.getScanOrientation(self.TNMR.GradientOrientation))
     self.ui.leGradientOrientation.setText(self.scanOrientation[self.ui.cbGradOrientation.currentText()])
-    self.ui.leExpectedAcqTime.setText(str(timedelta(seconds=round(self.TNMR.currentFile.GetSequenceTime))))
-    self.expectedRunTime=self.TNMR.currentFile.GetSequenceTime
+    self.ui.leExpectedAcqTime.setText(str(timedelta(seconds=round(self.TNMR.getSequenceTime()))))
+    self.expectedRunTime=self.TNMR.getSequenceTime()
    
     self.ui.dspboxRFAttn90.setValue(self.TNMR.rfAttn90)
     self.ui.dspboxRFAttn180.setValue(self.TNMR.rfAttn180)
@@ -736,8 +803,8 @@ class MRIcontrol(QMainWindow):
     self.ui.cbPSTableList.clear()
     self.ui.cbPSTableList.addItems(self.TNMRTableList)
     self.showCurrentPSTable()
-    self.dataArrayDimen=(self.TNMR.currentFile.GetNDSize(1),self.TNMR.currentFile.GetNDSize(2),self.TNMR.currentFile.GetNDSize(3),self.TNMR.currentFile.GetNDSize(4))
-    self.tntData=self.getTNMRdata(self.dataArrayDimen)      #TNMR data usually has RO, slice, phase, parameter. 
+    self.dataArrayDimen=self.TNMR.ndSize()
+    self.tntData=self.getTNMRdata(self.dataArrayDimen, tntFile=None if template is None else template.fileName)      #TNMR data usually has RO, slice, phase, parameter. 
     self.naPoints=self.dataArrayDimen[0]    #na... are the actual number of points,slices, phase encodes, which may be different from the desired values
     self.naSlice=self.dataArrayDimen[1]
     self.naPhase=self.dataArrayDimen[2]
@@ -799,11 +866,11 @@ class MRIcontrol(QMainWindow):
         self.gradPreEmphasisLabels[key].setStyleSheet("background-color: rgb(200, 200, 200)")       #set background to gray 
         if self.TNMR.gradPreEmphasisValues[key]!=self.TNMR.gradPreEmphasisValuesDefault[key]: 
             self.gradPreEmphasisLabels[key].setStyleSheet("background-color: rgb(100, 255, 100)")       #set background to green if values do not eaqual their default values
-    self.FoVro=2*self.TNMR.SW/(self.Gammaf*np.absolute(self.Gr))        # Setting Field of View
+    self.FoVro=gradients.readoutFoV(self.TNMR.SW, self.Gr)        # Setting Field of View
     self.ui.dspboxFoVro.setValue(self.FoVro*1000)
-    self.voxelSizeRO=self.FoVro/self.TNMR.nAcqPoints
+    self.voxelSizeRO=gradients.voxelSize(self.FoVro, self.TNMR.nAcqPoints)
     self.ui.leXVoxSize.setText('{:4.2f}'.format(self.voxelSizeRO*1000))     #voxel sizes in m, display in mm
-    self.PErange=self.Gammaf*self.Gp*(self.TNMR.tpe+self.TNMR.tramp)*self.FoVro/self.TNMR.nAcqPoints
+    self.PErange=gradients.phaseEncodeRange(self.Gp, self.TNMR.tpe, self.TNMR.tramp, self.FoVro, self.TNMR.nAcqPoints)
     self.ui.lePhaseEncodeRange.setText('{:4.2f}'.format(self.PErange))
     
     self.setupProtocol()
@@ -819,15 +886,26 @@ class MRIcontrol(QMainWindow):
         self.ui.chbShowSlices.setChecked(False)    #Erases old slice plan
         self.ui.chbShowSlices.setChecked(True)     #plots new slice plan
 
-  def getTNMRdata (self, arraydim):
-    '''Extract raw data from current TNMR file'''
-    rawData=self.TNMR.currentFile.getData
-    datar=np.array(rawData)[0::2]       #data are real/ imaginary pairs
-    datai=np.array(rawData)[1::2]
-    self.data1d=np.empty(len(datar), np.cdouble)
-    self.data1d.real=datar 
-    self.data1d.imag=datai
-    data=np.reshape(self.data1d, arraydim, order='F')        #reshape the 1d array into the 4d TNMR matrix, usually RO, slice, phase, parameter 
+  def getTNMRdata (self, arraydim=None, tntFile=None, copy=True):
+    '''Extract raw data from current TNMR file as a complex64 array (RO, slice, phase, parameter),
+    if tntFile is given and exists the saved .tnt data is read from the file instead of transferred through COM,
+    copy=True reads it into memory and releases the file mapping so TNMR can rewrite or move the file, copy=False returns the
+    memory map (copy on write), which keeps the file open as long as the data is referenced'''
+    if tntFile is not None and os.path.isfile(tntFile):
+        try:
+            data=TNTfile(tntFile).DATA
+            if arraydim is None or tuple(data.shape)==tuple(arraydim):
+                if copy:
+                    mapped=data
+                    data=np.array(mapped)
+                    del mapped      #last reference to the memmap, the file is unmapped
+                return data
+        except:
+            self.message('Could not map {}, reading data from TNMR'.format(tntFile))
+    if arraydim is None:
+        arraydim=self.TNMR.ndSize()
+    rawData=self.TNMR.currentFile.getData       #data are real/ imaginary pairs
+    data=interleaved_to_complex(rawData, arraydim, dtype=self.TNMRdataType)        #one conversion to float32, viewed as complex64 and reshaped into the 4d TNMR matrix, usually RO, slice, phase, parameter
     return data
 
   def calculateDerivedPSparameters(self):
@@ -838,41 +916,33 @@ class MRIcontrol(QMainWindow):
     self.ui.letr0.setText('{:4.2f}'.format(self.TNMR.tr0*1000))      #helper parameter giving TR when no additional delays are present
             
     try:    #Construct RF excitation waveform if found and FT to calculate slice thickness
-        if self.TNMR.PSTableList.find('rfShape')!=-1:
-            wf=np.fromstring(self.TNMR.currentFile.GetTable('rfShape'), sep=' ')
-            self.RFphase=np.fromstring(self.TNMR.currentFile.GetTable('rfPhase'), sep=' ')
-            self.rfWaveform=wf*np.cos(self.RFphase*np.pi/2)
-            self.RFWaveformIntegratedWeight=np.trapz(self.rfWaveform)/self.rfWaveform.shape[0]  #integrated waveform/npoints which has a maximal value of 100
+        if self.TNMR.PSTableList.find('rfShape')!=-1:     #waveform, FT and width are memoized on the tables
+            self.RFphase=tableArray(self.TNMR.getTable('rfPhase'))
+            self.rfWaveform, self.RFWaveformIntegratedWeight, self.rfWaveformFT, width=rfShapeAnalysis(self.TNMR.getTable('rfShape'), self.TNMR.getTable('rfPhase'))  #integrated waveform/npoints which has a maximal value of 100
             self.ui.lblRFWaveFormWeight.setText('{:6.2f}'.format(self.RFWaveformIntegratedWeight))        
-            self.rfWaveformFT=np.fft.fftshift(np.fft.fft(self.rfWaveform))
-            self.sliceDeltaF=self.findF0PeakWidth(np.absolute(self.rfWaveformFT))[1]/self.TNMR.RFpw
+            self.sliceDeltaF=rf.sliceBandwidth(width, self.TNMR.RFpw)
             self.ui.lblRFWaveFormFWHM.setText( '{:6.1f}'.format(self.sliceDeltaF))
-            self.RFpowerScaling=100*self.RFCalPW/self.TNMR.RFpw/self.RFWaveformIntegratedWeight #REquired RF field for current RF pulse relative to standard 0.5 ms hard pulse
-            self.RF90attnCor=20*np.log10(self.RFpowerScaling)
+            self.RFpowerScaling=rf.powerScaling(self.TNMR.RFpw, self.RFWaveformIntegratedWeight, self.RFCalPW) #REquired RF field for current RF pulse relative to standard 0.5 ms hard pulse
+            self.RF90attnCor=rf.attenuationCorrection(self.RFpowerScaling)
             self.ui.dsbRFPowerCor.setValue(self.RF90attnCor)
-            self.RF90AttnSuggested=float(self.ui.leRFAttn90Cal.text())- self.RF90attnCor
-            self.RF90attnSuggestedRounded=int(self.RF90AttnSuggested/0.5)*0.5
-            self.RFPowerDerating=10**((self.RF90attnSuggestedRounded-self.RF90AttnSuggested)/20)
+            self.RF90AttnSuggested, self.RF90attnSuggestedRounded, self.RFPowerDerating=rf.suggestedAttenuation(float(self.ui.leRFAttn90Cal.text()), self.RF90attnCor)
             self.ui.dsbRecommendedRF90Attn.setValue(self.RF90attnSuggestedRounded)
             self.ui.dsbRFscale.setValue(self.RFPowerDerating)
             self.ui.dsbPSRFAttn.setValue(self.RF90AttnSuggested)
-            self.tipAngle=0.5*np.pi*10**(-(self.TNMR.rfAttn90-self.RF90AttnSuggested)/20)
+            self.tipAngle=rf.tipAngle(self.TNMR.rfAttn90, self.RF90AttnSuggested)
             self.ui.dspTipAngle.setValue(self.tipAngle*180/np.pi)
     except:
         raise
-    self.sliceThickness=self.sliceDeltaF/(self.Gammaf*self.Gs)
+    self.sliceThickness=slices.sliceThickness(self.sliceDeltaF, self.Gs)
     self.ui.dspboxSliceThickness.setValue(self.sliceThickness*1000)
     try:
         if self.setupdict['SlicePositions']:     #if the pulsesequence protocol has slice positions, retrieve and set slice position parameters
-            self.sliceFrequencies=np.fromstring(self.TNMR.currentFile.GetTable('sliceFrequencies'), sep=' ')
-            self.slicePositions=-self.sliceFrequencies/(self.Gammaf*self.Gs)
+            self.sliceFrequencies=tableArray(self.TNMR.getTable('sliceFrequencies')).copy()
+            self.slicePositions=slices.slicePositions(self.sliceFrequencies, self.Gs)
             self.slicePositionList=np.array2string(self.slicePositions*1000, precision=2, separator=',').replace('[','').replace(']', '').split(',') #make a slice position list from slice position array
             self.ui.cbSlicePositions.clear()
             self.ui.cbSlicePositions.addItems(self.slicePositionList)
-            if self.slicePositions.shape[0]>1:  #if there is more than one slice, calculate slice spacings
-               self.sliceSpacing=np.min(np.absolute(self.slicePositions-self.slicePositions[0])[1:])
-            else:
-               self.sliceSpacing=0.0 
+            self.sliceSpacing=slices.sliceSpacing(self.slicePositions)
             self.ui.dspboxSliceSpacing.setValue(self.sliceSpacing*1000) #slice spacing in m, but displayed in mm
             #self.ui.leSlicePositions.setText(np.array2string(self.slicePositions*1000, precision=2))
             #self.message('Slice frequencies found, sliceFrequencies(Hz)={}, Slice positions(mm)={}'.format(np.array2string(self.sliceFrequencies,max_line_width=None, precision=2),np.array2string(self.slicePositions*1000,max_line_width=None, precision=2)))
@@ -880,7 +950,7 @@ class MRIcontrol(QMainWindow):
         raise
     try:
          if self.setupdict['TE']:
-            self.TEarray=2*np.fromstring(self.TNMR.currentFile.GetTable('teDelay').replace('m',''), sep=' ')*1E-3+self.TNMR.te0     #Echo times in s
+            self.TEarray=2*tableArray(self.TNMR.getTable('teDelay'), 'm')+self.TNMR.te0     #Echo times in s
             self.TEList=np.array2string(self.TEarray*1000, max_line_width=20000, separator=',', formatter={'float_kind':lambda x: "%.2f" % x}).replace('[','').replace(']', '').split(',') #make a  list from TE array
             self.ui.cbTE.clear()
             self.ui.cbTE.addItems(self.TEList)
@@ -893,13 +963,13 @@ class MRIcontrol(QMainWindow):
     try:
         if self.setupdict['TI']:
             if self.ProtocolName=='SEMS_IR' or self.ProtocolName=='GEMS_IR':
-                self.TIarray=np.fromstring(self.TNMR.currentFile.GetTable('tiDelay').replace('m',''), sep=' ')*1E-3+self.TNMR.ti0     #Inversion times in s, display in ms
+                self.TIarray=tableArray(self.TNMR.getTable('tiDelay'), 'm')+self.TNMR.ti0     #Inversion times in s, display in ms
                 self.TIarrayList=np.array2string(self.TIarray*1000, max_line_width=20000, separator=',', formatter={'float_kind':lambda x: "%.2f" % x}).replace('[','').replace(']', '').split(',') 
                 self.ui.cbTI.clear()
                 self.ui.cbTI.addItems(self.TIarrayList)
                 self.ui.spboxParameters.setValue(len(self.TIarray))
             if self.ProtocolName=='T1IR_NMR':
-                self.TIarray=np.fromstring(self.TNMR.currentFile.GetTable('ti_times').replace('m',''), sep=' ')*1E-3    #Inversion times in s, display in ms
+                self.TIarray=tableArray(self.TNMR.getTable('ti_times'), 'm').copy()    #Inversion times in s, display in ms, copy as updatePS clips it in place
                 self.TIList=np.array2string(self.TIarray*1000, separator=',', formatter={'float_kind':lambda x: "%.2f" % x}).replace('[','').replace(']', '').split(',') #make a  list from self.TIarray
                 self.ui.cbTI.clear()
                 self.ui.cbTI.addItems(self.TIList)
@@ -926,11 +996,11 @@ class MRIcontrol(QMainWindow):
             self.tcrush = self.TNMR.getTNMRfloat("tcrush")
             self.tramp = self.TNMR.getTNMRfloat("tramp")
             self.message('diffdelta(ms)={:4.2f} , diffDelay(ms)={:4.2f} , tcrush(ms)={:4.2f} , tramp(ms)={:4.2f} '.format(1000*self.diffdelta,1000*self.diffDelay,1000*self.tcrush,1000*self.tramp))
-            self.difGradArray=np.fromstring(self.TNMR.currentFile.GetTable("GrDiffArray"), sep=' ')*1E-3     #Read in grdient pulse amplitudes
+            self.difGradArray=tableArray(self.TNMR.getTable("GrDiffArray"))*1E-3     #Read in grdient pulse amplitudes
             self.difGradArrayList=np.array2string(self.difGradArray*1000,max_line_width=20000, separator=',',formatter={'float_kind':lambda x: "%.2f" % x}).replace('[','').replace(']', '').split(',')
             self.ui.cbDiffGradients.clear()
             self.ui.cbDiffGradients.addItems(self.difGradArrayList)
-            self.bValueArray=self.STbvalue( g=self.difGradArray, delta=self.diffdelta, Delta=2*(self.diffDelay+self.tcrush+4*self.tramp)+self.diffdelta, risetime=self.tramp, pulsetype='trap')
+            self.bValueArray=self.STbvalue( g=self.difGradArray, delta=self.diffdelta, Delta=diffusion.pgseSeparation(self.diffdelta, self.diffDelay, self.tcrush, self.tramp), risetime=self.tramp, pulsetype='trap')
             self.bValueArrayList=np.array2string(self.bValueArray,max_line_width=20000, separator=',',formatter={'float_kind':lambda x: "%.1f" % x}).replace('[','').replace(']', '').split(',')
             self.ui.cbBvalues.clear()
             self.ui.cbBvalues.addItems(self.bValueArrayList) 
@@ -939,7 +1009,7 @@ class MRIcontrol(QMainWindow):
 
     try:
         if self.ProtocolName=='FID90ECC':
-            self.gradRingdownDelay=np.fromstring(self.TNMR.currentFile.GetTable('gradRingdownDelay').replace('u','E-6').replace('m','E-3').replace('s',''), sep=' ')    #*1E-3+self.TNMR.ti0     
+            self.gradRingdownDelay=np.fromstring(self.TNMR.getTable('gradRingdownDelay').replace('u','E-6').replace('m','E-3').replace('s',''), sep=' ')    #*1E-3+self.TNMR.ti0     
     except:
         raise
         print('MRIcontrol, calculateDerivedPSparameters: Cannot extract gradRingdownDelay')             
@@ -1055,7 +1125,7 @@ class MRIcontrol(QMainWindow):
         self.TNMR.RFpw180=self.ui.dspboxRFpw180.value()/1000       #Display is in ms
     self.TNMR.ReceiverGain=self.ui.spboxReceiverGain.value()
     self.TNMR.GradientOrientation=self.ui.leGradientOrientation.text()
-    self.TNMR.phaseEncodeArray=(np.array2string(self.phaseEncodeArray, separator=' ', formatter={'float_kind':lambda x: "%.3f" % x}).replace('[','').replace(']',''))
+    self.TNMR.phaseEncodeArray=formatTable(self.phaseEncodeArray, separator=' ')
     self.writeTNMRComment()
  
     # #read in gradient scaling values   
@@ -1076,91 +1146,75 @@ class MRIcontrol(QMainWindow):
     self.ui.dspboxRFAttn180.setValue(self.TNMR.rfAttn180)
     self.FoVro=self.ui.dspboxFoVro.value()/1000
     #Set readout  gradient Gr, readout rewind gradient Grr, and Phase Encode gradient Gp values
-    self.Gr=self.GrSign*2*self.TNMR.SW/ self.FoVro/self.Gammaf      # Setting readout gradient field of View
-    self.TNMR.GrDAC=100*self.Gr/self.Grmax
-    self.Grr=self.GrrSign*0.5*self.Gr*(self.TNMR.AcqTime+self.TNMR.tramp)/(self.TNMR.tpe+self.TNMR.tramp)
-    self.TNMR.GrrDAC=100*self.Grr/self.Grmax
+    slicing=self.ui.dspboxSliceThickness.isEnabled() or self.ui.cbSlicePositions.isEnabled()     #2D sequence that uses slices
+    derived=self.protocolParameters(sliceThickness=self.ui.dspboxSliceThickness.value()/1000 if slicing else None).derive()
+    self.Gr, self.Grr, self.Gp=derived['Gr'], derived['Grr'], derived['Gp']
+    self.TNMR.GrDAC, self.TNMR.GrrDAC, self.TNMR.GpDAC=derived['GrDAC'], derived['GrrDAC'], derived['GpDAC']
     self.ui.leGrDAC.setText('{:6.4f}'.format(self.TNMR.GrDAC))
     self.ui.leGr.setText('{:6.4f}'.format(self.Gr*1000))
     self.ui.leGrrDAC.setText('{:6.4f}'.format(self.TNMR.GrrDAC))
     self.ui.leGrr.setText('{:6.4f}'.format(self.Grr*1000))
-    self.voxelSizeRO=self.FoVro/self.TNMR.nAcqPoints
+    self.voxelSizeRO=derived['voxelSizeRO']
     self.ui.leXVoxSize.setText('{:4.2f}'.format(self.voxelSizeRO*1000))     #voxel sizes in m, display in mm
-    self.Gp=self.GpSign*0.5*self.TNMR.nAcqPoints/((self.TNMR.tpe+self.TNMR.tramp)*self.FoVro*self.Gammaf)
-    self.TNMR.GpDAC=100*self.Gp/self.Gpmax
     self.ui.leGpDAC.setText('{:6.4f}'.format(self.TNMR.GpDAC))
     self.ui.leGp.setText('{:6.4f}'.format(self.Gp*1000))
     #Set slice  gradinet Gs and rewind gradient Gsr values if the sequence is 2D and uses slices
-    if self.ui.dspboxSliceThickness.isEnabled() or self.ui.cbSlicePositions.isEnabled():
-        self.sliceThickness=self.ui.dspboxSliceThickness.value()/1000
-        self.Gs=self.GsSign*self.sliceDeltaF/(self.Gammaf*self.sliceThickness)
-        self.TNMR.GsDAC=100*self.Gs/self.Gsmax
-        if np.absolute(self.TNMR.GsDAC)>100:        #check to ensure gradient dac is not set above max/min values
-            self.TNMR.GsDAC=100*np.sign(self.TNMR.GsDAC)
-            self.Gs=self.Gsmax*self.TNMR.GsDAC/100
-            self.sliceThickness==np.abs(self.sliceDeltaF/(self.Gammaf*self.Gs))
+    if slicing:
+        self.sliceThickness=float(derived['sliceThickness'])
+        self.Gs, self.TNMR.GsDAC=float(derived['Gs']), float(derived['GsDAC'])
+        if derived['sliceClipped']:        #slice gradient dac limited to max/min values
             self.ui.dspboxSliceThickness.setValue(self.sliceThickness*1000)
             self.message('Requested slice gradient above max value', color='red')
         self.ui.leGsDAC.setText('{:6.4f}'.format(self.TNMR.GsDAC))
         self.ui.leGs.setText('{:6.4f}'.format(self.Gs*1000))
-        self.Gsr=self.GsrSign*0.6589*self.Gs
-        self.TNMR.GsrDAC=100*self.Gsr/self.Gsmax
+        self.Gsr, self.TNMR.GsrDAC=float(derived['Gsr']), float(derived['GsrDAC'])
         self.ui.leGsrDAC.setText('{:6.4f}'.format(self.TNMR.GsrDAC))
         self.ui.leGsr.setText('{:6.4f}'.format(self.Gsr*1000))
     if self.ui.cbSlicePositions.isEnabled():
         try:        #update slice frequency array
              self.sliceFrequencyString=np.array2string(self.sliceFrequencies,  max_line_width=20000, precision=1, separator='  ').replace('[','').replace(']', '')
-             self.TNMR.currentFile.SetTable('sliceFrequencies', self.sliceFrequencyString)
+             self.TNMR.setTable('sliceFrequencies', self.sliceFrequencyString)
              #self.message('Slice frequencies found, sliceFrequencies(Hz)={}, Slice positions(mm)={}'.format(,np.array2string(self.slicePositions*1000,max_line_width=None, precision=2)))
         except:
              raise
 
     if self.ui.cbTI.isEnabled():
         try:        #update TI array
-             if self.Protocol=='SEMS_IR':
-                 self.tiArray=self.TIarray-self.TNMR.ti0
-                 self.tiArray[self.tiArray <= 1e-6]=1e-6        #must be greater than 1 microsecond
-                 self.tiArrayList=np.array2string(self.tiArray*1000,  max_line_width=20000, separator='  ',formatter={'float_kind':lambda x: "%.3fm" % x}).replace('[','').replace(']', '')
-                 self.TNMR.currentFile.SetTable('tiDelay', self.tiArrayList)
-             if self.Protocol=='T1IR_NMR':
-                 self.TIarray[self.TIarray <= 1e-6]=1e-6        #must be greater than 1 microsecond
-                 self.tiArrayList=np.array2string(self.TIarray*1000,  max_line_width=20000, separator='  ',formatter={'float_kind':lambda x: "%.3fm" % x}).replace('[','').replace(']', '')
-                 self.TNMR.currentFile.SetTable('ti_times', self.tiArrayList)
+             if self.Protocol=='SEMS_IR' or self.Protocol=='T1IR_NMR':
+                 self.tiArray=inversionDelays(self.TIarray, self.TNMR.ti0, self.Protocol)        #must be greater than 1 microsecond
+                 self.tiArrayList=formatTable(self.tiArray*1000, '%.3fm')
+                 self.TNMR.setTable('tiDelay' if self.Protocol=='SEMS_IR' else 'ti_times', self.tiArrayList)
         except:
              raise
     if self.ui.cbTE.isEnabled():
         try:        #update TE array for SEMS and GEMS protocols 
-             if self.Protocol=='SEMS' or self.Protocol=='SEMS2':
-                 self.teArray=self.TEarray/2-self.TNMR.te0/2
-                 self.teArray[self.teArray <= 1e-6]=1e-6        #must be greater than 1 microsecond
-                 self.teArrayList=np.array2string(self.teArray*1000,  max_line_width=20000, separator='  ',formatter={'float_kind':lambda x: "%.3fm" % x}).replace('[','').replace(']', '')
-                 self.TNMR.currentFile.SetTable('teDelay', self.teArrayList)
-                 print('set teDealy: ' + self.teArrayList)
-             if self.Protocol=='GEMS':
-                 self.teArray=self.TEarray-self.TNMR.te0
-                 self.teArray[self.teArray <= 1e-6]=1e-6        #must be greater than 1 microsecond
-                 self.teArrayList=np.array2string(self.teArray*1000,  max_line_width=20000, separator='  ',formatter={'float_kind':lambda x: "%.3fm" % x}).replace('[','').replace(']', '')
-                 self.TNMR.currentFile.SetTable('teDelay', self.teArrayList)
-             if self.Protocol=='T2SE_NMR':
-                 self.TEarray[self.TEarray <= 1e-6]=1e-6        #must be greater than 1 microsecond
-                 self.teArrayList=np.array2string(self.TEarray*1000,  max_line_width=20000, separator='  ',formatter={'float_kind':lambda x: "%.3fm" % x}).replace('[','').replace(']', '')
-                 self.TNMR.currentFile.SetTable('teDelay', self.teArrayList)
+             if self.Protocol in ('SEMS', 'SEMS2', 'GEMS', 'T2SE_NMR'):
+                 self.teArray=echoDelays(self.TEarray, self.TNMR.te0, self.Protocol)        #must be greater than 1 microsecond
+                 self.teArrayList=formatTable(self.teArray*1000, '%.3fm')
+                 self.TNMR.setTable('teDelay', self.teArrayList)
         except:
              raise
     if self.ui.cbTR.isEnabled():
         pass
     else:
-        self.TR=self.nSlices*(self.TNMR.LastDelay+self.TNMR.te0)
+        self.TR=derived['TR']
         self.ui.cbTR.clear()
         self.ui.cbTR.addItems(('{:6.2f}'.format(self.TR*1000),''))
     if self.setupdict['Bvalue']:
-        difGradString=np.array2string(self.difGradArray*1000,  max_line_width=20000, separator='  ',formatter={'float_kind':lambda x: "%.3f" % x}).replace('[','').replace(']', '')
-        self.TNMR.currentFile.SetTable('GrDiffArray',difGradString)      
+        self.TNMR.setTable('GrDiffArray', formatTable(self.difGradArray*1000))      
     self.TNMR.setPSparams()
-    self.expectedRunTime=self.TNMR.currentFile.GetSequenceTime    
+    self.expectedRunTime=self.TNMR.getSequenceTime()    
     self.ui.leExpectedAcqTime.setText(str(timedelta(seconds=round(self.expectedRunTime))))
 
 
+  def protocolParameters(self, sliceThickness=None):
+    '''mricore.Protocol of the current pulse sequence from TNMR and the protocol widgets, sliceThickness(m) None for no slice selection'''
+    return Protocol(self.ProtocolName, SW=self.TNMR.SW, nAcqPoints=self.TNMR.nAcqPoints, nSlices=self.nSlices, nPhases=self.nPhases,
+                    acqTime=self.TNMR.AcqTime, lastDelay=self.TNMR.LastDelay, tpe=self.TNMR.tpe, tramp=self.TNMR.tramp, te0=self.TNMR.te0,
+                    ti0=self.TNMR.ti0, RFpw=self.TNMR.RFpw, FoV=self.FoVro, sliceThickness=sliceThickness, sliceDeltaF=self.sliceDeltaF,
+                    Grmax=self.Grmax, Gpmax=self.Gpmax, Gsmax=self.Gsmax,
+                    signs={'GrSign':self.GrSign, 'GrrSign':self.GrrSign, 'GpSign':self.GpSign, 'GsSign':self.GsSign, 'GsrSign':self.GsrSign})
+
   def changeWideRefocus(self):
     '''SEMS option to refocus wider than the excitation'''
     if self.ui.chbWideRefocus.isChecked():
@@ -1204,16 +1258,14 @@ class MRIcontrol(QMainWindow):
         self.sliceArrayCenter=sliceCenter/1000
     else:
         pass
-    self.Gs=self.GsSign*self.sliceDeltaF/(self.Gammaf*self.sliceThickness)
-    self.TNMR.GsDAC=100*self.Gs/self.Gsmax
-    if np.absolute(self.TNMR.GsDAC)>100:        #check to ensure gradient dac is not set above max/min values
-            self.TNMR.GsDAC=100*np.sign(self.TNMR.GsDAC)
-            self.Gs=self.Gsmax*self.TNMR.GsDAC/100
-            self.sliceThickness=np.abs(self.sliceDeltaF/(self.Gammaf*self.Gs))
+    Gs, GsDAC, sliceThickness, clipped=gradients.sliceGradient(self.sliceDeltaF, self.sliceThickness, self.Gsmax, self.GsSign)
+    self.Gs, self.TNMR.GsDAC=float(Gs), float(GsDAC)
+    if clipped:        #gradient dac limited to max/min values
+            self.sliceThickness=float(sliceThickness)
             self.ui.dspboxSliceThickness.setValue(self.sliceThickness*1000)
             self.message('Requested slice gradient={:6.2F} above max value'.format(self.TNMR.GsDAC), color='red')
-    self.slicePositions=-1*(np.arange(nslices)-int(nslices/2))*(self.sliceSpacing)+self.sliceArrayCenter
-    self.sliceFrequencies=-self.slicePositions*self.Gammaf*self.Gs      #set slice frequencies from slicePosition array
+    self.slicePositions=slices.linearSlicePositions(nslices, self.sliceSpacing, self.sliceArrayCenter)
+    self.sliceFrequencies=slices.sliceFrequencies(self.slicePositions, self.Gs)      #set slice frequencies from slicePosition array
     self.slicePositionList=np.array2string(self.slicePositions*1000, precision=2, max_line_width=20000, separator=',').replace('[','').replace(']', '').split(',') #make a slice position list from slice position array
     self.ui.cbSlicePositions.clear()
     self.ui.cbSlicePositions.addItems(self.slicePositionList)
@@ -1243,11 +1295,7 @@ class MRIcontrol(QMainWindow):
         self.finalTI=finalTI/1000
     else:
         self.finalTI=1
-    if tiprotocol=='Linear':
-        self.TIarray=np.linspace(initialTI, finalTI, num=nTIs)/1000
-    if tiprotocol=='PowerLaw':
-        power=np.exp(np.log(self.finalTI/self.initialTI)/(nTIs-1))      #calculate multipier from min, max, and number of TEs  
-        self.TIarray=self.initialTI*power**np.arange(nTIs)    
+    self.TIarray=timingArray(tiprotocol, self.initialTI, self.finalTI, nTIs)
     self.TIarrayList=np.array2string(self.TIarray*1000,max_line_width=20000, separator=',',formatter={'float_kind':lambda x: "%.2f" % x}).replace('[','').replace(']', '').split(',')
     self.ui.cbTI.clear()
     self.ui.cbTI.addItems(self.TIarrayList)
@@ -1281,11 +1329,7 @@ class MRIcontrol(QMainWindow):
         self.finalTE=finalTE/1000
     else:
         self.finalTE=1
-    if teprotocol=='Linear':
-        self.TEarray=np.linspace(initialTE, finalTE, num=nTEs)/1000
-    if teprotocol=='PowerLaw':
-        power=np.exp(np.log(self.finalTE/self.initialTE)/(nTEs-1))      #calculate multipier from min, max, and number of TEs
-        self.TEarray=self.initialTE*(power**np.arange(nTEs))    
+    self.TEarray=timingArray(teprotocol, self.initialTE, self.finalTE, nTEs)
     self.TEarrayList=np.array2string(self.TEarray*1000,max_line_width=20000, separator=',',formatter={'float_kind':lambda x: "%.2f" % x}).replace('[','').replace(']', '').split(',')
     self.ui.cbTE.clear()
     self.ui.cbTE.addItems(self.TEarrayList)
@@ -1309,22 +1353,18 @@ class MRIcontrol(QMainWindow):
         self.finalGrad=finalGrad/1000
     else:
         self.finalGrad=0.1
-    if difprotocol=='Linear':
-        self.difGradArray=np.linspace(self.initialDifGradient, finalGrad, num=nBvs)/1000
-    if difprotocol=='Quadratic':
-        sqrtarray=np.sqrt(np.arange(nBvs)/(nBvs-1))
-        self.difGradArray=self.finalGrad*sqrtarray   
+    self.difGradArray=diffusion.gradientArray(difprotocol, nBvs, self.finalGrad, self.initialDifGradient)
     self.difGradArrayList=np.array2string(self.difGradArray*1000,max_line_width=20000, separator=',',formatter={'float_kind':lambda x: "%.2f" % x}).replace('[','').replace(']', '').split(',')
     self.ui.cbDiffGradients.clear()
     self.ui.cbDiffGradients.addItems(self.difGradArrayList)
-    self.bValueArray=self.STbvalue( g=self.difGradArray, delta=self.diffdelta, Delta=2*(self.diffDelay+self.tcrush+4*self.tramp)+self.diffdelta, risetime=self.tramp, pulsetype='trap')
+    self.bValueArray=self.STbvalue( g=self.difGradArray, delta=self.diffdelta, Delta=diffusion.pgseSeparation(self.diffdelta, self.diffDelay, self.tcrush, self.tramp), risetime=self.tramp, pulsetype='trap')
     self.bValueArrayList=np.array2string(self.bValueArray,max_line_width=20000, separator=',',formatter={'float_kind':lambda x: "%.2f" % x}).replace('[','').replace(']', '').split(',')
     self.ui.cbBvalues.clear()
     self.ui.cbBvalues.addItems(self.bValueArrayList)
           
   def showCurrentPSTable(self):
       '''Display chosen pulse sequence table''' 
-      currentTable=self.TNMR.currentFile.GetTable(self.ui.cbPSTableList.currentText())
+      currentTable=self.TNMR.getTable(self.ui.cbPSTableList.currentText(), refresh=True)
       self.currentTableArray=np.fromstring(currentTable, dtype=float, sep=' ')
       self.ui.lblPSTableList.setText(currentTable)
       self.ui.leNTableElements.setText("{}".format(len(self.currentTableArray)))
@@ -1383,40 +1423,21 @@ class MRIcontrol(QMainWindow):
           #   self.scoutData=self.tntData[nRF::4,:,:,0]     #extract channel 1 from  CH1,2,3,4 data for Magnetica data
           # else:
           self.scoutData=self.tntData[:,:,:,0] #scoutData is a 3d array with RO coronal+ sagittal+axial, slice, phase
-          dshape=self.scoutData.shape
-          columns=int(dshape[0]/3)  #Sagittal, coronal, axial need to be separated
-          rows=dshape[2]         
-          npad=int((columns-rows)/2) 
+          self.scoutImages, scoutMag, npad=reconTNT.reconstructScout(self.scoutData)      #(3, slice, RO, phase) views, one batched FFT
+          self.fftdataCoronal, self.fftdataSagittal, self.fftdataAxial=self.scoutImages
+          comag, samag, axmag=scoutMag      #normalized magnitudes
+          columns=self.scoutImages.shape[2]
           self.xscale=1000*self.FoVro/columns
           self.yscale=self.xscale
           xmin=-1000*self.FoVro/2       #upper left value of image in mm
           ymin=-1000*self.FoVro/2
-          axial=self.scoutData[2*columns:3*columns,:,:]   #Axial is the first third of readout
-          axial=np.swapaxes(axial,0,1)  #move the slice index to the first dimension
-          self.axialScout=np.pad(axial,((0,0),(0,0),(npad,npad)))   #pad so we have a square array
-          #self.axialScoutMax=np.max(np.absolute(self.axialScout[0,:,:]))
-          self.fftdataAxial=np.fft.fftshift(np.fft.fft2(self.axialScout))
-          axmag=np.absolute(self.fftdataAxial)
-          axmag=axmag/axmag.max()  #normalize
           if raw:
-              self.imvAxial.setImage(np.absolute(self.axialScout[0,:,:]),scale = (self.xscale,self.yscale))
+              axialk=reconTNT.scoutViews(self.scoutData)[2,:,0,:]       #axial is the last third of readout
+              self.imvAxial.setImage(np.pad(np.absolute(axialk),((0,0),(npad,npad))),scale = (self.xscale,self.yscale))
           else:
               self.imvAxial.setImage(np.fliplr(axmag[0,:,:]),pos = (xmin,ymin),scale = (self.xscale,self.yscale))
           self.imvAxial.setLevels(min=0.2,max=0.6)
-          coronal=self.scoutData[0:columns,:,:]   #Axial is the first third of readout
-          coronal=np.swapaxes(coronal,0,1)  #move the slice index to the first dimension
-          self.coronalScout=np.pad(coronal,((0,0),(0,0),(npad,npad)))   #pad so we have a square array
-          self.fftdataCoronal=np.fft.fftshift(np.fft.fft2(self.coronalScout))
-          comag=np.absolute(self.fftdataCoronal)
-          comag=comag/comag.max()  #normalize
           self.imvCoronal.setImage(np.flipud(comag[0,:,:]),pos = (xmin,ymin),scale = (self.xscale,self.yscale))
-          
-          sagittal=self.scoutData[columns:2*columns,:,:]   #sagittal is the first third of readout
-          sagittal=np.swapaxes(sagittal,0,1)  #move the slice index to the first dimension
-          self.sagittalScout=np.pad(sagittal,((0,0),(0,0),(npad,npad)))   #pad so we have a square array
-          self.fftdataSagittal=np.fft.fftshift(np.fft.fft2(self.sagittalScout))
-          samag=np.absolute(self.fftdataSagittal)
-          samag/=samag.max()  #normalize
           self.imvSagittal.setImage(np.fliplr(np.transpose(samag[0,:,:])),pos = (xmin,ymin),scale = (self.xscale,self.yscale))
           self.ui.hsSlicePlanMin.setValue(0)
           self.ui.hsSlicePlanMax.setValue(100) 
@@ -1533,16 +1554,19 @@ class MRIcontrol(QMainWindow):
       self.openProtocol()
       if self.ui.chbSetObserveFreqToCenterFreq.isChecked():
           self.setObsFrequency()
-          self.TNMR.currentFile.SetNMRParameter("Observe Freq.", '{:.6f}MHz'.format(self.TNMR.ObsFreq/10**6))
+          self.TNMR.setNMRParameter("Observe Freq.", '{:.6f}MHz'.format(self.TNMR.ObsFreq/10**6))
       self.runCurrentTNMRFile() 
-      self.dataArrayDimen=(self.TNMR.currentFile.GetNDSize(1),self.TNMR.currentFile.GetNDSize(2),self.TNMR.currentFile.GetNDSize(3),self.TNMR.currentFile.GetNDSize(4))
+      self.dataArrayDimen=self.TNMR.ndSize()
       self.tntData=self.getTNMRdata(self.dataArrayDimen)
       if self.subtractFIDBackground:
-        bstart=int(self.blRegionStart*self.tntData.real.shape[0])   #calculate baselines as the average of the data beyond self.blRegion
-        bstop=int(self.blRegionStop*self.tntData.real.shape[0])   #calculate baselines as the average of the data beyond self.blRegion
-        self.FIDBaseline=np.average(self.tntData[bstart:bstop,0,0,0].real)+1j*np.average(self.tntData[bstart:bstop,0,0,0].imag)    #array of complex baseline values
-        self.tntData-=self.FIDBaseline     # baseline is the averagrion value of last part of the data
-        self.message('Subtracting FID Background:'+ 'data shape {0},{1},{2},{3}, baseline={4.real:.2f} {4.imag:+.2f}i)'.format(*self.tntData.shape,self.FIDBaseline))
+        try:
+            self.dataBaselineCoefficients=baseline.subtractBaselines(self.tntData, self.blRegionStart, self.blRegionStop, order=self.baselineOrder, endZeros=self.TechMagEndZeros)     # baseline is fit to the last part of every FID
+        except ValueError as e:
+            self.message('No baseline subtracted: {}'.format(e), color='red')     #still plot the FID and reset the button below
+        else:
+          self.FIDBaseline=complex(self.dataBaselineCoefficients[0,0,0,0])
+          self.dataViews.invalidate()     #data changed in place
+          self.message('Subtracting FID Background:'+ 'data shape {0},{1},{2},{3}, baseline={4.real:.2f} {4.imag:+.2f}i)'.format(*self.tntData.shape,self.FIDBaseline))
 
       self.ui.rbPSDataSpectra.setChecked(True) #set PSData plot to display spectra      
       self.plotData(self.tntData)
@@ -1592,6 +1616,12 @@ class MRIcontrol(QMainWindow):
       if self.TNMRbusy:
         QMessageBox.warning(None, "TNMR Active", "Need to wait")
         return
+      mode, ok = QInputDialog().getItem(self, "ECC scan mode","Grid: fixed steps; Adaptive: search for the optimum with fewer acquisitions", ['Grid', 'Adaptive'], 0, False)
+      if not ok:
+          return
+      if mode=='Adaptive':
+          self.scanECCParameterAdaptive()
+          return
       self.scanECCparameters=  self.B0CompZeroAmpl+ self.gradPreEmphasisZeroAmpl
       item, ok = QInputDialog().getItem(self, "ECC parameter","Select parameter to be varied", self.scanECCparameters, 0, False)
       if ok :
@@ -1619,27 +1649,32 @@ class MRIcontrol(QMainWindow):
       self.openProtocol()
       if self.ui.chbSetObserveFreqToCenterFreq.isChecked():
             self.setObsFrequency()
-            self.TNMR.currentFile.SetNMRParameter("Observe Freq.", '{:.6f}MHz'.format(self.TNMR.ObsFreq/10**6))
+            self.TNMR.setNMRParameter("Observe Freq.", '{:.6f}MHz'.format(self.TNMR.ObsFreq/10**6))
       self.message('Scanning ECC parameter {}; start={}, stop={}, nsteps={}'.format(scanParam, startValue,endValue, nsteps), bold=True,ctime=False, color='red')
-      for i,pvalue in enumerate(parameters):
-          app.processEvents()
-          self.TNMR.currentFile.SetNMRParameter(scanParam, '{:.2f}'.format(pvalue))
-          self.runCurrentTNMRFile() 
-          self.dataArrayDimen=(self.TNMR.currentFile.GetNDSize(1),self.TNMR.currentFile.GetNDSize(2),self.TNMR.currentFile.GetNDSize(3),self.TNMR.currentFile.GetNDSize(4))
-          self.tntData=self.getTNMRdata(self.dataArrayDimen)
-          fidAmp=np.sum(np.absolute(self.tntData[:,0,0,0]))
-          sfreq=-(np.fft.fftshift(np.fft.fftfreq(self.tntData.shape[0], self.TNMR.DwellTime)))
-          psFFTData=np.fft.fftshift(np.fft.fft(self.tntData[:,0,0,0]))
-          spectra= np.absolute(psFFTData)
-          normalizedspectra =spectra/np.sum(spectra)
-          avFreq=np.average(sfreq,weights=normalizedspectra)
-          pkwidth=np.sqrt(np.sum(normalizedspectra*(sfreq-avFreq)**2)) 
-          print ('pvalue=', pvalue, ', avFreq=', avFreq, ', peak width(Hz)=', pkwidth)
-          self.scannedECCParamArray[i]= fidAmp
       paramPlot=plotWindow(self)
-      paramPlot.dplot.plot(parameters,self.scannedECCParamArray)
+      paramPlot.setWindowTitle('ECC scan ' + scanParam)
+      scanCurve=paramPlot.dplot.plot([], [], symbol='o')
       paramPlot.show()
-      self.TNMR.currentFile.SetNMRParameter(scanParam, '{:.2f}'.format(0))
+      def scanResult(i, pvalue, result):      #called for each analyzed FID while the next one is acquired
+          self.scannedECCParamArray[i]=result['fidAmp']
+          scanCurve.setData(parameters[:i+1], self.scannedECCParamArray[:i+1])
+          print ('pvalue=', pvalue, ', avFreq=', result['avFreq'], ', peak width(Hz)=', result['pkwidth'])
+      def fetchData():
+          self.tntData=self.getTNMRdata(self.TNMR.ndSize())
+          return self.tntData
+      self.recipeAbort=False
+      rawFile=os.path.join(self.studyDirectory, 'ECCscan_{}_{}.npy'.format(scanParam.replace('.', ''), time.strftime("%Y%m%d_%H%M")))
+      def startAcquisition():     #busy flag, run time and progress as for any TNMR run
+          runBlocking(self.runCurrentTNMRFileSteps(waitUntilDone=False), wait=self.pause, aborted=lambda: self.recipeAbort)
+      scan=ECCScan(setParameter=lambda v: self.TNMR.setNMRParameter(scanParam, '{:.2f}'.format(v)), start=startAcquisition, busy=lambda: not self.acquisitionComplete(),
+                   fetch=fetchData, values=parameters, analyze=analyzeFID, analyzeArgs=(self.TNMR.DwellTime,),
+                   rawFile=rawFile, onResult=scanResult, wait=self.pause, aborted=lambda: self.recipeAbort, pollInterval=0.1)
+      self.scannedECCResults=scan.run()
+      if self.recipeAbort:
+          self.message('Aborting TNMR file execution')
+          self.TNMR.abort()
+      self.message('ECC scan {:.1f}s, acquisition {:.1f}s, raw FIDs saved in {}'.format(scan.timing['total'], scan.timing['acquire'], rawFile), color='red')
+      self.TNMR.setNMRParameter(scanParam, '{:.2f}'.format(0))
       # self.ui.rbPSDataSpectra.setChecked(True) #set PSData plot to display spectra      
       # self.plotData(self.tntData)
       # self.ui.dockPSData.setFloating(True)
@@ -1647,6 +1682,79 @@ class MRIcontrol(QMainWindow):
       # self.ui.leFIDFWHM.setText('{:6.2F}'.format(self.FirstPeakFWHM))
       # self.ui.pbFID.setStyleSheet("background-color: rgb(240, 240, 240)") 
        
+  def scanECCParameterAdaptive(self):
+      '''searches for the ECC parameter value, or amplitude/time constant pair, that maximizes the FID amplitude or minimizes the peak width
+      with a coarse grid followed by golden section refinement, reports the optimum with its uncertainty and leaves the parameters there'''
+      self.scanECCparameters=  self.B0CompZeroAmpl+ self.gradPreEmphasisZeroAmpl
+      item, ok = QInputDialog().getItem(self, "ECC parameter","Select parameter to be optimized", self.scanECCparameters, 0, False)
+      if not ok:
+        return
+      scanParams=[item]
+      allParams=['none']+list(self.TNMR.B0CompValuesDefault.keys())+list(self.TNMR.gradPreEmphasisValuesDefault.keys())
+      item, ok = QInputDialog().getItem(self, "ECC parameter","Optional second parameter optimized jointly, e.g. the time constant", allParams, 0, False)
+      if not ok:
+        return
+      if item!='none' and item not in scanParams:
+          scanParams.append(item)
+      bounds=[]
+      for p in scanParams:
+          isTime=p.find('T')!=-1       #time constants are entered and set in ms
+          units='(ms)' if isTime else '(-10 to 10)'
+          lo, ok = QInputDialog().getDouble(self, p+" Lower Bound",units, 0 if isTime else -5, 0 if isTime else -10, 10000 if isTime else 10,decimals=2)
+          if not ok:
+            return
+          hi, ok = QInputDialog().getDouble(self, p+" Upper Bound",units, 10 if isTime else 5, 0 if isTime else -10, 10000 if isTime else 10,decimals=2)
+          if not ok:
+            return
+          bounds.append((min(lo, hi), max(lo, hi)))
+      objective, ok = QInputDialog().getItem(self, "ECC objective","Quantity to optimize", ['Maximize FID amplitude', 'Minimize peak width'], 0, False)
+      if not ok:
+        return
+      maxEvaluations, ok = QInputDialog().getInt(self, "Maximum acquisitions","1 to 1000",min(evaluationBudget(bounds), 1000), 1, 1000)     #enough for every line search
+      if not ok:
+        return
+      def formatParam(p, v):
+          return '{:.4f}m'.format(v) if p.find('T')!=-1 else '{:.2f}'.format(v)
+      def setParameters(values):
+          for p, v in values.items():
+              self.TNMR.setNMRParameter(p, formatParam(p, v))
+      def acquire():      #the acquisition is aborted by the abort button
+          if not runBlocking(self.runCurrentTNMRFileSteps(), wait=self.pause, aborted=lambda: self.recipeAbort, pollInterval=0.1):
+              raise ScanAborted()     #partial data is not evaluated
+          self.tntData=self.getTNMRdata(self.TNMR.ndSize())
+          return self.tntData
+      self.ui.cbProtocol.setCurrentText('scanECCParam')
+      self.openProtocol()
+      if self.ui.chbSetObserveFreqToCenterFreq.isChecked():
+            self.setObsFrequency()
+            self.TNMR.setNMRParameter("Observe Freq.", '{:.6f}MHz'.format(self.TNMR.ObsFreq/10**6))
+      metric='fidAmp' if objective.startswith('Maximize') else 'pkwidth'
+      self.message('Adaptive ECC scan of {}, bounds={}, {}, max acquisitions={}'.format(', '.join(scanParams), bounds, objective, maxEvaluations), bold=True,ctime=False, color='red')
+      paramPlot=plotWindow(self)
+      paramPlot.setWindowTitle('Adaptive ECC scan ' + ', '.join(scanParams))
+      scanCurve=paramPlot.dplot.plot([], [], pen=None, symbol='o')
+      paramPlot.show()
+      xs, ys=[], []
+      def evaluation(n, values, result):
+          xs.append(values[scanParams[0]] if len(scanParams)==1 else n)      #joint searches are plotted against the acquisition number
+          ys.append(result[metric])
+          scanCurve.setData(xs, ys)
+          print ('values=', values, ', fidAmp=', result['fidAmp'], ', avFreq=', result['avFreq'], ', peak width(Hz)=', result['pkwidth'])
+      self.recipeAbort=False
+      t0=time.time()
+      scan=AdaptiveScan(setParameters, acquire, scanParams, bounds, metric=metric, maximize=(metric=='fidAmp'), analyze=analyzeFID,
+                        analyzeArgs=(self.TNMR.DwellTime,), maxEvaluations=maxEvaluations, onEvaluation=evaluation, aborted=lambda: self.recipeAbort)
+      self.scannedECCResults=scan.run()
+      optimum=self.scannedECCResults['optimum']
+      setParameters(optimum)
+      stemp=', '.join('{}={}+-{:.3g}'.format(p, formatParam(p, v), self.scannedECCResults['uncertainty'][p]) for p, v in optimum.items())
+      self.message('Adaptive ECC scan optimum {}, {}={:.4g}, {} acquisitions in {:.1f}s'.format(stemp, metric, self.scannedECCResults['metric'],
+                   self.scannedECCResults['evaluations'], time.time()-t0), color='red')
+      if self.scannedECCResults['aborted']:
+          self.message('Adaptive ECC scan aborted, optimum is from the acquisitions so far', color='red')
+      elif self.scannedECCResults['exhausted']:
+          self.message('Adaptive ECC scan stopped at {} acquisitions before converging, increase the maximum'.format(maxEvaluations), color='red')
+
   def loadECCFile(self,ECCFile=''):
     '''Open ascii Eddy Current COrrection (ECC) file and load into TNMR'''
     if ECCFile=='' or ECCFile==False:
@@ -1669,18 +1777,18 @@ class MRIcontrol(QMainWindow):
                 if  np.absolute(float(valuestring))!=self.TNMR.B0CompValuesDefault[key]: 
                     self.B0CompLabels[key].setStyleSheet("background-color: rgb(100, 255, 100)")       #set background to green if > 0
                 if key.find('T')==-1:
-                    self.TNMR.currentFile.SetNMRParameter(key, valuestring)
+                    self.TNMR.setNMRParameter(key, valuestring)
                 else:             
-                    self.TNMR.currentFile.SetNMRParameter(key, '{:6.4f}m'.format(float(valuestring)*1000))       #if parameter is a time constant convert to ms and add an m    
+                    self.TNMR.setNMRParameter(key, '{:6.4f}m'.format(float(valuestring)*1000))       #if parameter is a time constant convert to ms and add an m    
             else:
               if key in self.gradPreEmphasisLabels.keys():
                 self.gradPreEmphasisLabels[key].setText(valuestring)
                 if np.absolute(float(valuestring))!=self.TNMR.gradPreEmphasisValuesDefault[key]: 
                     self.gradPreEmphasisLabels[key].setStyleSheet("background-color: rgb(100, 255, 100)")       #set background to green if > 0
                 if key.find('T')==-1:
-                    self.TNMR.currentFile.SetNMRParameter(key, valuestring)
+                    self.TNMR.setNMRParameter(key, valuestring)
                 else:             
-                    self.TNMR.currentFile.SetNMRParameter(key, '{:6.4f}m'.format(float(valuestring)*1000))       #if parameter is a time constant convert to ms and add an m    
+                    self.TNMR.setNMRParameter(key, '{:6.4f}m'.format(float(valuestring)*1000))       #if parameter is a time constant convert to ms and add an m    
     f.close()
     self.message('Loaded ECC file:{}'.format(self.currentECCFile)) 
           
@@ -1738,16 +1846,16 @@ class MRIcontrol(QMainWindow):
   def processRFTxCal(self): 
           '''Process RF calibration data'''
           self.RFTxCalData=self.tntData[:,:,0,0] #FIDs versus RF transmit power
-          self.fftRFTxCalData=np.fft.fftshift(np.fft.fft(self.RFTxCalData, axis=0),axes=0)      #Fourier transfrom, find and phase peak, integrate
-          self.RFTxCalPeakIndex=np.argmax(np.abs(self.fftRFTxCalData[:,4]))
+          self.fftRFTxCalData=np.fft.fftshift(fftBackend.fft(self.RFTxCalData, axis=0),axes=0)      #Fourier transfrom, find and phase peak, integrate
+          self.RFTxCalPeakIndex=int(peakAnalysis.peakIndex(np.abs(self.fftRFTxCalData[:,4])))
           dphase=np.angle(self.fftRFTxCalData[self.RFTxCalPeakIndex,4])
           self.ui.leRFCalinfo.setText('Peak located at {}, phased adjust={:.2f}'.format(self.RFTxCalPeakIndex,dphase))
           self.fftRFTxCalData=self.fftRFTxCalData*np.exp(-1j*dphase)
           spectraReal=self.fftRFTxCalData.real
-          self.RFSignal=np.trapz(spectraReal[self.RFTxCalPeakIndex-10:self.RFTxCalPeakIndex+10], axis=0)    #Integrate about largest peak
+          self.RFSignal=peakAnalysis.integral(spectraReal, halfWidth=10, center=self.RFTxCalPeakIndex)    #Integrate all spectra about largest peak
           #self.RFSignal=np.trapz(self.RFTxCalData.real, axis=0)
           self.RFSignal/=self.RFSignal.max()  #normalize
-          self.rfAttnArray=np.fromstring(self.TNMR.currentFile.GetTable('rfAttn'), sep=' ')
+          self.rfAttnArray=np.fromstring(self.TNMR.getTable('rfAttn'), sep=' ')
           self.b1MagArray=(10**((60-self.rfAttnArray)/20))/10     #B1 amplituse normalized so 0attn with max DAC output=100   
           if self.ui.sbRFCalnFitPoints.value()==0 or self.ui.sbRFCalnFitPoints.value()>len(self.RFSignal):  #set number of points to fit
               npoints=len(self.RFSignal)
@@ -1992,6 +2100,7 @@ class MRIcontrol(QMainWindow):
       if self.ui.rbImmediate.isChecked() or self.recipeRunning:     #execute shim procedure either in immediate or recipeRunning mode
           self.message("Shimming")
           self.shimmingInProgress=True
+          shimStart=time.time()
           if NMRShimFile != '':
               shimfile=self.addPathname(NMRShimFile)
               self.TNMR.openFile(shimfile)
@@ -2009,6 +2118,7 @@ class MRIcontrol(QMainWindow):
                           self.message('Aborting TNMR Shim execution')
                           self.TNMR.abort()
                           return
+                  self.shimDuration=time.time()-shimStart
                   if autoSave:
                     if NMRShimFile != '':  
                         fn=shimfile.replace('.tnt', '_Shims' +'.tnt')
@@ -2064,7 +2174,7 @@ class MRIcontrol(QMainWindow):
       try:
           self.TNMR.abort()
           self.message('TNMR Aborted', bold=True,ctime=True, color='red')
-          self.recipeAbort=True
+          self.abortRecipe()
       except:
           self.message('Abort cannot be implemnted')
                               
@@ -2118,16 +2228,20 @@ class MRIcontrol(QMainWindow):
       return None
     self.recipeFileName=fileName
     self.ui.lblRecipeFileName.setText(fileName)
-    f = open(str(fileName), 'r')
+    with open(str(fileName), 'r') as f:
+        self.setRecipeText(f.read())
+
+  def setRecipeText(self, text):
+    '''replaces the recipe in the recipe editor with text, formats so comands are in bold'''
     self.ui.txtRecipe.clear()
-    for line in f:
+    for line in text.split('\n'):
       if line.find('\a') !=-1:
               line=line.replace('\a', '<b>\a', 1)
               line=line.replace('(', '</b>(', 1)
       if line.find('#') !=-1:
               line=line.replace('#', '<b>#', 1)
               line=line.replace(':', '</b>:', 1)
-      self.ui.txtRecipe.append(line.strip('\n')) #
+      self.ui.txtRecipe.append(line) #
                 
   def saveRecipeFile (self):
     f = QFileDialog.getSaveFileName(parent=None, caption="Recipe File Name",filter="*.rcp")
@@ -2142,37 +2256,70 @@ class MRIcontrol(QMainWindow):
     f.close()
     self.ui.lblRecipeFileName.setText(self.recipeFileName) 
     
+  def recipeCommands(self):
+    '''recipe commands that wait without blocking the GUI, {name after \a: generator function}'''
+    return {'RunTNMRfile':self.runTNMRfileSteps, 'runCurrentTNMRFile':self.runCurrentTNMRFileSteps, 'setTemperature':self.setTemperatureSteps, 'pause':self.pauseSteps}
+
   def executeRecipe(self):
-    '''executes a recipe, takes text from recipe textbox and executes it line by line in Python using exec(line) '''
-    if self.recipePreCheck()==False:
+    '''executes a recipe, the recipe text is parsed and compiled once and run by a RecipeEngine ticked from a QTimer,
+    pressing the button while a recipe is running pauses or resumes it'''
+    if self.recipeEngine is not None and self.recipeEngine.running:
+        self.pauseRecipe()
+        return
+    if self.recipePreCheck()==False:      #compiles the recipe into self.currentRecipe
         return
     self.recipeAbort=False      #set abort flag to False, abort if it is True
     self.recipeRunning=True
     self.nUpdates=1
     self.startTime=time.time()
-    #self.ui.rbAddtoRecipe.setChecked(True)      #want to be recipe edit mode while recipe is running
     self.currentRecipeHTML=self.ui.txtRecipe.toHtml()
-    self.currentRecipe=self.ui.txtRecipe.toPlainText().replace('\a','self.').split('\n')     #recipe is a tuple of commands
     self.message('***Starting Recipe***',color='blue')
     self.ui.lblRecipeRunning.setText('Recipe Running')
     self.ui.lblRecipeRunning.setStyleSheet("QLabel { background-color : rgb(0,255,0)}")
+    self.ui.pbExectuteQueue.setText('Pause Recipe')
     self.currentRecipeStep=0
-    for icommand, command in enumerate(self.currentRecipe):
-        if self.recipeAbort==True:
-            self.recipeRunning=False
-            self.message('Recipe aborted')
-            break
-        if command.strip() != ''  : #execute command if it has something in it and it does not start with a comment sign
-            self.currentRecipeStep+=1
-            app.processEvents()     #check events especially abort flag
-            self.iCommand=icommand      #used to index line to set highlight in recipe editor
-            self.message(command)
-            self.addGreenArrowToRecipe(self.iCommand)
-            self.monitorInstruments()       #monitor instruments in case command is too short
-            exec(command)
+    if self.recipeFileName != '':       #append monitor data to a log while the recipe runs
+        self.monitorData.openLog(os.path.splitext(self.recipeFileName)[0] + time.strftime("_%Y%m%d_%H_%M") + '_monitor.dat', header=self.dataHeader)
+    self.recipeEngine=RecipeEngine(self.currentRecipe, dict(globals(), self=self), commands=self.recipeCommands(), onStep=self.recipeStep, onFinish=self.recipeFinished,
+                                   onWait=lambda w: self.message('Waiting for ' + w.description))
+    self.recipeTimer=QTimer(self)
+    self.recipeTimer.timeout.connect(self.recipeEngine.tick)
+    self.recipeTimer.start(int(self.recipeTickInterval*1000))
+    self.recipeEngine.start()
+
+  def recipeStep(self, index, step):
+    '''called by the recipe engine before each step'''
+    self.currentRecipeStep+=1
+    self.iCommand=step.lineNumber      #used to index line to set highlight in recipe editor
+    self.message(step.source)
+    self.addGreenArrowToRecipe(self.iCommand)
+    self.monitorInstruments()       #monitor instruments in case command is too short
+
+  def recipeFinished(self, status, error):
+    '''called by the recipe engine when the recipe is completed, aborted or stopped by an error'''
+    self.recipeTimer.stop()
+    if status=='aborted':
+        self.message('Recipe aborted', color='red')
+    if status=='error':
+        self.message('Recipe stopped at line {}: {}'.format(self.iCommand+1, error), color='red')
+    self.ui.pbExectuteQueue.setText('Execute Recipe')
+    self.monitorData.closeLog()
     self.endRecipe()
     self.recipeRunning=False
 
+  def pauseRecipe(self):
+    '''pauses or resumes the running recipe, a running acquisition continues'''
+    if self.recipeEngine.state=='paused':
+        self.recipeEngine.resume()
+        self.ui.pbExectuteQueue.setText('Pause Recipe')
+        self.ui.lblRecipeRunning.setText('Recipe Running')
+        self.message('Recipe resumed', color='blue')
+    else:
+        self.recipeEngine.pause()
+        self.ui.pbExectuteQueue.setText('Resume Recipe')
+        self.ui.lblRecipeRunning.setText('Recipe Paused')
+        self.message('Recipe paused', color='blue')
+
   def endRecipe(self):
     '''housekeeping at the end of a recipe'''
     self.ui.lblRecipeRunning.setText('Recipe Completed')
@@ -2182,17 +2329,17 @@ class MRIcontrol(QMainWindow):
     self.ui.txtRecipe.insertHtml(self.currentRecipeHTML)
     self.currentRecipeStep=0
     self.iCommand=-1
-    if self.recipeFileName != '':       #Save monitor data to a file
-        try:
-            self.dataPlot.saveData(self.recipeFileName)
-        except:
-            raise
+    if self.recipeFileName != '':       #Save step timings, the monitor data is already in the _monitor.dat log written during the recipe
+        if self.monitorData.logFile is not None:
+            self.message('Monitor data saved in ' + self.monitorData.logFile)
+        with open(os.path.splitext(self.recipeFileName)[0] + '_timing.txt', 'w') as f:
+            f.write(self.recipeEngine.timingReport())
     self.message('***Recipe Completed***',color='blue', ctime=True)
 
   def abortRecipe(self): 
     self.recipeAbort=True
-    self.ui.pbAbortRecipe.setStyleSheet("QLabel { background-color : rgb(0,255,0)}")
-    self.ui.pbAbortRecipe.setText('Aborting')
+    if self.recipeEngine is not None:
+        self.recipeEngine.abort()
 
   def addGreenArrowToRecipe(self, nline):
     '''adds an arrow to indicate which line of the recipe is executing'''
@@ -2241,41 +2388,60 @@ class MRIcontrol(QMainWindow):
       self.ui.txtRecipe.setHtml(self.currentRecipeHTML)
 
   def recipePreCheck(self):
-    '''Recipe precheck: check files exist, temperatures are within range'''
-    lines=self.ui.txtRecipe.toPlainText().replace('\a','self.').split('\n')     #recipe is a tuple of commands
-    nCommand=0
-    passCheck=True
-    for icommand, command in enumerate(lines):
-        if command.strip() != '' and command.strip()[0] != '#': #skip whitespace and comments
-            if command.find('openTNMRfile(file=')>=0:
-                fs=command.find(r'openTNMRfile(file="')+ len(r'openTNMRfile(file="')
-                fe=command.find(r'",')
-                fname=command[fs:fe]
-                if os.path.isfile(fname)==False:
-                    self.message('Line{}: File {} does not exist'.format(icommand,fname), color='red')
-                    passCheck=False
-            if command.find('setTemperature(temperature=')>=0:
-                fs=command.find('setTemperature(temperature=')+len('setTemperature(temperature=')
-                fe=command.find(',')
-                temperature=float(command[fs:fe])
-                if temperature <self.TemperatureNMRMin or temperature >self.TemperatureNMRMax:
-                    self.message('Line{}: temperature {:.2f} is out of bounds'.format(icommand, temperature), color='red')
-                    passCheck=False
-            if command.find('N2Temp=')>=0:
-                fs=command.find('N2Temp=')+len('N2Temp=')
-                fe=command.find(',',fs,-1)
-                N2Temp=float(command[fs:fe])
-                if N2Temp <self.N2TempMin or N2Temp >self.N2TempMax:
-                    self.message('Line{}: N2 temperature {:.2f} is out of bounds'.format(icommand, N2Temp), color='red')
-                    passCheck=False
-        nCommand+=1
-    if passCheck:
-        self.message('Recipe PreCheck OK', color='green')
-        return True
-    else:
+    '''Recipe precheck: compiles the recipe into self.currentRecipe, checks every line is a recipe command with valid arguments,
+    temperatures are within range and the files exist, reads the headers of the files'''
+    t0=time.perf_counter()
+    try:
+        self.currentRecipe=compileRecipe(self.ui.txtRecipe.toPlainText(), commands=self.recipeCommands(), limits=self.recipeLimits(),
+                                         choices={'startShims':self.initialShims})     #list of compiled recipe steps
+    except RecipeError as e:
+        for line in str(e).split('\n'):
+            self.message(line, color='red')
         self.message('Recipe PreCheck Fail', color='red')
         return False
+    self.message('Recipe compiled: {} steps in {:.0f}ms'.format(len(self.currentRecipe), 1000*(time.perf_counter()-t0)))
+    self.estimateRecipeTime()
+    self.message('Recipe PreCheck OK', color='green')
+    return True
+
+  def recipeLimits(self):
+    '''{argument: (min, max)} of numeric recipe command arguments, None for no bound'''
+    return {'temperature':(self.TemperatureNMRMin, self.TemperatureNMRMax), 'tsp':(self.ChillerMinT, self.ChillerMaxT),
+            't':(0, None), 'temperatureStableRange':(0, None)}
            
+  def recipeStartTemperature(self):
+    '''current sample temperature, or the desired temperature if the thermometer is not read'''
+    if np.isnan(self.opsensTemperature):
+        return self.ui.dspboxDesiredSampleTemp.value()
+    return self.opsensTemperature
+
+  def estimateRecipeTime(self):
+    '''estimates the duration of each recipe step from the .tnt headers, the temperature history and the last shim, reports the total'''
+    self.temperatureModel.fit(np.asarray(self.monitorData), stableRange=self.temperatureStableRange)
+    plan=recipePlanner.planRecipe(self.ui.txtRecipe.toPlainText(), self.temperatureModel, shimTime=self.shimDuration,
+                                  startTemperature=self.recipeStartTemperature())
+    for step in plan:
+        if step['note']!='':
+            self.message('Line{}: {} {}'.format(step['line'], step['command'], step['note']), color='orange')
+    summary=recipePlanner.planSummary(plan)
+    self.message('Estimated recipe time {}: acquisition {}, temperature {}, shim {} (ramp {:.2f}C/min, settle {:.0f}s from {} logged changes)'.format(
+        *[str(timedelta(seconds=round(summary.get(k, 0)))) for k in ('total', 'acquisition', 'temperature', 'shim')],
+        60*self.temperatureModel.rampRate, self.temperatureModel.settleTime, self.temperatureModel.nTransitions), color='blue')
+    return summary
+
+  def optimizeRecipeOrder(self):
+    '''merges recipe blocks at the same temperature and orders them by temperature to minimize temperature changes and shims'''
+    text=self.ui.txtRecipe.toPlainText()
+    try:
+        newText=recipePlanner.reorderRecipe(text, startTemperature=self.recipeStartTemperature())
+    except RecipeError as e:
+        self.message('Recipe can not be reordered, ' + str(e), color='red')
+        return
+    before, after=recipePlanner.temperatureChanges(text), recipePlanner.temperatureChanges(newText)
+    self.setRecipeText(newText)
+    self.message('Recipe reordered: temperature changes {} to {}, shims {} to {}'.format(before[0], after[0], before[1], after[1]), color='blue')
+    self.estimateRecipeTime()
+
   def formatRecipe(self, recipe):
       '''adds formating, eg commands in bold, for easy reading'''
       lines=recipe.split('\n')
@@ -2299,11 +2465,11 @@ class MRIcontrol(QMainWindow):
           self.updatePS()       #update current pulse sequence with entries in pyMRI
  #     self.TNMR.compilePS
       #self.TNMR.getPSparams()
-      self.ui.leExpectedAcqTime.setText(str(timedelta(seconds=round(self.TNMR.currentFile.GetSequenceTime))))
+      self.ui.leExpectedAcqTime.setText(str(timedelta(seconds=round(self.TNMR.getSequenceTime()))))
       self.message('Running ' + self.NMRfileName , bold=True,ctime=True, color='green')
       self.runCurrentTNMRFile()
       self.TNMR.getPSparams()
-      self.dataArrayDimen=(self.TNMR.currentFile.GetNDSize(1),self.TNMR.currentFile.GetNDSize(2),self.TNMR.currentFile.GetNDSize(3),self.TNMR.currentFile.GetNDSize(4))
+      self.dataArrayDimen=self.TNMR.ndSize()
       self.tntData=self.getTNMRdata(self.dataArrayDimen)
       self.currentRawDataRealmax=np.amax(np.abs(self.tntData.real))
       self.currentRawDataImagmax=np.amax(np.abs(self.tntData.imag))
@@ -2354,7 +2520,7 @@ class MRIcontrol(QMainWindow):
       if self.ui.chbUpdateBeforeRun.isChecked():
           self.updatePS()       #update and save pulse sequences
       self.TNMR.saveCurrentFile(filename=file) 
-      runtime=str(timedelta(seconds=round(self.TNMR.currentFile.GetSequenceTime)))
+      runtime=str(timedelta(seconds=round(self.TNMR.getSequenceTime())))
       self.ui.txtRecipe.append('<b>\aRunTNMRfile</b>(file="{}", autoSave={},waitUntilDone={},comment="{}", runtime="{}")'.format(file,  autoSave, waitUntilDone, comment, runtime))
       self.ui.txtRecipe.append('')
       
@@ -2400,6 +2566,8 @@ class MRIcontrol(QMainWindow):
   def addCommandToRecipe(self):
       if self.ui.cbAddRecipeCommand.currentText()=='Set Temperature':
         self.addSetTemperaturetoQueue()
+      if self.ui.cbAddRecipeCommand.currentText()=='Optimize Recipe Order':
+        self.optimizeRecipeOrder()
           
   def clearMessages(self):
       self.ui.txtMessages.clear() 
@@ -2432,6 +2600,10 @@ class MRIcontrol(QMainWindow):
                
   def runCurrentTNMRFile(self, waitUntilDone=True):
       '''Runs current TNMR file and updates busy flags'''
+      runBlocking(self.runCurrentTNMRFileSteps(waitUntilDone), wait=self.pause, aborted=lambda: self.recipeAbort)
+
+  def runCurrentTNMRFileSteps(self, waitUntilDone=True):
+      '''runCurrentTNMRFile as a recipe command, waits until the acquisition is complete, aborts the acquisition if the recipe is aborted'''
       if self.TNMRbusy:
         QMessageBox.warning(None, "TNMR Active", "Need to wait")
         return
@@ -2440,22 +2612,35 @@ class MRIcontrol(QMainWindow):
       self.TNMRStartTime=time.time()
       self.ui.progressbarTNMR.setValue(0)
       if waitUntilDone:
-        while self.TNMR.checkAcquisition():
-            self.TNMRbusy=True
-            self.setTNMRbusyflag(self.TNMRbusy)
-            self.TNMRRunTime=time.time()-self.TNMRStartTime
-            self.pause(1)
-            if self.recipeAbort:
-                self.message('Aborting TNMR file execution')
-                self.TNMR.abort()
-                return
-            
+          try:
+              yield Until(self.acquisitionComplete, description='acquisition complete')
+          except GeneratorExit:
+              self.message('Aborting TNMR file execution')
+              self.TNMR.abort()
+              raise
+
+  def acquisitionComplete(self):
+      '''True when TNMR is not acquiring, updates busy flags and run time while it is'''
+      if self.TNMR.checkAcquisition():
+          self.TNMRbusy=True
+          self.setTNMRbusyflag(self.TNMRbusy)
+          self.TNMRRunTime=time.time()-self.TNMRStartTime
+          return False
+      if self.TNMRbusy:     #so the next run is not refused before the monitor timer sees TNMR idle
+          self.TNMRbusy=False
+          self.setTNMRbusyflag(self.TNMRbusy)
+      return True
+
   def RunTNMRfile(self, file=None, autoSave=False, waitUntilDone=False, comment='', closeFileAfterUse=True, runtime=''):
     '''Opens and runs TNMR file and optionally runs and saves file. Mainly used in recipes'''
+    runBlocking(self.runTNMRfileSteps(file, autoSave, waitUntilDone, comment, closeFileAfterUse, runtime), wait=self.pause, aborted=lambda: self.recipeAbort)
+
+  def runTNMRfileSteps(self, file=None, autoSave=False, waitUntilDone=False, comment='', closeFileAfterUse=True, runtime=''):
+    '''RunTNMRfile as a recipe command, waits for the acquisition without blocking the GUI'''
     self.studyDirectory=os.path.dirname(file)
     self.closeActiveFile=False    #do not close on open, will close after use
     self.openTNMRfile(file=file)
-    self.runCurrentTNMRFile(waitUntilDone=waitUntilDone)
+    yield from self.runCurrentTNMRFileSteps(waitUntilDone=waitUntilDone)
     #******Finished acquisition*****
     Tav, Tsd =self.recipeStatistics(self.currentRecipeStep)
     stemp='Recipe step={}, Tave(C)={:.3f}, Tstd(C)={:.3f}'.format(self.currentRecipeStep,Tav,Tsd )
@@ -2464,7 +2649,7 @@ class MRIcontrol(QMainWindow):
     #self.ui.lblTNMRComment.setText('{}'.format(self.TNMR.comment)) 
     if autoSave:
         try:      #get pulse sequence finish time and add to end of filename
-              self.TNMR.finishTime=self.TNMR.currentFile.GetNMRParameter('Exp. Finish Time')
+              self.TNMR.finishTime=self.TNMR.getNMRParameter('Exp. Finish Time')
               ftime=datetime.strptime(self.TNMR.finishTime,'%A,%B %d,%Y:%H:%M:%S')
         except:
             try:
@@ -2478,17 +2663,19 @@ class MRIcontrol(QMainWindow):
             ft='_' + ftime.strftime("%Y%m%d_%H%M") +'.tnt'
         saveFileName=file.replace('.tnt', ft)
         self.TNMR.saveCurrentFile(filename=saveFileName) 
+        if self.readSavedTNTData:
+            self.tntData=self.getTNMRdata(tntFile=saveFileName)
     if closeFileAfterUse:
           self.message('Closing file', color='orange')
-          self.pause(2)
+          yield Delay(2)
           self.TNMR.closeActiveFile()
         
   def recipeStatistics(self, rstep=0):
-    '''Calculates ave and std deviation of environmental parameters for recipe step =rstep'''
+    '''Calculates ave and std deviation of environmental parameters for recipe step =rstep, from every monitor update during the step'''
     try:
-        data  =self.dataArray[self.dataArray[:,1] ==rstep]      #pick data from second column that has recipe step=rstep
-        tav=np.average(data[:,4])   #pick data from fifth column that hasFO temperature
-        tsd=np.std(data[:,4])
+        data  =self.monitorData.column(4)[self.monitorData.column(1) ==rstep]      #pick FO temperatures from fifth column for rows with recipe step=rstep in the second column
+        tav=np.average(data)
+        tsd=np.std(data)
         return tav, tsd
     except:
         return np.nan, np.nan
@@ -2517,9 +2704,7 @@ class MRIcontrol(QMainWindow):
       
   def regneratePhaseEncodeArray(self,nphases, nacqpoints):
       '''recalculates phase encode aray, +-100 = +- 180deg, defalts to a linear array from positive to negative'''
-      endvalue=int(nphases/nacqpoints*100)
-      a0=2*endvalue/(nphases-1)
-      self.phaseEncodeArray=np.linspace(endvalue-a0,-endvalue,nphases)
+      self.phaseEncodeArray=gradients.phaseEncodeArray(nphases, nacqpoints)
      
 #**************ROIs**********************************
 
@@ -2536,21 +2721,10 @@ class MRIcontrol(QMainWindow):
 #*******************Diffusion calculations/fitting*************************************************
 
   def STbvalue(self,  g=0.1, delta=0.01, Delta=0.01, risetime=0.0001, pulsetype='trap'):
-    '''calculates  diffusion b-values according to generalized Stejskal-Tanner equation
+    '''calculates  diffusion b-values according to generalized Stejskal-Tanner equation, see mricore.diffusion.stejskalTanner
      delta=grad pulse duration, Delta=grad pulse separation, risetime is the the grad pulse rise and falltime, all times in s'''
-    gamma=self.Gamma
-    if pulsetype=='trap':
-        epsilon=risetime/delta
-        sigma=1-epsilon
-        lamda=0.5
-        kappa=0.5-sigma/6+epsilon**3/60/sigma**2-epsilon**2/12/sigma
-    if pulsetype=='hSin':
-        sigma=2/np.pi
-        lamda=0.5
-        kappa=3.0/8.0    
-    b=1E-6*(sigma*gamma*delta*g)**2*(Delta-2*(lamda-kappa)*delta)       #value calculated in SI s/m^2; convert to s/mm^2, exception to SI rule!
+    b=diffusion.stejskalTanner(g, delta, Delta, risetime, pulsetype)       #s/mm^2, exception to SI rule!
     self.message('<b>b-Value calculated using ST formula:</b> {} pulse, risetime(ms)={:.4f}, duration(ms)={:.4f}, pulse spacing(ms){:.4f}'.format(pulsetype, risetime*1000, delta*1000, Delta*1000))
-#    bRect=1E-6*(gamma*delta*g)**2*(Delta-delta/3)
     return b    
 #***************Picoscope methos*********************
       
@@ -2601,9 +2775,10 @@ class MRIcontrol(QMainWindow):
   def replotData(self):
       self.plotData(self.psPlotData)
       
-  def plotData(self,data):
-    '''plots NMR/MRI data vs index, time, freq,'''  
+  def plotData(self,data, phase=None):
+    '''plots NMR/MRI data vs index, time, freq, with a zero order phase correction phase(radians), None keeps the current phase if data is already plotted'''  
     self.psPlotData=data
+    self.dataViews.setData(data, phase)     #FFTs are only recomputed when the data changes
     self.iStart=int(self.ui.leiStart.text())
     self.jStop=int(self.ui.lejStop.text())
     self.nSlice=self.psPlotData.shape[1]
@@ -2617,7 +2792,6 @@ class MRIcontrol(QMainWindow):
     npoints=dshape[0]
     self.tfid=np.arange(dshape[0]) * self.TNMR.DwellTime
     self.sfreq=-(np.fft.fftshift(np.fft.fftfreq(npoints, self.TNMR.DwellTime)))
-    self.psFFTData=np.fft.fftshift(np.fft.fft(self.psPlotData, axis=0), axes=0)  
     nSlice=self.ui.sbPSDataSlice.value()
     nPhase=self.ui.sbPSDataPhase.value()
     nParam=self.ui.sbPSDataParameter.value()
@@ -2645,24 +2819,25 @@ class MRIcontrol(QMainWindow):
     # p1=pg.mkPen(pg.intColor(i+self.penstep+1), width=2)
     # p2=pg.mkPen(pg.intColor(i+self.penstep+2), width=2)
     self.dataMagPlot.setLogMode(self.ui.cbPSDataLogX.isChecked(), self.ui.cbPSDataLogY.isChecked())
+    column=(nSlice,nPhase,nParam)
     if self.ui.rbPSDataFID.isChecked():
                   if self.ui.rbPSDataMagnitude.isChecked():
-                      self.dataMagPlot.plot(x, np.absolute(self.psPlotData[:,nSlice,nPhase,nParam]), pen=p, width=2, name='FID Mag')   #plot mag
+                      self.dataMagPlot.plot(x, self.dataViews.view('fid', 'mag', column), pen=p, width=2, name='FID Mag')   #plot mag
                   if self.ui.rbPSDataPhase.isChecked():
-                      self.dataMagPlot.plot(x, np.angle(self.psPlotData[:,nSlice,nPhase,nParam]), pen=p, width=2, name='FID Phase')   #plot Phase
+                      self.dataMagPlot.plot(x, self.dataViews.view('fid', 'phase', column), pen=p, width=2, name='FID Phase')   #plot Phase
                   if self.ui.rbPSDataReal.isChecked():
-                      self.dataMagPlot.plot(x, self.psPlotData[:,nSlice,nPhase,nParam].real, pen=p1, width=2, name='FID Real')   #plot real
+                      self.dataMagPlot.plot(x, self.dataViews.view('fid', 'real', column), pen=p1, width=2, name='FID Real')   #plot real
                   if self.ui.rbPSDataImag.isChecked():
-                      self.dataMagPlot.plot(x, self.psPlotData[:,nSlice,nPhase,nParam].imag, pen=p2, width=2, name='FID Imag')   #plot imag
+                      self.dataMagPlot.plot(x, self.dataViews.view('fid', 'imag', column), pen=p2, width=2, name='FID Imag')   #plot imag
     if self.ui.rbPSDataSpectra.isChecked():
                   if self.ui.rbPSDataMagnitude.isChecked():
-                      self.dataMagPlot.plot(x, np.absolute(self.psFFTData[:,nSlice,nPhase,nParam]), pen=p, width=2, name='FFT Mag')   #plot Mag
+                      self.dataMagPlot.plot(x, self.dataViews.view('spectrum', 'mag', column), pen=p, width=2, name='FFT Mag')   #plot Mag
                   if self.ui.rbPSDataPhase.isChecked():
-                      self.dataMagPlot.plot(x, np.angle(self.psFFTData[:,nSlice,nPhase,nParam]), pen=p, width=2, name='FFT Phase')   #plot Phase
+                      self.dataMagPlot.plot(x, self.dataViews.view('spectrum', 'phase', column), pen=p, width=2, name='FFT Phase')   #plot Phase
                   if self.ui.rbPSDataReal.isChecked():
-                      self.dataMagPlot.plot(x, self.psFFTData[:,nSlice,nPhase,nParam].real, pen=p1, width=2, name='FFT Real')   #plot real
+                      self.dataMagPlot.plot(x, self.dataViews.view('spectrum', 'real', column), pen=p1, width=2, name='FFT Real')   #plot real
                   if self.ui.rbPSDataImag.isChecked():
-                      self.dataMagPlot.plot(x, self.psFFTData[:,nSlice,nPhase,nParam].imag, pen=p1, width=2, name='FFT Imag')   #plot real
+                      self.dataMagPlot.plot(x, self.dataViews.view('spectrum', 'imag', column), pen=p1, width=2, name='FFT Imag')   #plot real
     self.dataMagPlot.setLabel('bottom',self.dataXLabel)
     self.dataMagPlot.setLabel('left', 'Signal')
     self.penstep+=10 
@@ -2674,34 +2849,26 @@ class MRIcontrol(QMainWindow):
               
   def setPSDataPhase(self, phaseSpectra=0, firstSIndex=False):
     '''Set phase for all spectra default using first spectra and simplest algorythym find maximum signal phase to make real part maximum and imaginary zero'''
-    marg=np.argmax(np.abs(self.psFFTData[:,phaseSpectra,0,0]))
-    dphase=np.angle(self.psFFTData[marg,phaseSpectra,0,0])
-    self.psPlotData=self.psPlotData*np.exp(-1j*dphase)
-    y=np.fft.fftshift(np.fft.fft(self.psPlotData[:,phaseSpectra,0,0])).real
-    maxVal=np.amax(y)   #find the maximum value, will select region around this maximum value to integrate
-    maxInd=np.argmax(y)
-    maxVal50 = 0.5*maxVal
-    biggerCondition = [a > maxVal50 for a in y] #returns boolean array which is true for values above 50% of max value
-    width=np.sum(biggerCondition)   #returns number of points above 50 max  ***Needs to be fixed if there are several large peaks***
-    df=np.absolute(self.sfreq[1]-self.sfreq[0])
-    self.FirstPeakFWHM=width*df
-    self.currentF0=self.sfreq[maxInd]+self.TNMR.ObsFreq
+    spectrum=self.dataViews.view('spectrum', 'complex', (phaseSpectra,0,0))
+    marg=np.argmax(np.abs(spectrum))
+    dphase=np.angle(spectrum[marg])
+    self.dataViews.setData(self.psPlotData, self.dataViews.phase+dphase)     #phase correct the cached spectra instead of the data
+    y=self.dataViews.view('spectrum', 'real', (phaseSpectra,0,0))
+    peak=peakAnalysis.analyzeSpectra(y, self.sfreq)     #F0 and FWHM interpolated between points
+    self.FirstPeakFWHM=float(peak['FWHM'])
+    self.currentF0=float(peak['F0'])+self.TNMR.ObsFreq
     self.ui.leCurrentF0.setText("{:.6f}".format(self.currentF0/10**6))
-    self.plotData(self.psPlotData)  #plot data
+    self.plotData(self.psPlotData, self.dataViews.phase)  #plot data
     self.ui.lePSDataFWHM.setText('{:.2f}'.format(self.FirstPeakFWHM))
 
   def plotF0PeakWidth(self):
     nPhase=self.ui.sbPSDataPhase.value()
     nParam=self.ui.sbPSDataParameter.value()
-    nspectra=self.psFFTData.shape[1]
-    self.F0PeakWidth=np.zeros((nspectra,2))
-    df=np.absolute(self.sfreq[1]-self.sfreq[0])
-    for slice in range(nspectra):
-          spectra= self.psFFTData[:,slice,nPhase,nParam].real
-          imax, fwhm= self.findF0PeakWidth(spectra)
-          self.F0PeakWidth[slice,1]=fwhm*df
-          self.F0PeakWidth[slice,0]=self.sfreq[imax]
-          title=self.ui.leGradientOrientation.text()[0] +'-Gradient Ringdown Test'
+    nspectra=self.psPlotData.shape[1]
+    allSpectra=self.dataViews.spectra()     #every slice is needed, FFT the whole array once
+    peaks=peakAnalysis.analyzeSpectra(allSpectra[:,:,nPhase,nParam].real, self.sfreq)      #all slices in one call
+    self.F0PeakWidth=np.column_stack((peaks['F0'], peaks['FWHM']))
+    title=self.ui.leGradientOrientation.text()[0] +'-Gradient Ringdown Test'
     self.dataMagPlot.clear()
     self.dataMagPlot.addLegend()
     if self.ProtocolName=='FID90ECC':
@@ -2754,31 +2921,25 @@ class MRIcontrol(QMainWindow):
       
   def PSDataPhaseAdjust(self):
       phase=self.ui.hsPSDataPhaseAdjust.value() *np.pi/180
-      data=self.tntData*np.exp(-1j*phase)
-      self.plotData(data)  #plot data
+      self.plotData(self.tntData, phase)  #plot data, the phase is applied to the cached spectra
                  
   def calculateBaselines(self):
-      '''Calculates baselines assuming end of the FID/sprectra should be 0
-      caclulates from self.blRegionStart to self.blRegionStart 
-      Note Tecmag arbitrarily zeros the last 1% of the data as part of their filtering'''
-      bstart=int(self.blRegionStart*self.data.real.shape[0])   #calculate baselines as the average of the data beyond self.blRegion
-      bstop=int(self.blRegionStop*self.data.real.shape[0])   #calculate baselines as the average of the data beyond self.blRegion
-      self.dataBaseline=np.zeros((self.data.real.shape[1],self.data.real.shape[2])) + 1j*np.zeros((self.data.imag.shape[1],self.data.imag.shape[2]))    #array of complex baseline values
-      #smax=np.amax(np.absolute(self.data.real))
-      for i in range(self.nSpectra):
-        for j in range(self.nRepeats):
-          self.dataBaseline[i,j]=np.average(self.data[bstart:bstop,i,j,0].real)+1j*np.average(self.data[bstart:bstop,i,j,0].imag)     # baseline is the averagrion value of last part of the data
+      '''Calculates baselines of every FID in self.tntData assuming end of the FID/sprectra should be 0
+      fits a polynomial of order self.baselineOrder from self.blRegionStart to self.blRegionStop, self.dataBaseline is the DC offset (slice, phase, parameter)
+      Note Tecmag arbitrarily zeros the last 1% of the data as part of their filtering, these points are left out of the fit'''
+      self.dataBaselineCoefficients=baseline.estimateBaselines(self.tntData, self.blRegionStart, self.blRegionStop, order=self.baselineOrder,
+                                        endZeros=baseline.endZeroCount(self.tntData) if self.TechMagEndZeros is None else self.TechMagEndZeros)
+      self.dataBaseline=self.dataBaselineCoefficients[0]
+      return self.dataBaselineCoefficients
 
-      
   def subtractBaselines(self):
-      self.calculateBaselines()
-      for i in range(self.nSpectra):
-        for j in range(self.nRepeats):
-          self.data[:,i,j,0]=self.data[:,i,j,0]-self.dataBaseline[i,j]
-          self.data[-self.TechMagEndZeros:,i,j,0]=0     #zero the last set of points on the  waverform since TechMag sets them to 0
-      for j in range(self.nRepeats):
+      '''Subtracts the baselines of every FID in self.tntData in place and rezeros the TecMag end points'''
+      self.dataBaselineCoefficients=baseline.subtractBaselines(self.tntData, self.blRegionStart, self.blRegionStop, order=self.baselineOrder, endZeros=self.TechMagEndZeros)
+      self.dataBaseline=self.dataBaselineCoefficients[0]
+      self.dataViews.invalidate()     #data changed in place
+      for j in range(self.dataBaseline.shape[1]):
           self.message('<b>Subtract baselines:</b>'+np.array2string(self.dataBaseline[:,j], precision=2, separator=',',suppress_small=True))
-      self.plotData() 
+      self.plotData(self.tntData) 
 
   def writeTNMRComment(self, write=True):
     ''' writes comment to TNMR, which likes /r/n to display correctly'''
@@ -2795,7 +2956,7 @@ class MRIcontrol(QMainWindow):
     comment+= 'sliceArrayCenter(mm)={:6.2f}\r\n'.format(self.sliceArrayCenter*1000)
     comment+= 'RunTime={}\r\n'.format(self.ui.leExpectedAcqTime.text())
     if self.setupdict['Bvalue']:
-        comment+= 'b-Values(s/mm^2)={}\r\n'.format(np.array2string(self.bValueArray, precision=2, separator=',',suppress_small=True))
+        comment+= 'b-Values(s/mm^2)={}\r\n'.format(np.array2string(self.bValueArray, precision=2, max_line_width=20000, separator=',',suppress_small=True))
     comment+='******Optional comments******\r\n'
     comment+='Type Stuff Here\r\n'
  #         comment+= 'SliceThickness(mm){:6.2f}\n'.format(self.protocolaName)
@@ -2806,45 +2967,32 @@ class MRIcontrol(QMainWindow):
 
 #***********Opsens Temperature      
   def readOpsensTemp(self):
-    '''read Opsens FIber Optic THermometer, has problems since EOT characters not stripped properly'''
-    try:
-        self.Opsens.write('Channel1:DATA? 1')  #'CH1:DATA
-        a=self.Opsens.read()
-        b=self.Opsens.read()
-        self.OpsensTemp=float(b)
-        #self.OpsensTempArray=np.append(self.OpsensTempArray,self.OpsensTemp)
-    except:
-        self.OpsensTemp=np.nan
+    '''latest Opsens Fiber Optic Thermometer temperature published by its worker, nan if there is no recent reading'''
+    self.OpsensTemp=self.instrumentCache.get('Opsens.temperature', maxAge=self.readingMaxAge)
     return self.OpsensTemp
 
 
 #***PloyScience chiller************
   def turnOffPolySci(self):
-    PSOffOn = self.PS.query('SO0')
+    PSOffOn = self.PSWorker.submit(instrumentWorkers.polyScienceQuery, 'SO0')
     self.ui.pbChillerOn.setStyleSheet("background-color: rgb(240, 240, 240)")
     return PSOffOn 
   def turnOnPolySci(self):
-    PSOffOn = self.PS.query('SO1')
+    PSOffOn = self.PSWorker.submit(instrumentWorkers.polyScienceQuery, 'SO1')
     self.ui.pbChillerOn.setStyleSheet("background-color: rgb(100, 255, 100)")
     return PSOffOn 
 
   def readPSTemp(self):
-    try:
-        self.PSTemp = float(self.PS.query('RT'))
-    except:
-        self.PSTemp=np.NaN
-    #self.PSTempArray=np.append(self.PSTempArray,self.PSTemp)
+    '''latest PolyScience bath temperature published by its worker, nan if there is no recent reading'''
+    self.PSTemp=self.instrumentCache.get('PolyScience.temperature', maxAge=self.readingMaxAge)
     return self.PSTemp
 
   def readPSsetpoint(self):
-    try:
-        psSP=self.PS.query('RS')
-        self.PSsetpoint = float(psSP)
-        return self.PSsetpoint
-    except:
-        #print('PolyScience setpoint not read:')
-        return np.nan
-    #self.PSsetPointArray=np.append(self.PSsetPointArray,self.PSsetpoint)
+    '''latest PolyScience setpoint published by its worker, nan if there is no recent reading'''
+    psSP=self.instrumentCache.get('PolyScience.setpoint', maxAge=self.readingMaxAge)
+    if not np.isnan(psSP):
+        self.PSsetpoint = psSP
+    return psSP
     
 
   def setPSsetpoint(self, tsp=False):
@@ -2857,33 +3005,54 @@ class MRIcontrol(QMainWindow):
             return
     else:
         self.Tsp=tsp
-    if self.Tsp>self.ChillerMinT and self.Tsp<self.ChillerMaxT:
-        self.PS.query('SS' +'{:06.2f}'.format(self.Tsp))
+    if self.Tsp>=self.ChillerMinT and self.Tsp<=self.ChillerMaxT:
+        self.PSWorker.submit(instrumentWorkers.polyScienceQuery, 'SS' +'{:06.2f}'.format(self.Tsp))      #sent by the worker before its next poll
         self.temperatureSlope=5E-3  #set the temperate slope high anticipating a temperature change
     else:
         self.message('Chiller temperature not changed: Setpoint must be between {:03.1f}C and {:03.1f}C'.format(self.ChillerMinT,self.ChillerMaxT))
 
   def calculateDesiredChillerSetPoint(self):
-      '''Calculates desired chiller setpoint given the desired sample temperature and the current measured temperature'''
-      Terror=(self.opsensTemperatureAv-self.ui.dspboxDesiredSampleTemp.value())*self.TcontrolErrorGain
-      if np.absolute(Terror)>5: #limit setpoint overshoot to no more than 5C
-          Terror=5*np.sign(Terror)
-      desiredSetPointTemperature=self.ui.dspboxDesiredSampleTemp.value()-Terror
-      return desiredSetPointTemperature
+      '''Calculates desired chiller setpoint given the desired sample temperature and the current measured temperature, see temperatureControl,
+      Opsens glitches are ignored by the controller'''
+      self.temperatureController.setTarget(self.ui.dspboxDesiredSampleTemp.value())
+      return self.temperatureController.update(time.time(), self.opsensTemperature)
+
+  def identifyTemperatureModel(self):
+      '''fits the sample temperature vs chiller setpoint model to the monitor data, returns True if the model was updated'''
+      m=self.temperatureController.model
+      if m.fit(self.monitorData.column(0), self.monitorData.column(2), self.monitorData.column(4)):
+          self.message('Temperature model: gain={:.3f}, offset={:.2f}C, tau={:.0f}s, dead time={:.0f}s'.format(m.gain, m.offset, m.tau, m.deadTime), color='blue')
+          return True
+      return False
       
   def setTemperature(self, temperature=20.0, waitUntilStable=False, temperatureStableRange=1):
-      toffset=self.ChillerOffsetSlope*(temperature-self.ChillerOffsetTemperature)
-      tsp=temperature+toffset
-      self.setPSsetpoint(tsp)
-      self.message('Chiller temperature set to {:03.1f}C'.format(tsp))
+      runBlocking(self.setTemperatureSteps(temperature, waitUntilStable, temperatureStableRange), wait=self.pause, aborted=lambda: self.recipeAbort)
+
+  def setTemperatureSteps(self, temperature=20.0, waitUntilStable=False, temperatureStableRange=1):
+      '''setTemperature as a recipe command, waits for a stable temperature without blocking the GUI'''
       self.temperatureStableRange=temperatureStableRange
       self.desiredTemperature = temperature
       self.ui.dspboxDesiredSampleTemp.setValue(self.desiredTemperature)
+      self.identifyTemperatureModel()
+      controlled=self.ui.rbControlTemperature.isChecked() and np.isfinite(self.opsensTemperature)
+      if controlled:        #the controller overdrives the chiller and then holds the target
+          self.temperatureController.reset()
+          tsp=self.calculateDesiredChillerSetPoint()
+      else:
+          toffset=self.ChillerOffsetSlope*(temperature-self.ChillerOffsetTemperature)
+          tsp=temperature+toffset
+      self.setPSsetpoint(tsp)
+      self.message('Chiller temperature set to {:03.1f}C'.format(tsp))
+      if np.isfinite(self.opsensTemperature):
+          tOpen=self.temperatureController.timeToStable(self.opsensTemperature, temperature, temperatureStableRange, closedLoop=False)
+          tClosed=self.temperatureController.timeToStable(self.opsensTemperature, temperature, temperatureStableRange, closedLoop=True)
+          self.message('Predicted time to stable temperature {} ({} with temperature control, {} without)'.format(
+              str(timedelta(seconds=round(tClosed if controlled else tOpen))) if np.isfinite(tClosed if controlled else tOpen) else 'unknown',
+              *[str(timedelta(seconds=round(t))) if np.isfinite(t) else '>6h' for t in (tClosed, tOpen)]), color='blue')
       if waitUntilStable:
           self.message('Waiting for Temperature Stable') 
-          while not self.checkTemperatureStable():      #If the temperature is not stable then wait but process events in the mean time
-              app.processEvents()
-          self.message('Waiting for Temperature Stable', color='green', bold=True)    
+          yield Until(self.checkTemperatureStable, description='temperature stable')
+          self.message('Temperature Stable', color='green', bold=True)    
       
   def checkTemperatureStable(self):
       '''Returns true if the current temperature is close to the desired temperature and the temperature is not changing much, False otherwise'''
@@ -2898,16 +3067,6 @@ class MRIcontrol(QMainWindow):
       '''Returns running average of a parmameter given its current value and its new reading with weighting factor alpha'''
       return (1-alpha)*current+alpha*new
 #***************Helper routines**************************
-  def findF0PeakWidth(self, y):
-        '''finds FWHM of array y that has 1 simple peak, need to upgrade to SciPy peak width'''
-        maxVal=np.amax(y)   #find the maximum value, will select region around this maximum value to integrate
-        maxInd=np.argmax(y)
-        maxVal50 = 0.5*maxVal
-        biggerCondition = [a > maxVal50 for a in y] #returns boolean array which is true for values above 50% of max value
-        width=np.sum(biggerCondition)+1   #returns number of points above 50 max  ***Needs to be fixed if there are several large peaks***
-        F0=maxInd
-        return F0, width
-  
   def pause(self,t):
     '''pause in seconds, but will do events while waiting'''
     if t<10:
@@ -2920,6 +3079,10 @@ class MRIcontrol(QMainWindow):
             return
         time.sleep(t/nsteps)
         
+  def pauseSteps(self, t):
+    '''pause as a recipe command, a timed wait that does not block the GUI'''
+    yield Delay(t)
+
   def get_sec(self,time_str):
     """Get seconds from time."""
     h, m, s = time_str.split(':')
@@ -2950,6 +3113,8 @@ class MRIcontrol(QMainWindow):
                          
   def closeEvent(self,event):
     self.closePicoscope()
+    for worker in self.instrumentWorkers:
+        worker.stop(timeout=5)
     #print ('Closing pyMRI', event)
     
 class fRectROI(pg.RectROI):
@@ -3001,6 +3166,7 @@ class plotWindow(QMainWindow):
             self.symb=['o', 's', 'd', 't', 't1', 't2','t3', 'p','+', 'h', 'star','x']
             self.plotType=0 #default plot second array column = temperature
             self.data=np.zeros((1,10))
+            self.maxDisplayPoints=2000      #monitor data is decimated to about this many points per curve, keeping the min and max
             self.nColors=7
             self.colors= ['w', 'r', 'g', 'b', 'c', 'm', 'y']
             self.fileMenu = self.menu.addMenu('&File')    
@@ -3103,7 +3269,11 @@ class plotWindow(QMainWindow):
           self.dplot.setLabel('bottom', 'FiberOptic Temperature',**self.labelStyle)
                                               
       def plotData(self, data):
+        '''plots an array or a TimeSeries of monitor data, a TimeSeries is decimated to the min/max rows of the plotted columns'''
         self.data=data
+        if isinstance(data, TimeSeries):
+            columns=[2, 3, 4] if self.plotType==0 else [self.plotType]
+            data=data.data(data.displayRows(columns=[c for c in columns if c<len(data.channels)], maxPoints=self.maxDisplayPoints))
         self.dplot.plotItem.getAxis('left').setPen(self.penw)
         self.dplot.plotItem.getAxis('bottom').setPen(self.penw)
         if self.plotType==0:
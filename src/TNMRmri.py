@@ -5,9 +5,15 @@ Class to drive TNMR console, optimized for Agilent preclinical MRI
 @author: stephen russek
 '''
 
-import sys
-import win32com.client # if not exist, install via "pip install pywin32"
+import sys, os, functools
+from collections import Counter, defaultdict
+try:
+    import win32com.client # if not exist, install via "pip install pywin32"
+except ImportError as e:
+    win32com=None       #only fakeTNMR can be used, TNMR() raises unless it is explicitly requested
+    win32comError=e
 import numpy as np
+from fakeTNMR import FakeTNMRApp
 #gradient orientaiton is GrGpGs
 #scanOrientation={ 'XYZ' : 'Axial RO=X, PE=Y' , 'YXZ' : 'Axial RO=Y, PE=X', 'XZY' : 'Coronal RO=X, PE=Z', 'ZXY' : 'Coronal RO=Z, PE=X', 'ZYX' : 'Sagittal RO=Z, PE=Y', 'YZX' : 'Sagittal RO=Y, PE=Z'}
 scanOrientation={'XZY':'Coronal RO=X, PE=Z','ZXY':'Coronal RO=Z, PE=X',\
@@ -17,12 +23,51 @@ scanOrientation={'XZY':'Coronal RO=X, PE=Z','ZXY':'Coronal RO=Z, PE=X',\
                                       "Sagittal RO=Z, PE=Y":'ZYX', 'Sagittal RO=Y, PE=Z':'YZX',\
                                       'Axial RO=X, PE=Y':'XYZ', 'Axial RO=Y, PE=X':'YXZ'}
 
+volatileParameters=('Actual Scans 1D', 'Actual Points 2D', 'Actual Points 3D', 'Actual Points 4D', 'Exp. Finish Time', 'Exp. Elapsed Time',
+                    'Shim Units', 'Date')        #parameters TNMR changes during acquisition or shimming, never cached
+derivedParameters=(('Acq. Points', 'Dwell Time', 'SW +/-', 'Acq. Time'),)       #groups of parameters TNMR recalculates when one of them is set
+
+def parseTNMRparam(p):
+    '''converts a TNMR dashboard string to a float adjusting for unit marker, raises ValueError if it is not a number'''
+    if p.find('MHz') != -1:
+        return float(p.replace('MHz',''))*1E6
+    if p.find('Hz') != -1:
+        return float(p.replace('Hz',''))
+    if p.find('s') != -1:
+        return float(p.replace('s',''))
+    if p.find('m') != -1:
+        return float(p.replace('m',''))*1E-3
+    if p.find('u') != -1:
+        return float(p.replace('u',''))*1E-6
+    return float(p)
+
+def comOperation(f):
+    '''COM calls made while f runs are counted under its name in TNMR.comCalls'''
+    @functools.wraps(f)
+    def wrapper(self, *args, **kwargs):
+        previous=self.operation
+        self.operation=f.__name__
+        try:
+            return f(self, *args, **kwargs)
+        finally:
+            self.operation=previous
+    return wrapper
+
 class TNMR ():
   ''' Opens and communicates with tNMR console'''
-  def __init__(self , rm, parent = None):
+  def __init__(self , rm, parent = None, app=None):
     self.defTNMRFile = r" C:\TNMR\data\microMRI\single_FID_MWOff.tnt"
-    self.App = win32com.client.Dispatch('NTNMR.Application')
+    self.offline = app is not None or os.environ.get('PYMRI_TNMR','').lower()=='fake'     #use fakeTNMR instead of the COM server, only when explicitly requested
+    self.App = app if app is not None else self.dispatch()
     self.psTableList=''     #pulse sequence table list
+    self.currentFileName=''
+    #******Parameter store: dashboard values as last read from TNMR, only parameters that change are written back
+    self.paramCache={}      #parameter name: string from GetNMRParameter, None if the parameter is not in the pulse sequence
+    self.pushedParams={}    #parameter name: (string last written with SetNMRParameter, string TNMR returned for it afterwards)
+    self.tableCache={}      #table name: table string
+    self.tableListCache=None
+    self.comCalls=defaultdict(Counter)      #operation: Counter of COM calls
+    self.operation='other'
     #******B0 compensation and Gradient PreEmphasis
     self.gradientMode='Low'
     self.A0xLowGrad=  30.699        #multiplier values to give 100mT/m when gradient amplitude is set to 100
@@ -44,9 +89,132 @@ class TNMR ():
     self.gradPreEmphasisValues=self.gradPreEmphasisValuesDefault.copy()
      
          
+  def dispatch(self):
+      '''connect to the TNMR application, or to a FakeTNMRApp when offline'''
+      if self.offline:
+          return FakeTNMRApp()
+      if win32com is None:
+          raise ImportError('Can not import win32com to connect to TNMR, try pip install pywin32 (set PYMRI_TNMR=fake to simulate the console)') from win32comError
+      return win32com.client.Dispatch('NTNMR.Application')
+
+  def countCall(self, name):
+      self.comCalls[self.operation][name]+=1
+
+  def resetComCalls(self):
+      self.comCalls.clear()
+
+  def comCallSummary(self):
+      '''string of the number of COM calls made by each operation'''
+      return ', '.join('{}: {}'.format(op, sum(c.values())) for op, c in self.comCalls.items())
+
+  def invalidateParams(self):
+      '''forget all cached parameters and tables, e.g. after a file is opened or the dashboard was changed in TNMR'''
+      self.paramCache.clear()
+      self.pushedParams.clear()
+      self.tableCache.clear()
+      self.tableListCache=None
+
+  def getNMRParameter(self, pname, refresh=False):
+      '''dashboard parameter string, read from TNMR only the first time unless refresh or volatile'''
+      if refresh or pname in volatileParameters or pname not in self.paramCache:
+          self.countCall('GetNMRParameter')
+          try:
+              self.paramCache[pname]=self.currentFile.GetNMRParameter(pname)
+          except:
+              self.paramCache[pname]=None
+          if pname in self.pushedParams:
+              value, readback=self.pushedParams[pname]
+              if readback is None:      #first read after a write, remember how TNMR reports the value
+                  self.pushedParams[pname]=(value, self.paramCache[pname])
+              elif readback!=self.paramCache[pname]:       #changed in TNMR since it was written
+                  del self.pushedParams[pname]
+      p=self.paramCache[pname]
+      if p is None:
+          raise KeyError('{} is not a TNMR parameter'.format(pname))
+      return p
+
+  def snapshotParams(self):
+      '''(parameters, tables) copies of the parameter store without volatile parameters, see pushParams and openFile'''
+      params={p:v for p, v in self.paramCache.items() if v is not None and p not in volatileParameters}
+      return params, dict(self.tableCache)
+
+  @comOperation
+  def pushParams(self, params, tables=None):
+      '''sets the parameters {name: string} and tables {name: string} that differ from the parameter store and rereads the pulse
+      sequence parameters, returns the number written to TNMR'''
+      n=sum(self.setNMRParameter(p, v) for p, v in params.items())
+      n+=sum(self.setTable(t, v) for t, v in (tables or {}).items())
+      self.getPSparams()
+      return n
+
+  def setNMRParameter(self, pname, value, force=False):
+      '''sets a dashboard parameter if it differs from the cached value, returns True if it was written to TNMR'''
+      value=value if isinstance(value, str) else '{}'.format(value)
+      if not force and not self.parameterChanged(pname, value):
+          return False
+      self.countCall('SetNMRParameter')
+      self.currentFile.SetNMRParameter(pname, value)
+      self.paramCache.pop(pname, None)      #TNMR may reformat the value, read it back when next needed
+      self.pushedParams[pname]=(value, None)
+      for group in derivedParameters:
+          if pname in group:
+              for p in group:
+                  if p!=pname:
+                      self.paramCache.pop(p, None)
+                      self.pushedParams.pop(p, None)
+      return True
+
+  def parameterChanged(self, pname, value):
+      '''False if value is what was last written or has the same numerical value as the cached TNMR string'''
+      if pname in self.pushedParams and self.pushedParams[pname][0]==value:
+          return False
+      cached=self.paramCache.get(pname)
+      if cached is None:
+          return True
+      cached, value=str(cached), str(value)     #COM returns some parameters, e.g. Observe Freq., as numbers
+      if cached.strip()==value.strip():
+          return False
+      try:
+          return parseTNMRparam(cached)!=parseTNMRparam(value)
+      except:
+          return True
+
+  def getTable(self, tname, refresh=False):
+      if refresh or tname not in self.tableCache:
+          self.countCall('GetTable')
+          self.tableCache[tname]=self.currentFile.GetTable(tname)
+      return self.tableCache[tname]
+
+  def setTable(self, tname, table, force=False):
+      '''sets a pulse sequence table if it differs from the cached table, returns True if it was written to TNMR'''
+      if not force and self.tableCache.get(tname)==table:
+          return False
+      self.countCall('SetTable')
+      self.currentFile.SetTable(tname, table)
+      self.tableCache[tname]=table
+      return True
+
+  def getTableList(self, refresh=False):
+      '''list of tables in the pulse sequence as a string'''
+      if refresh or self.tableListCache is None:
+          self.countCall('GetTableList')
+          self.tableListCache=self.currentFile.GetTableList
+      return self.tableListCache
+
+  def getSequenceTime(self):
+      '''sequence time in s'''
+      self.countCall('GetSequenceTime')
+      return self.currentFile.GetSequenceTime
+
+  def ndSize(self):
+      '''data dimensions (GetNDSize(1), ... GetNDSize(4))'''
+      self.comCalls[self.operation]['GetNDSize']+=4
+      return tuple(int(self.currentFile.GetNDSize(n)) for n in range(1,5))
+
   def openConsole(self):
       '''opens TNMR console'''
-      self.App = win32com.client.Dispatch('NTNMR.Application')
+      if not (self.offline and hasattr(self, 'App')):       #keep the simulated console and its open documents
+          self.App = self.dispatch()
 #      self.openFile(self.defTNMRFile)
       
   def zg(self):
@@ -68,18 +236,31 @@ class TNMR ():
   def saveCurrentFile(self, filename=''):
       '''saves current file, if no filename is provided saves as filename+date'''
       self.currentFile.SaveAs(filename)
+      self.currentFileName=filename     #the document is now the saved file
  
 
   def saveShims(self, filename=''):
       '''saves current file, if no filename is provided saves as filename+date'''
       if not hasattr(self, 'App'):
-          self.App = win32com.client.Dispatch('NTNMR.Application')
+          self.App = self.dispatch()
       self.App.SaveShims()
                   
-  def openFile(self, filename):
+  @comOperation
+  def openFile(self, filename, params=None, tables=None, tableList=None):
+        '''opens a .tnt file and reads its pulse sequence parameters, params, tables and tableList (e.g. a protocolCache template snapshot
+        of the same file) seed the parameter store so they are not read from TNMR'''
         self.currentFileName=filename
+        self.invalidateParams()     #new document, nothing cached is valid
+        if params is not None:
+            self.paramCache.update(params)
+        if tables is not None:
+            self.tableCache.update(tables)
+        self.tableListCache=tableList
         try:
-            self.currentFile = win32com.client.GetObject(filename) # the dataset opens in TNMR
+            if self.offline:
+                self.currentFile = self.App.GetObject(filename)
+            else:
+                self.currentFile = win32com.client.GetObject(filename) # the dataset opens in TNMR
             #self.App = win32com.client.Dispatch('NTNMR.Application')
             self.getPSparams()
             return True
@@ -91,33 +272,38 @@ class TNMR ():
       '''close current file'''
       self.App.CloseActiveFile==True
                     
-  def getPSparams(self):
+  @comOperation
+  def getPSparams(self, refresh=False):
+        '''gets pulse sequence parameters from the parameter store, only volatile parameters are read from TNMR unless refresh'''
+        if refresh:
+            self.invalidateParams()
         #Standard parameters that are always present, all are input as strings and converted to integer or floats where necessarY     
+        self.countCall('GetCursorPosition')
         self.xCurPos = self.currentFile.GetCursorPosition
         self.ObsFreq = self.getTNMRfloat("Observe Freq.")*10**6       #Observe frequency comes in as a float, not a string, stored in Hz, displayed in MHz
-        self.nAcqPoints = int(self.currentFile.GetNMRParameter("Acq. Points"))
+        self.nAcqPoints = int(self.getNMRParameter("Acq. Points"))
         self.SW = self.getTNMRfloat("SW +/-")
         self.ReceiverGain = int(self.getTNMRfloat("Receiver Gain"))
-        self.finishTime=self.currentFile.GetNMRParameter('Exp. Finish Time')
-        self.Scans1D = int(self.currentFile.GetNMRParameter("Scans 1D"))
-        self.Points2D = int(self.currentFile.GetNMRParameter("Points 2D"))
-        self.Points3D = int(self.currentFile.GetNMRParameter("Points 3D"))
-        self.Points4D = int(self.currentFile.GetNMRParameter("Points 4D"))
-        self.ActualScans1D = int(self.currentFile.GetNMRParameter("Actual Scans 1D"))
-        self.ActualPoints2D = int(self.currentFile.GetNMRParameter("Actual Points 2D"))
-        self.ActualPoints3D = int(self.currentFile.GetNMRParameter("Actual Points 3D"))
-        self.ActualPoints4D = int(self.currentFile.GetNMRParameter("Actual Points 4D"))
+        self.finishTime=self.getNMRParameter('Exp. Finish Time')
+        self.Scans1D = int(self.getNMRParameter("Scans 1D"))
+        self.Points2D = int(self.getNMRParameter("Points 2D"))
+        self.Points3D = int(self.getNMRParameter("Points 3D"))
+        self.Points4D = int(self.getNMRParameter("Points 4D"))
+        self.ActualScans1D = int(self.getNMRParameter("Actual Scans 1D"))
+        self.ActualPoints2D = int(self.getNMRParameter("Actual Points 2D"))
+        self.ActualPoints3D = int(self.getNMRParameter("Actual Points 3D"))
+        self.ActualPoints4D = int(self.getNMRParameter("Actual Points 4D"))
         self.DwellTime = self.getTNMRparam("Dwell Time")
         self.LastDelay = self.getTNMRparam("Last Delay")
         self.AcqTime = self.getTNMRparam("Acq. Time") 
-        self.SADimension = int(self.currentFile.GetNMRParameter("S.A. Dimension"))
-        self.expectedAcqTime =self.currentFile.GetNMRParameter("Exp. Elapsed Time")
-        self.sequenceTime = self.currentFile.GetSequenceTime #sequence time in s
-        self.acqDate = self.currentFile.GetNMRParameter("Date")
-        self.PSTableList=self.currentFile.GetTableList      #get list of tables in the pulse sequence
+        self.SADimension = int(self.getNMRParameter("S.A. Dimension"))
+        self.expectedAcqTime =self.getNMRParameter("Exp. Elapsed Time")
+        self.sequenceTime = self.getSequenceTime() #sequence time in s
+        self.acqDate = self.getNMRParameter("Date")
+        self.PSTableList=self.getTableList()      #get list of tables in the pulse sequence
         if self.PSTableList.find("GpAmpTbl") !=-1:
-            self.phaseEncodeArray=self.currentFile.GetTable("GpAmpTbl")  #Tables are  comma or space delineated strings
-        self.GradientOrientation = self.currentFile.GetNMRParameter("Grd. Orientation") #string 'XYZ'
+            self.phaseEncodeArray=self.getTable("GpAmpTbl")  #Tables are  comma or space delineated strings
+        self.GradientOrientation = self.getNMRParameter("Grd. Orientation") #string 'XYZ'
         #self.tntArrayShape=self.getTNMRparam('actual_npts')
         #pulse sequence specific floating point parameters that may or may not be there
         self.currentShimUnits=self.getTNMRfloat('Shim Units')              
@@ -145,54 +331,55 @@ class TNMR ():
             self.gradPreEmphasisValues[key]=np.round(self.getTNMRparam(key),6)
 
                     
+  @comOperation
   def setPSparams(self):
-        '''sets pulse sequence parameters in TNMR''' 
+        '''sets pulse sequence parameters in TNMR, only parameters that differ from the parameter store are written''' 
       #*****Parameters that should always be there*************    
-        self.currentFile.SetNMRParameter("Observe Freq.", '{:.6f}MHz'.format(self.ObsFreq/10**6))
-        self.currentFile.SetNMRParameter("Acq. Points", self.nAcqPoints)
-        self.currentFile.SetNMRParameter("Receiver Gain",'{}'.format(self.ReceiverGain))
-        self.currentFile.SetNMRParameter("Scans 1D",self.Scans1D)
-        self.currentFile.SetNMRParameter("Points 2D", self.Points2D)
-        self.currentFile.SetNMRParameter("Points 3D", self.Points3D)
-        self.currentFile.SetNMRParameter("Points 4D", self.Points4D)
-        self.currentFile.SetNMRParameter("Dwell Time",'{:6.4f}m'.format(self.DwellTime*1000))
-        self.currentFile.SetNMRParameter("Last Delay", '{:8.3f}m'.format(self.LastDelay*1000))
-        self.currentFile.SetNMRParameter("Grd. Orientation",self.GradientOrientation) #string 'XYZ'
+        self.setNMRParameter("Observe Freq.", '{:.6f}MHz'.format(self.ObsFreq/10**6))
+        self.setNMRParameter("Acq. Points", self.nAcqPoints)
+        self.setNMRParameter("Receiver Gain",'{}'.format(self.ReceiverGain))
+        self.setNMRParameter("Scans 1D",self.Scans1D)
+        self.setNMRParameter("Points 2D", self.Points2D)
+        self.setNMRParameter("Points 3D", self.Points3D)
+        self.setNMRParameter("Points 4D", self.Points4D)
+        self.setNMRParameter("Dwell Time",'{:6.4f}m'.format(self.DwellTime*1000))
+        self.setNMRParameter("Last Delay", '{:8.3f}m'.format(self.LastDelay*1000))
+        self.setNMRParameter("Grd. Orientation",self.GradientOrientation) #string 'XYZ'
     #*****Parameters that may be there*************   
-        self.PSTableList=self.currentFile.GetTableList      #get list of tables in the pulse sequence
+        self.PSTableList=self.getTableList()      #get list of tables in the pulse sequence
         if self.PSTableList.find("GpAmpTbl") !=-1:
-            self.currentFile.SetTable("GpAmpTbl", self.phaseEncodeArray)         
+            self.setTable("GpAmpTbl", self.phaseEncodeArray)         
         try:
-            self.currentFile.SetNMRParameter("pw", '{:5.1f}m'.format(self.RFpw*1000))       #note RF90 is  a float in seconds, convert to a string in ms with m 
+            self.setNMRParameter("pw", '{:5.1f}m'.format(self.RFpw*1000))       #note RF90 is  a float in seconds, convert to a string in ms with m 
         except:
             print ("Cannot set RFpw pulsewidth pw=")
         try:
-            self.currentFile.SetNMRParameter("pw180", '{:5.1f}m'.format(self.RFpw180*1000))
+            self.setNMRParameter("pw180", '{:5.1f}m'.format(self.RFpw180*1000))
         except:
             print ("Cannot set RFpw180 pulsewidth")
         try:
-            self.currentFile.SetNMRParameter("rfAttn90", '{:5.1f}'.format(self.rfAttn90))
+            self.setNMRParameter("rfAttn90", '{:5.1f}'.format(self.rfAttn90))
         except:
             print ('Cannot set rfAttn90')
         try:
-            self.currentFile.SetNMRParameter("rfAttn180", '{:5.1f}'.format(self.rfAttn180))
+            self.setNMRParameter("rfAttn180", '{:5.1f}'.format(self.rfAttn180))
         except:
             print ('Cannot set rfAttn180=', self.rfAttn180)
 
         try:
-            self.currentFile.SetNMRParameter("Gspoil", '{:8.4f}'.format(self.GspoilDAC))
+            self.setNMRParameter("Gspoil", '{:8.4f}'.format(self.GspoilDAC))
         except:
             pass
         try:
-            self.currentFile.SetNMRParameter("Gdp", '{:8.4f}'.format(self.dGpDAC))      #Gradient crushers
+            self.setNMRParameter("Gdp", '{:8.4f}'.format(self.dGpDAC))      #Gradient crushers
         except:
             pass
         try:
-            self.currentFile.SetNMRParameter("Gp", '{:8.4f}'.format(self.GpDAC))
-            self.currentFile.SetNMRParameter("Gr", '{:8.4f}'.format(self.GrDAC))
-            self.currentFile.SetNMRParameter("Grr", '{:8.4f}'.format(self.GrrDAC))
-            self.currentFile.SetNMRParameter("Gs", '{:8.4f}'.format(self.GsDAC)) 
-            self.currentFile.SetNMRParameter("Gsr", '{:8.4f}'.format(self.GsrDAC))
+            self.setNMRParameter("Gp", '{:8.4f}'.format(self.GpDAC))
+            self.setNMRParameter("Gr", '{:8.4f}'.format(self.GrDAC))
+            self.setNMRParameter("Grr", '{:8.4f}'.format(self.GrrDAC))
+            self.setNMRParameter("Gs", '{:8.4f}'.format(self.GsDAC)) 
+            self.setNMRParameter("Gsr", '{:8.4f}'.format(self.GsrDAC))
         except:
             pass
             #print('Cannot update slice, readout, and phase gradient parameters')   
@@ -201,39 +388,14 @@ class TNMR ():
   def getTNMRfloat(self, pname):
       '''get parameter and return as a float, float() will handle 'x.xm' strings and have the correct multiplier but not xm strings''' 
       try:
-          return(float(self.currentFile.GetNMRParameter(pname)))
+          return(float(self.getNMRParameter(pname)))
       except:
           return (self.getTNMRparam(pname))
         
   def getTNMRparam(self, pname):
       '''inputs a parameter string and outputs a float adjusting for unit marker'''  
       try:
-          p=self.currentFile.GetNMRParameter(pname)     #get string parameter from dash board, replace multiplier and make floats
-          if p.find('MHz') != -1:
-              val=p.replace('MHz','')
-              val=float(val)*1E6
-              return(val)
-              
-          if p.find('Hz') != -1:
-              val=p.replace('Hz','')
-              val=float(val)
-              return(val)
-              
-          if p.find('s') != -1:
-              val=p.replace('s','')
-              val=float(val)
-              return(val)
-                            
-          if p.find('m') != -1:
-              val=p.replace('m','')
-              val=float(val)*1E-3
-              return(val)
-              
-          if p.find('u') != -1:
-              val=p.replace('u','')
-              val=float(val)*1E-6
-              return(val)
-          return(float(p))
+          return parseTNMRparam(self.getNMRParameter(pname))     #get string parameter from dash board, replace multiplier and make floats
       except: 
           return (np.nan) 
                    
@@ -243,12 +405,13 @@ class TNMR ():
       return not self.App.CheckAcquisition
 
   def getCurrentPSparams(self):
-      self.finishTime=self.currentFile.GetNMRParameter('Exp. Finish Time')   
+      self.finishTime=self.getNMRParameter('Exp. Finish Time')   
       
   def getScanOrientation(self,go):
       return scanOrientation[go]
   
   def compilePS(self):
+      self.countCall('Compile')
       self.currentFile.Compile()   
                
   def setComment(self,comment, append=True):
@@ -263,20 +426,21 @@ class TNMR ():
       #self.App.SetComment(comment)
       self.comment=comment
   
+  @comOperation
   def setB0CompGradPreEmphToDefault(self):
       '''Sets B0Comp and Gradient PreEmphasis values back to default'''
       for key in self.B0CompValuesDefault.keys():
           if key.find('T')==-1:
-            self.currentFile.SetNMRParameter(key, '{:8.4f}'.format(self.B0CompValuesDefault[key]))
+            self.setNMRParameter(key, '{:8.4f}'.format(self.B0CompValuesDefault[key]))
           else:             
-            self.currentFile.SetNMRParameter(key, '{:6.4f}m'.format(self.B0CompValuesDefault[key]*1000))       #if parameter is a time constant convert to ms and add an m
+            self.setNMRParameter(key, '{:6.4f}m'.format(self.B0CompValuesDefault[key]*1000))       #if parameter is a time constant convert to ms and add an m
  
       for key in self.gradPreEmphasisValuesDefault.keys():
           if key.find('T')==-1:
               if key.find('DC')==-1:        #doi not zero DC.x, DC.y, DC.z  these are shim settings
-                  self.currentFile.SetNMRParameter(key, '{:8.4f}'.format(self.gradPreEmphasisValuesDefault[key])) 
+                  self.setNMRParameter(key, '{:8.4f}'.format(self.gradPreEmphasisValuesDefault[key])) 
           else:    
-            self.currentFile.SetNMRParameter(key, '{:6.4f}m'.format(self.gradPreEmphasisValuesDefault[key]*1000))       #if parameter is a time constant convert to ms and add an m
+            self.setNMRParameter(key, '{:6.4f}m'.format(self.gradPreEmphasisValuesDefault[key]*1000))       #if parameter is a time constant convert to ms and add an m
           
       for key in self.B0CompValues:       #download B0 compensation parameters
             self.B0CompValues[key]=np.round(self.getTNMRparam(key),6)
@@ -31,6 +31,9 @@ QApplication.setAttribute(Qt.AA_UseHighDpiPixmaps, True) #use highdpi icons
 import pyqtgraph as pg
 import pyqtgraph.opengl as gl
 from processTNT import TNTfile
+import reconTNT     #headless reconstruction shared with batchRecon
+import tntContainer   #chunked HDF5/Zarr copies of tnt files
+import fftBackend       #scipy.fft/pyFFTW/numpy FFTs selected by PYMRI_FFT_BACKEND
 from scipy import constants
 from scipy.ndimage import zoom   #used for interpolation of images
 import pydicom    #pydicom is used to import DICOM images  pydicom.UID
@@ -341,27 +344,15 @@ class TNMRviewer(QMainWindow):
       def openTNTFile(self):
         '''Open .tnt file, data is extracted as 4d array with readout,slice,phase,parameter 
         reorder to slice, readout, phase, parameter'''
-        f = QFileDialog.getOpenFileName(self,'Open .tnt file', '', "Tecmag Files (*.tnt)")        #Note self.FileName is a qString not a string
+        f = QFileDialog.getOpenFileName(self,'Open .tnt file', '', "Tecmag Files (*.tnt);;Chunked containers (*.h5 *.hdf5 *.zarr)")        #Note self.FileName is a qString not a string
         if f[0]=='':
           return 'cancel'
         self.fileName=f[0]
-        self.tntfile=TNTfile(self.fileName)   #open tecmag tnt file
+        self.tntfile=tntContainer.openTNT(self.fileName)   #open tecmag tnt file or chunked container
         self.message('filename=' +self.fileName)
-        self.ProtocolName=""
-        if self.fileName.find('SEMS')!= -1:
-            self.ProtocolName="SEMS"    
-        if self.fileName.find('SEMS_IR')!= -1:
-            self.ProtocolName="SEMS_IR"  
-        if self.fileName.find('GE_FLASH')!= -1:
-            self.ProtocolName="GE_FLASH"    
-        if self.fileName.find('GEMS_IR')!= -1:
-            self.ProtocolName="GEMS_IR"    
-        if self.fileName.find('SCOUT')!= -1:
-            self.ProtocolName="SCOUT"       
-        if self.fileName.find('PGSE_Dif')!= -1:
-            self.ProtocolName="PGSE_Dif"       
+        self.ProtocolName=reconTNT.protocolFromFilename(self.fileName)
         self.message('ProtocolName=' +self.ProtocolName)
-        self.tntData=np.swapaxes(self.tntfile.DATA, 0,1) #input 4 dimensional data array, rearrange to get slice, readout, phase, parameter
+        self.tntData=reconTNT.tntWorkingArray(self.tntfile.DATA) #input 4 dimensional data array, rearrange to get slice, readout, phase, parameter
         self.nSlice= self.tntData.shape[0]
         self.nReadout= self.tntData.shape[1]
         self.nPhase= self.tntData.shape[2]
@@ -593,18 +584,16 @@ class TNMRviewer(QMainWindow):
                     dat=np.pad(dat,((0,0),(int(n1/2),n1-int(n1/2)),(0,0)))
                 if n2>0:
                     dat=np.pad(dat,((0,0),(0,0),(int(n2/2),n2-int(n2/2)),(0,0)))
-            dat=np.fft.fftshift(dat,axes=(self.roIndex,self.pIndex))   #shift to make k=0 at upper left
-            self.fftData=np.fft.fftshift(np.fft.fft2(dat,axes=(self.roIndex,self.pIndex)),axes=(self.roIndex,self.pIndex))     #FFT then shift o center image
+            self.fftData=reconTNT.fft2Recon(dat, self.roIndex, self.pIndex)     #FFT then shift to center image
             self.plotFFTMag()
  
       def fft2dRawData(self,data, index1=1, index2=2):
             '''FFTs raw data along indices given, assumes k=0 is in the center'''
-            dat=np.fft.fftshift(data,axes=(index1,index2))   #shift to make k=0 at upper left
-            self.fftData=np.fft.fftshift(np.fft.fft2(dat,axes=(index1,index2)),axes=(index1,index2))   
+            self.fftData=reconTNT.fft2Recon(data, index1, index2)
                      
       def gaussianFilter(self, data):
             self.rawData=data
-            self.fftData=np.fft.fftshift(np.fft.fft2(data),axes=(1,2))
+            self.fftData=np.fft.fftshift(fftBackend.fft2(data),axes=(1,2))
             self.setWindowTitle(self.programID+'Reconstructed Image Magnitude')
             self.imv.setImage(np.absolute(self.fftData),axes=self.dataAxes)
             
@@ -709,16 +698,9 @@ class TNMRviewer(QMainWindow):
           
       def processScout(self, nRF=0): 
           '''Process Magnetica scout which has 3 views concatinated'''
-          if nRF !=-1:
-            self.tntData=self.tntData[:,nRF::4,:,:]     #extract channel 1 from  CH1,2,3,4 data for Magnetica data
-          dshape=self.tntData.shape
-          columns=int(dshape[1]/3)  #Saggital, coronal, axial need to be separated 
-          rows=dshape[2]
-          self.tntData=np.reshape(self.tntData,(3, columns, rows,dshape[3]))
+          self.tntData, npad=reconTNT.separateScout(self.tntData, nRF=nRF)     #extract channel nRF from CH1,2,3,4 data if nRF!=-1, separate views and pad phase
           self.message('<b>msMRI Scout processing:</b> Extracted CH1, separated Coronal,Saggital,Axial slices')
-          if rows< columns:
-              npad=int((columns-rows)/2)
-              self.tntData=np.pad(self.tntData, ((0,0), (0,0), (npad, npad),(0,0)), 'constant', constant_values=((0, 0),(0, 0),(0, 0),(0, 0)))
+          if npad>0:
               self.message('Magnetica data: Zero padded phase encode by {}, array dimension={}'.format(2*npad, str(self.tntData.shape)))
           self.addPlotData(self.tntData)
           
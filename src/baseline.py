@@ -0,0 +1,60 @@
+'''
+Created on Oct 17, 2026
+
+Baseline estimation and in place subtraction for every FID of a (RO, slice, phase, parameter) NMR data array in one pass.
+The baseline of each FID is a complex polynomial in the normalized time t=index/npoints (order 0 = DC offset, 1 = linear, ...) fitted by
+least squares to the points from start*npoints to stop*npoints, where the signal is assumed to have decayed to zero.
+TecMag zeros the last points of each FID as part of its digital filtering, these points are excluded from the fit and set back to zero
+after subtraction so they do not become -baseline.
+'''
+import numpy as np
+
+def endZeroCount(data, axis=0):
+    '''number of trailing points that are exactly zero in every FID'''
+    nonzero=np.any(np.moveaxis(np.asarray(data), axis, 0).reshape(data.shape[axis], -1)!=0, axis=1)
+    idx=np.flatnonzero(nonzero)
+    return data.shape[axis] if idx.size==0 else data.shape[axis]-1-int(idx[-1])
+
+def baselineWindow(npoints, start=0.9, stop=0.99, endZeros=0, minPoints=2):
+    '''(first, last+1) index of the baseline region, stops before the TecMag end zeros unless that leaves fewer than minPoints points
+    (an all zero FID, e.g. from an aborted acquisition, has npoints end zeros), then the region is taken from start with its zeros'''
+    bstart=int(start*npoints)
+    bstop=min(int(stop*npoints), npoints-endZeros)
+    if bstop-bstart<minPoints:
+        bstop=min(int(stop*npoints), bstart+minPoints)
+    if bstop-bstart<1:
+        raise ValueError('Empty baseline region {}:{} for {} points'.format(bstart, bstop, npoints))
+    return bstart, bstop
+
+def estimateBaselines(data, start=0.9, stop=0.99, order=0, endZeros=0, axis=0):
+    '''least squares polynomial baseline of every FID, returns complex coefficients (order+1, other dimensions),
+    coefficient k multiplies (index/npoints)**k, coefficients[0] is the DC offset'''
+    y=np.moveaxis(np.asarray(data), axis, 0)
+    npoints=y.shape[0]
+    bstart, bstop=baselineWindow(npoints, start, stop, endZeros)
+    region=y[bstart:bstop].reshape(bstop-bstart, -1)
+    if order==0:
+        coefficients=np.mean(region, axis=0, dtype=np.complex128)[None,:]
+    else:
+        t=np.arange(bstart, bstop)/npoints
+        A=np.vander(t, order+1, increasing=True)
+        coefficients=np.linalg.lstsq(A, region.astype(np.complex128), rcond=None)[0]      #one solve for all FIDs
+    return coefficients.reshape((order+1,)+y.shape[1:])
+
+def subtractBaselines(data, start=0.9, stop=0.99, order=0, endZeros=None, axis=0):
+    '''estimate and subtract the baseline of every FID of data in place, endZeros=number of TecMag end zeros, None detects them,
+    returns the baseline coefficients (see estimateBaselines)'''
+    if endZeros is None:
+        endZeros=endZeroCount(data, axis)
+    coefficients=estimateBaselines(data, start, stop, order, endZeros, axis)
+    y=np.moveaxis(data, axis, 0)        #view, so subtraction writes into data
+    npoints=y.shape[0]
+    c=coefficients.astype(y.dtype)
+    y-=c[0]
+    if order>0:
+        t=(np.arange(npoints)/npoints).astype(y.real.dtype).reshape((npoints,)+(1,)*(y.ndim-1))
+        for k in range(1, order+1):
+            y-=c[k]*t**k
+    if endZeros>0:
+        y[npoints-endZeros:]=0
+    return coefficients
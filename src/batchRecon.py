@@ -0,0 +1,118 @@
+'''
+Created on Oct 17, 2026
+
+Command line batch reconstruction of Tecmag .tnt files across a pool of processes.
+Each file (.tnt or a tntContainer .h5/.zarr copy) is opened with the TNTfile interface, reconstructed with reconTNT (scout views separated as in TNMRviewer.processScout)
+and the magnitude and phase volumes (slice, RO, phase, parameter) are written as float32 .npy files.
+With --outdir the input directory tree below the common parent of all files is mirrored in the output directory.
+
+usage:
+    python batchRecon.py "D:\\MRIdata\\study1\\*.tnt" "D:\\MRIdata\\study2\\**\\*.tnt" --workers 8 --outdir D:\\recon
+'''
+import os, sys, glob, time, argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import reconTNT
+import fftBackend
+from tntContainer import openTNT, isContainer
+
+def outputNames(path, outdir=None, root=None):
+    '''magnitude and phase output file names for a .tnt file, in outdir at the path of the file relative to root (default: the file's directory)'''
+    path=os.path.abspath(path.rstrip('\\/'))
+    base=os.path.splitext(os.path.basename(path))[0]
+    if outdir is None:
+        outdir=os.path.dirname(path)
+    elif root is not None:
+        outdir=os.path.join(outdir, os.path.relpath(os.path.dirname(path), root))
+    return os.path.join(outdir, base + '_mag.npy'), os.path.join(outdir, base + '_phase.npy')
+
+def outputRoot(files):
+    '''common parent directory of files, mirrored below the output directory'''
+    return os.path.commonpath([os.path.dirname(os.path.abspath(f.rstrip('\\/'))) for f in files]) if files else None
+
+def duplicateOutputs(files, outdir=None):
+    '''dictionary of magnitude output file name: input files for outputs written by more than one file, e.g. a.tnt and its a.h5 container'''
+    root=outputRoot(files)
+    names={}
+    for f in files:
+        names.setdefault(outputNames(f, outdir, root)[0], []).append(f)
+    return {name:fs for name, fs in names.items() if len(fs)>1}
+
+def reconstructFile(path, outdir=None, nRF=-1, savePhase=True, protocol=None, root=None):
+    '''reconstruct one .tnt file and write the magnitude (and phase) volumes, runs in a worker process,
+    returns a dictionary with the file name, protocol, image shape, timings(s) and any error'''
+    result={'path':path, 'protocol':protocol, 'shape':None, 'error':None}
+    t0=time.perf_counter()
+    try:
+        tnt=openTNT(path)
+        t1=time.perf_counter()
+        image, result['protocol']=reconTNT.reconstructTNT(tnt, protocol=protocol, nRF=nRF)
+        t2=time.perf_counter()
+        magFile, phaseFile=outputNames(path, outdir, root)
+        os.makedirs(os.path.dirname(magFile), exist_ok=True)
+        np.save(magFile, np.absolute(image).astype(np.float32))
+        if savePhase:
+            np.save(phaseFile, np.angle(image).astype(np.float32))
+        t3=time.perf_counter()
+        result['shape']=image.shape
+        result['timing']={'read':t1-t0, 'recon':t2-t1, 'write':t3-t2, 'total':t3-t0}
+    except Exception as e:
+        result['error']='{}: {}'.format(type(e).__name__, e)
+        result['timing']={'total':time.perf_counter()-t0}
+    return result
+
+def findFiles(patterns):
+    '''expand glob patterns (** allowed), returns a sorted list of unique .tnt files and containers'''
+    files=set()
+    for p in patterns:
+        files.update(f for f in glob.glob(p, recursive=True) if f.lower().endswith('.tnt') or isContainer(f))
+    return sorted(files)
+
+def batchReconstruct(files, workers=None, outdir=None, nRF=-1, savePhase=True, protocol=None, fft=None, fftWorkers=1, message=print):
+    '''reconstruct a list of files on a pool of worker processes, each process uses the FFT backend fft with fftWorkers threads,
+    returns the list of results in completion order, raises ValueError if two files would write the same output files'''
+    duplicates=duplicateOutputs(files, outdir)
+    if duplicates:
+        raise ValueError('files would overwrite each other\'s output: ' + '; '.join(', '.join(fs) + ' -> ' + name for name, fs in duplicates.items()))
+    root=outputRoot(files)
+    if workers is None:
+        workers=os.cpu_count()
+    results=[]
+    t0=time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=fftBackend.setBackend, initargs=(fft, fftWorkers)) as pool:
+        futures=[pool.submit(reconstructFile, f, outdir, nRF, savePhase, protocol, root) for f in files]
+        for future in as_completed(futures):
+            r=future.result()
+            results.append(r)
+            if message is not None:
+                if r['error'] is None:
+                    t=r['timing']
+                    message('{}: {} {} read={:.3f}s recon={:.3f}s write={:.3f}s total={:.3f}s'.format(r['path'], r['protocol'], r['shape'], t['read'], t['recon'], t['write'], t['total']))
+                else:
+                    message('{}: FAILED {}'.format(r['path'], r['error']))
+    if message is not None:
+        nFailed=sum(r['error'] is not None for r in results)
+        message('Reconstructed {} files ({} failed) with {} workers in {:.2f}s'.format(len(results)-nFailed, nFailed, workers, time.perf_counter()-t0))
+    return results
+
+if __name__ == '__main__':
+    parser=argparse.ArgumentParser(description='Batch reconstruction of Tecmag .tnt files')
+    parser.add_argument('patterns', nargs='+', help='glob patterns of .tnt files or containers, ** matches subdirectories')
+    parser.add_argument('--workers', type=int, default=None, help='number of worker processes (default: number of cores)')
+    parser.add_argument('--outdir', default=None, help='output directory, subdirectories of the inputs are mirrored (default: next to each .tnt file)')
+    parser.add_argument('--nrf', type=int, default=-1, help='receive channel to extract from 4 channel scout data, -1=all')
+    parser.add_argument('--protocol', default=None, help='override the protocol found from the file name')
+    parser.add_argument('--nophase', action='store_true', help='only write magnitude volumes')
+    parser.add_argument('--fft', default=None, help='FFT backend: scipy, pyfftw or numpy (default: PYMRI_FFT_BACKEND or scipy)')
+    parser.add_argument('--fftworkers', type=int, default=1, help='FFT threads in each worker process')
+    a=parser.parse_args()
+    files=findFiles(a.patterns)
+    if not files:
+        print('No .tnt files found')
+        sys.exit(1)
+    try:
+        results=batchReconstruct(files, workers=a.workers, outdir=a.outdir, nRF=a.nrf, savePhase=not a.nophase, protocol=a.protocol, fft=a.fft, fftWorkers=a.fftworkers)
+    except ValueError as e:
+        print(e)
+        sys.exit(1)
+    sys.exit(int(any(r['error'] is not None for r in results)))
@@ -0,0 +1,136 @@
+'''
+Created on Oct 17, 2026
+
+Benchmarks for moving data and parameters between TNMR and pyMRI, run without TNMR or Qt:
+    python benchTNMR.py data      compares the legacy getTNMRdata conversion of the COM getData tuple with utils.interleaved_to_complex
+                                  and with memory mapping the saved .tnt file
+    python benchTNMR.py com       COM calls and time of TNMR.openFile/getPSparams/setPSparams against fakeTNMR with several per call latencies
+    python benchTNMR.py recipe    throughput of open, set parameters, ZG, wait, fetch data and save cycles against fakeTNMR
+    python benchTNMR.py protocol  COM calls and time to select protocols by reopening the template against protocolCache
+'''
+import os, sys, time, tempfile
+import numpy as np
+from utils import interleaved_to_complex
+from processTNT import TNTfile
+from fakeTNMR import FakeTNMRApp, writeTNT
+from TNMRmri import TNMR
+from protocolCache import ProtocolCache
+import TNTdtypes
+
+def legacyGetTNMRdata(rawData, arraydim):
+    '''getTNMRdata before the single buffer conversion, kept for comparison'''
+    datar=np.array(rawData)[0::2]       #data are real/ imaginary pairs
+    datai=np.array(rawData)[1::2]
+    data1d=np.empty(len(datar), np.cdouble)
+    data1d.real=datar
+    data1d.imag=datai
+    return np.reshape(data1d, arraydim, order='F')
+
+def writeTestTNT(fileName, data):
+    '''write a minimal .tnt file (TMAG, DATA, TMG2) holding data'''
+    tmag=np.zeros(1, TNTdtypes.TMAG)[0]
+    tmag['ob_freq'][0]=21.3
+    tmag['sw'][0]=50000
+    tmag['dwell'][0]=1E-5
+    tmag['acq_time']=data.shape[0]*1E-5
+    tmag['last_delay']=0.1
+    tmag['scans']=1
+    writeTNT(fileName, data, tmag)
+
+def timeit(f, repeat=3):
+    '''best wall clock time of repeat calls'''
+    best=np.inf
+    for i in range(repeat):
+        t0=time.perf_counter()
+        f()
+        best=min(best, time.perf_counter()-t0)
+    return best
+
+def benchData(shapes=((256,1,1,1), (256,16,128,1), (256,32,128,4))):
+    '''time the COM tuple conversions and the memmap of a saved file for each data shape'''
+    print('{:>20} {:>12} {:>12} {:>12} {:>12}'.format('shape', 'legacy(s)', 'complex64(s)', 'memmap(s)', 'speedup'))
+    for shape in shapes:
+        n=int(np.prod(shape))
+        rawData=tuple(np.round(np.random.standard_normal(2*n)*1000).tolist())     #getData returns a tuple of python floats
+        tLegacy=timeit(lambda: legacyGetTNMRdata(rawData, shape))
+        tNew=timeit(lambda: interleaved_to_complex(rawData, shape))
+        assert np.array_equal(legacyGetTNMRdata(rawData, shape), interleaved_to_complex(rawData, shape))
+        with tempfile.TemporaryDirectory() as d:
+            fn=os.path.join(d, 'bench.tnt')
+            writeTestTNT(fn, interleaved_to_complex(rawData, shape))
+            tMap=timeit(lambda: TNTfile(fn).DATA)
+        print('{:>20} {:12.4f} {:12.4f} {:12.4f} {:12.1f}'.format(str(shape), tLegacy, tNew, tMap, tLegacy/tNew))
+
+def benchCOM(latencies=(0, 1E-4, 1E-3), shape=(256,1,64,1)):
+    '''COM calls and time to open a file, read the dashboard (refreshed and from the parameter store) and write it back unchanged,
+    for each simulated per call latency(s)'''
+    operations=(('openFile', lambda t, fn: t.openFile(fn)), ('getPSparams(refresh)', lambda t, fn: t.getPSparams(refresh=True)),
+                ('getPSparams', lambda t, fn: t.getPSparams()), ('setPSparams', lambda t, fn: t.setPSparams()))
+    print('{:>10}'.format('latency')+''.join('{:>24} {:>8}'.format(name+'(s)', 'calls') for name, f in operations))
+    with tempfile.TemporaryDirectory() as d:
+        fn=os.path.join(d, 'template.tnt')
+        writeTestTNT(fn, np.zeros(shape, np.complex64))
+        for latency in latencies:
+            tnmr=TNMR(None, app=FakeTNMRApp(latency=latency))
+            line='{:10.4f}'.format(latency)
+            for name, f in operations:
+                tnmr.App.resetCalls()
+                t=timeit(lambda: f(tnmr, fn), repeat=1)
+                line+='{:24.4f} {:8d}'.format(t, sum(tnmr.App.calls.values()))
+            print(line)
+
+def benchRecipe(nRuns=20, shape=(256,1,64,1), latency=1E-4, speedup=1000, pollInterval=0.001):
+    '''recipe style acquisitions per second: open template, set parameters, ZG, poll CheckAcquisition, fetch data and save'''
+    with tempfile.TemporaryDirectory() as d:
+        fn=os.path.join(d, 'template.tnt')
+        writeTestTNT(fn, np.zeros(shape, np.complex64))
+        tnmr=TNMR(None, app=FakeTNMRApp(latency=latency, speedup=speedup))
+        t0=time.perf_counter()
+        for i in range(nRuns):
+            tnmr.openFile(fn)
+            tnmr.Scans1D=1
+            tnmr.setPSparams()
+            tnmr.zg()
+            while tnmr.checkAcquisition():
+                time.sleep(pollInterval)
+            arraydim=tuple(tnmr.currentFile.GetNDSize(n) for n in range(1, 5))
+            data=interleaved_to_complex(tnmr.currentFile.getData, arraydim)
+            saved=os.path.join(d, 'run{}.tnt'.format(i))
+            tnmr.saveCurrentFile(saved)
+            tnmr.App.CloseActiveFile
+        t=time.perf_counter()-t0
+        acqTime=nRuns*tnmr.App.documents.get(fn, tnmr.currentFile).sequenceTime()/speedup
+        print('{} runs of {} in {:.3f}s ({:.2f} runs/s, {:.3f}s simulated acquisition), {} COM calls'.format(nRuns, shape, t, nRuns/t, acqTime, sum(tnmr.App.calls.values())))
+        for name, n in tnmr.App.calls.most_common(8):
+            print('{:>20} {:8d}'.format(name, n))
+
+def benchProtocol(protocols=('SCOUT', 'ShimFIDHP', 'SEMS'), nSelect=10, shape=(256,1,64,1), latency=1E-3):
+    '''COM calls and time per protocol selection: reopening the template (openFile) against ProtocolCache.select, alternating protocols
+    (template reopened with a seeded parameter store) and repeating one protocol after changing a parameter (diff pushed)'''
+    with tempfile.TemporaryDirectory() as d:
+        for p in protocols:
+            writeTestTNT(os.path.join(d, p+'.tnt'), np.zeros(shape, np.complex64))
+        tnmr=TNMR(None, app=FakeTNMRApp(latency=latency))
+        cache=ProtocolCache(tnmr, d, protocols)
+        cache.preload(message=print)
+        cases=(('openFile', lambda p: tnmr.openFile(cache.fileName(p)), True), ('select', cache.select, True),
+               ('openFile same', lambda p: tnmr.openFile(cache.fileName(p)), False), ('select same', cache.select, False))
+        for name, select, alternate in cases:
+            tnmr.App.resetCalls()
+            t0=time.perf_counter()
+            for i in range(nSelect):
+                select(protocols[i % len(protocols)] if alternate else protocols[0])
+                tnmr.setNMRParameter('Scans 1D', i+2)     #the user changes the protocol before it is selected again
+            t=(time.perf_counter()-t0)/nSelect
+            print('{:>14}: {:.4f}s, {:.1f} COM calls per selection'.format(name, t, sum(tnmr.App.calls.values())/nSelect))
+
+if __name__ == '__main__':
+    tests=sys.argv[1:] or ['data', 'com', 'recipe', 'protocol']
+    if 'data' in tests:
+        benchData()
+    if 'com' in tests:
+        benchCOM()
+    if 'recipe' in tests:
+        benchRecipe()
+    if 'protocol' in tests:
+        benchProtocol()
@@ -0,0 +1,91 @@
+'''
+Created on Oct 17, 2026
+
+Memoized views of (RO, slice, phase, parameter) NMR data for plotting, used by MRIcontrol.plotData.
+Spectra (fftshifted FFT along the readout) are computed lazily one (slice, phase, parameter) column at a time, or once for the whole array
+when every column is needed.  The zero order phase correction is applied to the cached spectra instead of the data, so changing the phase
+or the displayed column never recomputes an FFT.  The cache is keyed on the identity of the data array and a version number,
+call invalidate() after modifying the data in place.
+'''
+from collections import OrderedDict
+import numpy as np
+import fftBackend
+
+viewKinds={'complex':lambda c: c, 'mag':np.absolute, 'phase':np.angle, 'real':lambda c: c.real, 'imag':lambda c: c.imag}
+
+class DataViewCache():
+  '''FIDs, spectra and their magnitude, phase, real and imaginary traces for one data array'''
+  def __init__(self, maxViews=64):
+      self.maxViews=maxViews        #number of memoized 1d traces kept
+      self.data=None
+      self.version=0        #incremented whenever the data changes
+      self.phase=0.0        #zero order phase correction in radians
+      self.clear()
+
+  def clear(self):
+      self.columnSpectra={}     #(slice, phase, parameter): unphased spectrum
+      self.allSpectra=None      #unphased spectra of the whole array once computed
+      self.views=OrderedDict()      #(version, phase, domain, kind, column): trace, least recently used first
+
+  def setData(self, data, phase=None):
+      '''use data, phase=zero order phase correction(radians), None keeps the current phase if data is the array already cached'''
+      if data is not self.data:
+          self.data=data
+          self.version+=1
+          self.clear()
+          if phase is None:
+              phase=0.0
+      if phase is not None:
+          self.phase=float(phase)
+
+  def invalidate(self):
+      '''the data has been modified in place'''
+      self.version+=1
+      self.clear()
+
+  def column(self, column):
+      '''index of the 1d readout trace (slice, phase, parameter), negative indices are normalized so they share cache entries'''
+      return tuple(int(i) % n for i, n in zip(column, self.data.shape[1:]))
+
+  def spectrum(self, column):
+      '''unphased fftshifted spectrum of one column, computed the first time it is needed'''
+      column=self.column(column)
+      if self.allSpectra is not None:
+          return self.allSpectra[(slice(None),)+column]
+      s=self.columnSpectra.get(column)
+      if s is None:
+          s=fftBackend.fftshift(fftBackend.fft(np.asarray(self.data[(slice(None),)+column])))
+          s.setflags(write=False)
+          self.columnSpectra[column]=s
+      return s
+
+  def spectra(self, phased=True):
+      '''spectra of the whole array (FFT along axis 0, fftshifted), computed once'''
+      if self.allSpectra is None:
+          self.allSpectra=fftBackend.fftshift(fftBackend.fft(np.asarray(self.data), axis=0), axes=0)
+          self.allSpectra.setflags(write=False)
+          self.columnSpectra.clear()
+      if phased and self.phase!=0:
+          return self.allSpectra*np.exp(-1j*self.phase)
+      return self.allSpectra
+
+  def view(self, domain='spectrum', kind='mag', column=(0,0,0)):
+      '''1d trace of column, domain='fid' or 'spectrum', kind='complex', 'mag', 'phase', 'real' or 'imag', with the phase correction applied'''
+      column=self.column(column)
+      phase=0.0 if kind=='mag' else self.phase      #magnitude does not depend on the phase
+      key=(self.version, phase, domain, kind, column)
+      v=self.views.get(key)
+      if v is not None:
+          self.views.move_to_end(key)
+          return v
+      if domain=='fid':
+          c=np.asarray(self.data[(slice(None),)+column])
+      else:
+          c=self.spectrum(column)
+      if phase!=0:
+          c=c*np.exp(-1j*phase)
+      v=viewKinds[kind](c)
+      self.views[key]=v
+      if len(self.views)>self.maxViews:
+          self.views.popitem(last=False)
+      return v
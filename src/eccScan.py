@@ -0,0 +1,254 @@
+'''
+Created on Oct 17, 2026
+
+Pipelined parameter scans for eddy current compensation (ECC) and similar single FID experiments.
+Acquisition stays on the calling (GUI/COM) thread: set the parameter, start the acquisition, wait, fetch the data.  As soon as a FID is fetched
+the next acquisition is started and the FID is analyzed (FFT, amplitude, spectral moments) on a worker thread, so the scan time approaches the
+pure acquisition time.  Finished results are handed back on the calling thread, in step order, for incremental plotting, and every raw data
+array is written to one .npy file (steps, RO, slice, phase, parameter) that can be read with np.load(file, mmap_mode='r').
+AdaptiveScan searches for the optimum of one parameter, or a small group, with a coarse grid and golden section refinement instead of a full
+grid, each acquisition is analyzed before the next point is chosen.
+'''
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import fftBackend
+import peakAnalysis
+
+def analyzeFID(data, dwellTime):
+    '''FID amplitude (sum of |FID|), mean frequency and rms peak width(Hz) of the first FID in data'''
+    fid=data[:,0,0,0] if data.ndim==4 else data
+    sfreq=-(np.fft.fftshift(np.fft.fftfreq(fid.shape[0], dwellTime)))
+    spectrum=np.absolute(fftBackend.fftshift(fftBackend.fft(fid)))
+    avFreq, pkwidth=peakAnalysis.spectralMoments(spectrum, sfreq)
+    return {'fidAmp':float(np.sum(np.absolute(fid))), 'avFreq':float(avFreq), 'pkwidth':float(pkwidth)}
+
+class ECCScan():
+  '''Scan values of one parameter with acquisition on the calling thread and analysis on worker threads
+      setParameter(value)     writes the parameter to the pulse sequence
+      start()                 starts an acquisition without waiting
+      busy()                  True while acquiring
+      fetch()                 returns the data of the finished acquisition
+      wait(t)                 waits t seconds while keeping the GUI responsive
+      aborted()               True to stop the scan
+      onResult(i, value, result)  called on the calling thread for each analyzed step, in step order'''
+  def __init__(self, setParameter, start, busy, fetch, values, analyze=analyzeFID, analyzeArgs=(), rawFile=None, onResult=None,
+               wait=time.sleep, aborted=None, workers=1, pollInterval=0.1):
+      self.setParameter=setParameter
+      self.start=start
+      self.busy=busy
+      self.fetch=fetch
+      self.values=np.asarray(values, dtype=float)
+      self.analyze=analyze
+      self.analyzeArgs=analyzeArgs
+      self.rawFile=rawFile
+      self.onResult=onResult
+      self.wait=wait
+      self.aborted=aborted if aborted is not None else (lambda: False)
+      self.workers=workers
+      self.pollInterval=pollInterval
+      self.results=[None]*len(self.values)
+      self.raw=None
+      self.nextResult=0     #next step to hand to onResult
+      self.timing={'acquire':0.0, 'fetch':0.0, 'total':0.0}
+
+  def run(self):
+      '''run the scan, returns the list of analysis results (None for steps not acquired)'''
+      t0=time.perf_counter()
+      futures={}
+      n=len(self.values)
+      with ThreadPoolExecutor(max_workers=self.workers) as pool:
+          if n>0:
+              self.setParameter(self.values[0])
+              self.start()
+          for i in range(n):
+              ta=time.perf_counter()
+              while self.busy():
+                  self.collect(futures)
+                  self.wait(self.pollInterval)
+                  if self.aborted():
+                      break
+              self.timing['acquire']+=time.perf_counter()-ta
+              if self.aborted():
+                  break
+              tf=time.perf_counter()
+              data=np.array(self.fetch())       #own copy, the worker must not see later changes
+              self.timing['fetch']+=time.perf_counter()-tf
+              if i+1<n:     #start the next acquisition before analyzing this one
+                  self.setParameter(self.values[i+1])
+                  self.start()
+              self.store(i, data)
+              futures[i]=pool.submit(self.analyze, data, *self.analyzeArgs)
+              self.collect(futures)
+          while futures:
+              self.collect(futures, block=True)
+      if self.raw is not None:
+          self.raw.flush()
+      self.timing['total']=time.perf_counter()-t0
+      return self.results
+
+  def store(self, i, data):
+      '''write the raw data of step i to the .npy file, created when the first data shape is known'''
+      if self.rawFile is None:
+          return
+      if self.raw is None:
+          self.raw=np.lib.format.open_memmap(self.rawFile, mode='w+', dtype=data.dtype, shape=(len(self.values),)+data.shape)
+      self.raw[i]=data
+
+  def collect(self, futures, block=False):
+      '''hand finished analyses to onResult in step order'''
+      while self.nextResult in futures and (block or futures[self.nextResult].done()):
+          i=self.nextResult
+          self.results[i]=futures.pop(i).result()
+          if self.onResult is not None:
+              self.onResult(i, self.values[i], self.results[i])
+          self.nextResult+=1
+
+class ScanAborted(Exception):
+    pass
+
+class BudgetExhausted(ScanAborted):
+    '''raised when a scan needs more than maxEvaluations acquisitions'''
+    pass
+
+def quadraticOptimum(x, y):
+    '''vertex of a least squares parabola through (x, y) and its standard uncertainty from the fit covariance, nan if it can not be estimated'''
+    x=np.asarray(x, dtype=float)
+    y=np.asarray(y, dtype=float)
+    if len(x)<4 or len(np.unique(x))<3:
+        return np.nan, np.nan
+    A=np.vander(x, 3)       #y=a*x**2+b*x+c
+    p, ssr, rank, sv=np.linalg.lstsq(A, y, rcond=None)
+    a, b=p[0], p[1]
+    if a==0 or rank<3:
+        return np.nan, np.nan
+    x0=-b/(2*a)
+    s2=float(ssr[0])/(len(x)-3) if len(ssr) else 0.0
+    cov=s2*np.linalg.inv(A.T @ A)
+    g=np.array([b/(2*a**2), -1/(2*a), 0.0])      #d(x0)/d(a, b, c)
+    return x0, float(np.sqrt(max(g @ cov @ g, 0.0)))
+
+invphi=(np.sqrt(5)-1)/2
+
+def evaluationBudget(bounds, resolution=0.01, nCoarse=5, sweeps=2):
+    '''acquisitions an AdaptiveScan of parameters with bounds needs at most: for each line search nCoarse grid points and the golden section
+    steps to narrow the bracket of two grid steps to resolution, later sweeps search two grid steps around the optimum'''
+    sweeps=sweeps if len(bounds)>1 else 1
+    n=0
+    for lo, hi in bounds:
+        width=hi-lo
+        for sweep in range(sweeps):
+            bracket=2*width/(nCoarse-1)
+            n+=nCoarse+2+max(0, int(np.ceil(np.log(max(bracket, resolution)/resolution)/np.log(1/invphi))))
+            width=bracket
+    return n
+
+def goldenSectionSearch(f, lo, hi, tol=0.01, maxEvaluations=20):
+    '''minimize f on [lo, hi] assuming a single minimum, returns (x, f(x)) of the best point evaluated'''
+    a, b=lo, hi
+    c=b-invphi*(b-a)
+    d=a+invphi*(b-a)
+    fc, fd=f(c), f(d)
+    n=2
+    while abs(b-a)>tol and n<maxEvaluations:
+        if fc<fd:
+            b, d, fd=d, c, fc
+            c=b-invphi*(b-a)
+            fc=f(c)
+        else:
+            a, c, fc=c, d, fd
+            d=a+invphi*(b-a)
+            fd=f(d)
+        n+=1
+    return (c, fc) if fc<fd else (d, fd)
+
+class AdaptiveScan():
+  '''Coarse to fine search for the value of one parameter, or a small group (e.g. an ECC amplitude and its time constant), that maximizes the FID
+  amplitude or minimizes the peak width.  Each parameter is searched in turn (coordinate search, repeated sweeps times): a coarse grid of nCoarse
+  points finds the bracket around the best value, then a golden section search refines it to the parameter resolution.
+  Each optimum is the vertex of a least squares parabola through all evaluations along that parameter within one coarse grid step of the
+  best point (the bracket of the last line search), and its uncertainty is from the fit covariance with the noise estimated from the fit
+  residuals.  If no parabola fits the best evaluated point is reported with nan uncertainty.
+      setParameters({name: value})    writes the parameters to the pulse sequence
+      acquire()                       runs one acquisition and returns its data
+      onEvaluation(n, {name: value}, result)  called after each new acquisition'''
+  def __init__(self, setParameters, acquire, names, bounds, metric='fidAmp', maximize=True, analyze=analyzeFID, analyzeArgs=(),
+               resolution=0.01, maxEvaluations=30, nCoarse=5, sweeps=2, onEvaluation=None, aborted=None):
+      self.setParameters=setParameters
+      self.acquire=acquire
+      self.names=list(names)
+      self.bounds=[tuple(map(float, b)) for b in bounds]
+      self.metric=metric
+      self.maximize=maximize
+      self.analyze=analyze
+      self.analyzeArgs=analyzeArgs
+      self.resolution=resolution        #parameters are rounded to this, so repeated points are not acquired twice
+      self.maxEvaluations=maxEvaluations
+      self.nCoarse=nCoarse
+      self.sweeps=sweeps if len(self.names)>1 else 1
+      self.onEvaluation=onEvaluation
+      self.aborted=aborted if aborted is not None else (lambda: False)
+      self.evaluations={}       #rounded parameter tuple: (cost, result)
+      self.history=[]       #(parameter tuple, result) in acquisition order
+
+  def cost(self, x):
+      '''acquire and analyze at x (cached), returns the metric to minimize'''
+      key=tuple(round(v/self.resolution)*self.resolution for v in x)
+      if key not in self.evaluations:
+          if self.aborted():
+              raise ScanAborted()
+          if len(self.evaluations)>=self.maxEvaluations:
+              raise BudgetExhausted()
+          self.setParameters(dict(zip(self.names, key)))
+          result=self.analyze(self.acquire(), *self.analyzeArgs)
+          value=result[self.metric]
+          self.evaluations[key]=(-value if self.maximize else value, result)
+          self.history.append((key, result))
+          if self.onEvaluation is not None:
+              self.onEvaluation(len(self.history), dict(zip(self.names, key)), result)
+      return self.evaluations[key][0]
+
+  def lineSearch(self, x, k, lo, hi):
+      '''coarse grid then golden section search of parameter k between lo and hi with the others fixed at x, returns the best value'''
+      def f(v):
+          xv=list(x)
+          xv[k]=v
+          return self.cost(xv)
+      grid=np.linspace(lo, hi, self.nCoarse)
+      costs=[f(v) for v in grid]
+      i=int(np.argmin(costs))
+      a, b=grid[max(i-1, 0)], grid[min(i+1, len(grid)-1)]
+      v, c=goldenSectionSearch(f, a, b, tol=self.resolution, maxEvaluations=self.maxEvaluations)
+      return v if c<=costs[i] else grid[i]
+
+  def run(self):
+      '''returns a dictionary with the optimum and uncertainty of each parameter, the best measured metric value, the number of acquisitions,
+      aborted (by the user) and exhausted (stopped at maxEvaluations)'''
+      x=[0.5*(lo+hi) for lo, hi in self.bounds]
+      aborted=exhausted=False
+      try:
+          for sweep in range(self.sweeps):
+              for k, (lo, hi) in enumerate(self.bounds):
+                  if sweep>0:       #later sweeps search a narrower range around the current optimum
+                      w=(hi-lo)/(self.nCoarse-1)
+                      lo, hi=max(lo, x[k]-w), min(hi, x[k]+w)
+                  x[k]=self.lineSearch(x, k, lo, hi)
+      except BudgetExhausted:
+          exhausted=True
+      except ScanAborted:
+          aborted=True
+      best=min(self.evaluations, key=lambda key: self.evaluations[key][0]) if self.evaluations else tuple(x)
+      optimum={}
+      uncertainty={}
+      for k, name in enumerate(self.names):     #points along parameter k through the best point, within its bracket
+          w=(self.bounds[k][1]-self.bounds[k][0])/(self.nCoarse-1)
+          line=[(key[k], c) for key, (c, r) in self.evaluations.items()
+                if abs(key[k]-best[k])<=w and all(key[j]==best[j] for j in range(len(best)) if j!=k)]
+          v, u=quadraticOptimum([p[0] for p in line], [p[1] for p in line])
+          if np.isfinite(u) and abs(v-best[k])<=w:
+              optimum[name], uncertainty[name]=float(np.clip(v, *self.bounds[k])), u
+          else:
+              optimum[name], uncertainty[name]=best[k], np.nan
+      bestCost=self.evaluations[best][0] if best in self.evaluations else np.nan
+      return {'optimum':optimum, 'uncertainty':uncertainty, 'metric':-bestCost if self.maximize else bestCost,
+              'evaluations':len(self.evaluations), 'aborted':aborted, 'exhausted':exhausted}
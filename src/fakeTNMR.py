@@ -0,0 +1,305 @@
+'''
+Created on Oct 17, 2026
+
+Offline stand-in for the TNMR COM server (NTNMR.Application and its documents) so TNMRmri.TNMR, MRIcontrol recipes and shimming
+can be run, tested and profiled without a Tecmag console or Windows.
+Documents are opened from .tnt templates: dashboard parameters are seeded from the TMAG header, tables from the pulse sequence section,
+and data from the DATA section (or a simulated FID if the dimensions change).
+Every COM call can be given a latency and is counted in FakeTNMRApp.calls, acquisitions (ZG) and shimming run in simulated time that
+can be sped up with FakeTNMRApp.speedup.
+Like the COM server, GetSequenceTime, GetTableList, getData, getComment, CheckAcquisition, CheckShimProgress and CloseActiveFile are properties.
+
+usage:
+    set PYMRI_TNMR=fake     (or pass app=FakeTNMRApp() to TNMRmri.TNMR)
+'''
+import os, time
+from collections import Counter
+import numpy as np
+import TNTdtypes
+from processTNT import TNTfile
+
+#dashboard parameters that are not in the TMAG header, B0 compensation and gradient preemphasis as in TNMRmri.TNMR defaults
+defaultParameters={'Exp. Elapsed Time':'00:00:00', 'Exp. Finish Time':'', 'Shim Units':'0', 'pw':'100.0u', 'pw180':'200.0u', 'rfAttn90':'10.0', 'rfAttn180':'4.0',
+                   'Gspoil':'0', 'tspoil':'1m', 'Gdp':'0', 'tcrush':'1m', 'Gp':'0', 'Gr':'0', 'Grr':'0', 'Gs':'0', 'Gsr':'0', 'tpe':'1m', 'tramp':'100u',
+                   'ti0':'1m', 'tr0':'10m', 'te0':'5m'}
+for axis in ('x', 'y', 'z'):
+    for i in range(6):
+        defaultParameters['A{}.b{}'.format(i, axis)]='0'
+        defaultParameters['A{}.{}'.format(i, axis)]='0'
+    for i, tc in enumerate(('0.2000m', '2.0000m', '20.0000m', '200.0000m', '2000.0000m')):
+        defaultParameters['T{}.b{}'.format(i+1, axis)]=tc
+        defaultParameters['T{}.{}'.format(i+1, axis)]=tc
+    defaultParameters['DC.b'+axis]='0'
+    defaultParameters['DC.'+axis]='0'
+shimNames=('Z0', 'Z1', 'Z2', 'Z3', 'Z4', 'X', 'Y', 'ZX', 'ZY', 'XY', 'X2-Y2', 'Z2X', 'Z2Y', 'Z3X', 'Z3Y', 'Z2XY', 'Z2X2-Y2', 'X3', 'Y3')
+
+def siValue(p):
+    '''float value of a dashboard string such as '10m', '2.5u' or '400.123MHz' '''
+    p=str(p).strip().replace('MHz', 'E6').replace('kHz', 'E3').replace('Hz', '')
+    for suffix, mult in (('m', 1E-3), ('u', 1E-6), ('n', 1E-9), ('s', 1)):
+        if p.endswith(suffix):
+            return float(p[:-1])*mult
+    return float(p)
+
+def templateParameters(tnt):
+    '''dashboard parameter strings from the TMAG header of a template TNTfile'''
+    t=tnt.TMAG
+    p={'Observe Freq.':'{:.6f}'.format(t['ob_freq'][0]), 'Acq. Points':str(t['npts'][0]), 'SW +/-':'{:.3f}Hz'.format(t['sw'][0]),
+       'Receiver Gain':str(t['receiver_gain']), 'Scans 1D':str(max(1, t['scans'])), 'S.A. Dimension':str(max(1, t['sadimension'])),
+       'Dwell Time':'{:.4f}m'.format(t['dwell'][0]*1000), 'Last Delay':'{:.3f}m'.format(t['last_delay']*1000), 'Acq. Time':'{:.4f}m'.format(t['acq_time']*1000),
+       'Shim Units':'{:g}'.format(t['shim_units']), 'Grd. Orientation':t['grd_orientation'].decode('latin1').strip('\x00') or 'XYZ',
+       'Date':t['date'].decode('latin1').strip('\x00')}
+    for i in range(1, 4):
+        p['Points {}D'.format(i+1)]=str(max(1, t['npts'][i]))
+    return p
+
+def writeTNT(fileName, data, tmag=None, tmg2=None, sections=()):
+    '''write a .tnt file holding data (RO, slice, phase, parameter), sections is a list of raw (tag, bytes) written after TMG2 (PSEQ, CMNT ...)'''
+    if tmag is None:
+        tmag=np.zeros(1, TNTdtypes.TMAG)[0]
+    if tmg2 is None:
+        tmg2=np.zeros(1, TNTdtypes.TMG2)[0]
+    tmag=np.array(tmag, TNTdtypes.TMAG)
+    tmag['npts']=data.shape
+    tmag['actual_npts']=data.shape
+    d=np.asarray(data, dtype='<c8').ravel(order='F').tobytes()
+    with open(fileName, 'wb') as f:
+        f.write(b'TNT1.000')
+        for tag, b in ((b'TMAG', tmag.tobytes()), (b'DATA', d), (b'TMG2', np.array(tmg2, TNTdtypes.TMG2).tobytes()))+tuple(sections):
+            f.write(np.array([(tag, 1, len(b))], TNTdtypes.TLV).tobytes())
+            f.write(b)
+
+class FakeTNMRApp():
+  '''stand in for win32com.client.Dispatch('NTNMR.Application')'''
+  def __init__(self, latency=0, speedup=1, shimTime=10, tables=None, seed=0):
+      self.latency=latency      #seconds added to every COM call
+      self.speedup=speedup      #simulated acquisition and shim time runs this much faster than real time
+      self.shimTime=shimTime    #simulated autoshim duration in s
+      self.tables=tables or {}  #extra tables {name: string} added to every document, for tables TNTfile.read_tables does not find
+      self.calls=Counter()      #number of COM calls by name
+      self.rng=np.random.default_rng(seed)
+      self.documents={}
+      self.activeDocument=None
+      self.shims={s:0 for s in shimNames}
+      self.activeShims=[]
+      self.shimEnd=0
+
+  def call(self, name):
+      '''count a COM call and apply the latency'''
+      self.calls[name]+=1
+      if self.latency>0:
+          time.sleep(self.latency)
+
+  def resetCalls(self):
+      self.calls.clear()
+
+  def GetObject(self, fileName):
+      '''open a .tnt file as a document, as win32com.client.GetObject(fileName)'''
+      self.call('GetObject')
+      fileName=fileName.strip()
+      doc=self.documents.get(fileName)
+      if doc is None:
+          doc=FakeTNMRDocument(self, fileName)
+          self.documents[fileName]=doc
+      self.activeDocument=doc
+      return doc
+
+  @property
+  def CheckAcquisition(self):
+      '''True when the active document is idle, False while acquiring'''
+      self.call('CheckAcquisition')
+      return self.activeDocument is None or not self.activeDocument.acquiring()
+
+  @property
+  def CloseActiveFile(self):
+      self.call('CloseActiveFile')
+      if self.activeDocument is not None:
+          self.documents.pop(self.activeDocument.fileName, None)
+          self.activeDocument=None
+      return True
+
+  def SaveShims(self, fileName=''):
+      self.call('SaveShims')
+
+  def GetOneShim(self, shim):
+      self.call('GetOneShim')
+      return self.shims[shim]
+
+  def SetOneShim(self, shim, value):
+      self.call('SetOneShim')
+      self.shims[shim]=int(value)
+
+  def SetAutoShimParameters(self, delay, precision, lockOrFid, step):
+      self.call('SetAutoShimParameters')
+      self.shimParameters=(delay, precision, lockOrFid, step)
+
+  def ActivateShims(self, shims):
+      self.call('ActivateShims')
+      self.activeShims=list(shims) if not isinstance(shims, str) else shims.split()
+
+  def StartShims(self):
+      self.call('StartShims')
+      self.shimEnd=time.monotonic()+self.shimTime/self.speedup
+
+  @property
+  def CheckShimProgress(self):
+      '''True while autoshimming'''
+      self.call('CheckShimProgress')
+      return time.monotonic()<self.shimEnd
+
+class FakeTNMRDocument():
+  '''stand in for the TNMR document returned by win32com.client.GetObject(fileName)'''
+  def __init__(self, app, fileName):
+      self.app=app
+      self.fileName=fileName
+      self.parameters=dict(defaultParameters)
+      self.tables=dict(app.tables)
+      self.comment=''
+      self.sections=()
+      self.tmag=None
+      self.tmg2=None
+      self.data=None
+      self.acqStart=None
+      self.acqEnd=None
+      if os.path.isfile(fileName):
+          tnt=TNTfile(fileName)
+          self.tmag=tnt.TMAG
+          self.tmg2=tnt.TMG2
+          self.parameters.update(templateParameters(tnt))
+          self.data=np.array(tnt.DATA, dtype=np.complex64, order='F')
+          if 'PSEQ' in tnt.tnt_sections:
+              self.sections=tuple((tag.encode('latin1'), tnt.read_section(tag)) for tag in tnt.tnt_sections if tag not in ('TMAG', 'DATA', 'TMG2'))
+              self.tables.update(tnt.read_tables(convert=False))
+              try:
+                  self.comment=tnt.TNMRCommentRaw
+              except Exception:
+                  pass
+      self.setActuals(self.dimensions() if self.data is None else self.data.shape, int(self.parameters['Scans 1D']))
+
+  def dimensions(self):
+      return (int(self.parameters['Acq. Points']),)+tuple(int(self.parameters['Points {}D'.format(i)]) for i in range(2, 5))
+
+  def setActuals(self, npts, scans):
+      self.parameters['Actual Scans 1D']=str(scans)
+      for i in range(2, 5):
+          self.parameters['Actual Points {}D'.format(i)]=str(npts[i-1])
+
+  def sequenceTime(self):
+      '''scans x (acquisition time + last delay) x points in 2D, 3D and 4D, in s'''
+      d=self.dimensions()
+      tr=siValue(self.parameters['Acq. Time'])+siValue(self.parameters['Last Delay'])
+      return int(self.parameters['Scans 1D'])*tr*d[1]*d[2]*d[3]
+
+  def acquiring(self):
+      '''True while a simulated acquisition is running, updates the Actual Scans/Points parameters'''
+      if self.acqEnd is None:
+          return False
+      now=time.monotonic()
+      d=self.dimensions()
+      if now>=self.acqEnd:
+          self.acqEnd=None
+          self.setActuals(d, int(self.parameters['Scans 1D']))
+          self.parameters['Exp. Elapsed Time']=time.strftime('%H:%M:%S', time.gmtime(self.sequenceTime()))
+          return False
+      f=(now-self.acqStart)/(self.acqEnd-self.acqStart)
+      n=int(f*d[1]*d[2]*d[3])       #completed columns, 2D fastest
+      self.setActuals((d[0], min(d[1], n % d[1]+1), min(d[2], n//d[1] % d[2]+1), min(d[3], n//(d[1]*d[2])+1)), int(self.parameters['Scans 1D']))
+      return True
+
+  def simulateData(self, shape):
+      '''noisy decaying FID in every column'''
+      t=np.arange(shape[0])/max(1, shape[0])
+      fid=(np.exp(-5*t+2j*np.pi*10*t)*1000).astype(np.complex64)
+      noise=self.app.rng.standard_normal((2,)+tuple(shape)).astype(np.float32)*10
+      return np.asfortranarray(fid.reshape((-1, 1, 1, 1))+noise[0]+1j*noise[1])
+
+  def GetNMRParameter(self, name):
+      self.app.call('GetNMRParameter')
+      if name.startswith('Actual'):
+          self.acquiring()
+      return self.parameters[name]
+
+  def SetNMRParameter(self, name, value):
+      self.app.call('SetNMRParameter')
+      if name=='Observe Freq.':
+          value=str(value).replace('MHz', '')     #TNMR returns the observe frequency as a number in MHz
+      self.parameters[name]=str(value)
+
+  def GetTable(self, name):
+      self.app.call('GetTable')
+      return self.tables[name]
+
+  def SetTable(self, name, value):
+      self.app.call('SetTable')
+      self.tables[name]=value if isinstance(value, str) else ' '.join(str(v) for v in value)
+
+  def GetNDSize(self, n):
+      self.app.call('GetNDSize')
+      shape=self.dimensions() if self.data is None else self.data.shape
+      return int(shape[n-1])
+
+  @property
+  def GetTableList(self):
+      self.app.call('GetTableList')
+      return ','.join(self.tables)
+
+  @property
+  def GetSequenceTime(self):
+      self.app.call('GetSequenceTime')
+      return self.sequenceTime()
+
+  @property
+  def GetCursorPosition(self):
+      self.app.call('GetCursorPosition')
+      return 1
+
+  @property
+  def getComment(self):
+      self.app.call('getComment')
+      return self.comment
+
+  GetComment=getComment
+
+  def SetComment(self, comment):
+      self.app.call('SetComment')
+      self.comment=comment
+
+  @property
+  def getData(self):
+      '''data as a tuple of interleaved real/imaginary floats, as the COM server returns it'''
+      self.app.call('getData')
+      if self.data is None:
+          return ()
+      return tuple(self.data.ravel(order='F').view(np.float32).tolist())
+
+  def Compile(self):
+      self.app.call('Compile')
+
+  def ZG(self):
+      '''start a simulated acquisition of GetSequenceTime/speedup seconds'''
+      self.app.call('ZG')
+      d=self.dimensions()
+      if self.data is None or self.data.shape!=d:
+          self.data=self.simulateData(d)
+      self.setActuals((d[0], 1, 1, 1), int(self.parameters['Scans 1D']))
+      self.acqStart=time.monotonic()
+      self.acqEnd=self.acqStart+self.sequenceTime()/self.app.speedup
+
+  def RG(self):
+      self.app.call('RG')
+      self.ZG()
+
+  def Stop(self):
+      self.app.call('Stop')
+      if self.acqEnd is not None:
+          self.acqEnd=time.monotonic()
+
+  def Abort(self):
+      self.app.call('Abort')
+      self.acqEnd=None
+
+  def SaveAs(self, fileName):
+      '''write the current data, header and template sequence sections as a .tnt file'''
+      self.app.call('SaveAs')
+      if fileName:
+          writeTNT(fileName, self.simulateData(self.dimensions()) if self.data is None else self.data, self.tmag, self.tmg2, self.sections)
@@ -0,0 +1,162 @@
+'''
+Created on Oct 17, 2026
+
+Pluggable FFT backend used by processTNT.LBfft, reconTNT, MRIcontrol and TNMRviewer.
+Backends:
+    'scipy'   scipy.fft, multithreaded with workers=
+    'pyfftw'  pyFFTW builders, plans are cached by (transform, shape, dtype, size, axes) so repeated same-shaped transforms do not replan
+    'numpy'   numpy.fft, single threaded fallback
+The backend is selected with the environment variables PYMRI_FFT_BACKEND (scipy, pyfftw, numpy), PYMRI_FFT_WORKERS (threads, default all cores)
+and PYMRI_FFTW_EFFORT (FFTW_ESTIMATE, FFTW_MEASURE ...), or at run time with setBackend().  If the requested backend can not be imported the
+next available one is used (pyfftw -> scipy -> numpy).
+All transforms follow numpy.fft conventions (unnormalized forward, 1/n inverse).
+A pyFFTW plan shares its input and output arrays, so plan lookup and execution hold planLock and threads (e.g. ECCScan workers and the GUI)
+run pyfftw transforms one at a time.
+'''
+import os, threading
+import numpy as np
+try:
+    import scipy.fft as scipyfft
+except:
+    scipyfft=None
+try:
+    import pyfftw
+    import pyfftw.builders
+except:
+    pyfftw=None
+
+fftshift=np.fft.fftshift
+ifftshift=np.fft.ifftshift
+fftfreq=np.fft.fftfreq
+
+backend='numpy'
+workers=1
+plannerEffort='FFTW_MEASURE'
+planCache={}        #pyfftw plans keyed by (transform, shape, dtype, size, axes)
+planLock=threading.RLock()      #guards planCache and the execution of its plans
+maxCachedPlans=64
+
+def available():
+    '''list of the backends that can be used'''
+    b=['numpy']
+    if scipyfft is not None:
+        b.insert(0, 'scipy')
+    if pyfftw is not None:
+        b.insert(0, 'pyfftw')
+    return b
+
+def setBackend(name=None, nworkers=None, effort=None):
+    '''select the FFT backend and number of threads, None keeps the current (or environment) setting, returns the backend in use'''
+    global backend, workers, plannerEffort
+    if name is None:
+        name=os.environ.get('PYMRI_FFT_BACKEND', 'scipy')
+    if nworkers is None:
+        nworkers=int(os.environ.get('PYMRI_FFT_WORKERS', os.cpu_count() or 1))
+    if effort is None:
+        effort=os.environ.get('PYMRI_FFTW_EFFORT', plannerEffort)
+    name=name.lower()
+    order=['pyfftw', 'scipy', 'numpy']
+    if name not in order:
+        raise ValueError('Unknown FFT backend {}, use one of {}'.format(name, order))
+    for b in order[order.index(name):]:
+        if b in available():
+            backend=b
+            break
+    with planLock:
+        workers=max(1, int(nworkers))
+        plannerEffort=effort
+        planCache.clear()
+    return backend
+
+def clearPlans():
+    with planLock:
+        planCache.clear()
+
+def fftwPlan(kind, a, size, axes):
+    '''return a cached pyfftw builder plan for this transform, shape and dtype, call and run it with planLock held'''
+    key=(kind, a.shape, a.dtype.str, size, axes)
+    plan=planCache.get(key)
+    if plan is None:
+        if len(planCache)>=maxCachedPlans:
+            planCache.pop(next(iter(planCache)))
+        builder=getattr(pyfftw.builders, kind)
+        if kind in ('fft', 'ifft'):
+            plan=builder(a, n=size, axis=axes, threads=workers, planner_effort=plannerEffort, auto_align_input=True, auto_contiguous=True)
+        else:
+            plan=builder(a, s=size, axes=axes, threads=workers, planner_effort=plannerEffort, auto_align_input=True, auto_contiguous=True)
+        planCache[key]=plan
+    return plan
+
+def runFFTW(kind, a, size, axes):
+    '''execute a cached plan into a fresh output array (the plan's own output array is reused by the next call)'''
+    with planLock:
+        plan=fftwPlan(kind, a, size, axes)
+        out=pyfftw.empty_aligned(plan.output_shape, dtype=plan.output_dtype)
+        plan(a, out)
+    return out
+
+def emptyAligned(shape, dtype=np.complex64, order='F'):
+    '''uninitialized work array, SIMD aligned when pyFFTW is in use so in place plans can be reused'''
+    if pyfftw is not None and backend=='pyfftw':
+        return pyfftw.empty_aligned(shape, dtype=dtype, order=order)
+    return np.empty(shape, dtype=dtype, order=order)
+
+def fftInPlace(a, axis=-1):
+    '''complex FFT of a along axis written back into a (no full size output array with pyfftw or scipy), returns a'''
+    if backend=='pyfftw' and pyfftw.is_byte_aligned(a) and (a.flags.f_contiguous or a.flags.c_contiguous):
+        key=('inplace', a.shape, a.dtype.str, a.strides, axis)
+        with planLock:
+            plan=planCache.get(key)
+            if plan is None:
+                if len(planCache)>=maxCachedPlans:
+                    planCache.pop(next(iter(planCache)))
+                scratch=np.lib.stride_tricks.as_strided(pyfftw.empty_aligned(a.nbytes//a.itemsize, dtype=a.dtype), a.shape, a.strides)   #planning overwrites its arrays
+                plan=pyfftw.FFTW(scratch, scratch, axes=(axis,), threads=workers, flags=(plannerEffort,))
+                planCache[key]=plan
+            plan.update_arrays(a, a)
+            plan.execute()
+        return a
+    if backend=='scipy':
+        r=scipyfft.fft(a, axis=axis, overwrite_x=True, workers=workers)
+    else:
+        r=np.fft.fft(a, axis=axis)
+    if not np.shares_memory(r, a):
+        a[...]=r
+    return a
+
+def fft(a, n=None, axis=-1, overwrite_x=False):
+    if backend=='pyfftw':
+        return runFFTW('fft', np.asarray(a), n, axis)
+    if backend=='scipy':
+        return scipyfft.fft(a, n=n, axis=axis, overwrite_x=overwrite_x, workers=workers)
+    return np.fft.fft(a, n=n, axis=axis)
+
+def ifft(a, n=None, axis=-1, overwrite_x=False):
+    if backend=='pyfftw':
+        return runFFTW('ifft', np.asarray(a), n, axis)
+    if backend=='scipy':
+        return scipyfft.ifft(a, n=n, axis=axis, overwrite_x=overwrite_x, workers=workers)
+    return np.fft.ifft(a, n=n, axis=axis)
+
+def fft2(a, s=None, axes=(-2,-1), overwrite_x=False):
+    if backend=='pyfftw':
+        return runFFTW('fft2', np.asarray(a), s, tuple(axes))
+    if backend=='scipy':
+        return scipyfft.fft2(a, s=s, axes=axes, overwrite_x=overwrite_x, workers=workers)
+    return np.fft.fft2(a, s=s, axes=axes)
+
+def ifft2(a, s=None, axes=(-2,-1), overwrite_x=False):
+    if backend=='pyfftw':
+        return runFFTW('ifft2', np.asarray(a), s, tuple(axes))
+    if backend=='scipy':
+        return scipyfft.ifft2(a, s=s, axes=axes, overwrite_x=overwrite_x, workers=workers)
+    return np.fft.ifft2(a, s=s, axes=axes)
+
+def fftn(a, s=None, axes=None, overwrite_x=False):
+    if backend=='pyfftw':
+        return runFFTW('fftn', np.asarray(a), s, None if axes is None else tuple(axes))
+    if backend=='scipy':
+        return scipyfft.fftn(a, s=s, axes=axes, overwrite_x=overwrite_x, workers=workers)
+    return np.fft.fftn(a, s=s, axes=axes)
+
+setBackend()
@@ -0,0 +1,183 @@
+'''
+Created on Oct 17, 2026
+
+Background polling of serial (pyvisa) instruments so slow or timed out instruments never block the GUI thread.
+Each InstrumentWorker thread owns one pyvisa resource: it polls its readings at its own interval and publishes the latest timestamped value
+of each to a ReadingCache, runs commands (e.g. a new chiller setpoint) queued from the GUI between polls, and after repeated errors closes
+the resource and reopens it every reconnectInterval seconds.  The GUI only reads the cache.
+Protocols:
+    Opsens fiber optic thermometer      'Channel1:DATA? 1' returns the number of readings then the temperature(C)
+    PolyScience chiller                 'RT' temperature, 'RS' setpoint, 'SSxxx.xx' set setpoint, 'SO0'/'SO1' off/on
+'''
+import time
+import threading
+import queue
+from collections import namedtuple
+from concurrent.futures import Future
+import numpy as np
+
+Reading=namedtuple('Reading', ['value', 'time'])        #time from time.time()
+
+class ReadingCache():
+  '''thread safe latest reading of each key'''
+  def __init__(self):
+      self.lock=threading.Lock()
+      self.readings={}
+
+  def set(self, key, value, t=None):
+      with self.lock:
+          self.readings[key]=Reading(value, time.time() if t is None else t)
+
+  def reading(self, key):
+      '''latest Reading of key, None if there is none'''
+      with self.lock:
+          return self.readings.get(key)
+
+  def get(self, key, maxAge=None, default=np.nan):
+      '''latest value of key, default if there is none or it is older than maxAge seconds'''
+      r=self.reading(key)
+      if r is None or (maxAge is not None and time.time()-r.time>maxAge):
+          return default
+      return r.value
+
+  def age(self, key):
+      r=self.reading(key)
+      return np.inf if r is None else time.time()-r.time
+
+class InstrumentWorker(threading.Thread):
+  '''Thread that owns one instrument
+      open()                  returns the opened and configured resource, called again to reconnect
+      polls                   {key: function(resource)} read every interval, results are stored in cache as name+'.'+key
+      resource                an already opened resource, None opens it on the thread
+  cache[name+'.connected'] is True while the resource is open, cache[name+'.error'] holds the last error message'''
+  def __init__(self, name, open, polls, cache, interval=1.0, resource=None, reconnectInterval=5.0, maxErrors=3):
+      super().__init__(name=name, daemon=True)
+      self.open=open
+      self.polls=polls
+      self.cache=cache
+      self.interval=interval
+      self.resource=resource
+      self.reconnectInterval=reconnectInterval
+      self.maxErrors=maxErrors        #consecutive errors before the resource is closed and reopened
+      self.errors=0
+      self.commands=queue.Queue()
+      self.stopping=threading.Event()
+      self.cache.set(self.name+'.connected', resource is not None)
+
+  def submit(self, command, *args):
+      '''run command(resource, *args) on the worker thread before the next poll, returns a Future with its result'''
+      future=Future()
+      self.commands.put((command, args, future))
+      return future
+
+  def stop(self, timeout=None):
+      self.stopping.set()
+      self.commands.put(None)     #wake the thread
+      self.join(timeout)
+
+  def run(self):
+      while not self.stopping.is_set():
+          if self.resource is None and not self.connect():
+              self.stopping.wait(self.reconnectInterval)
+              continue
+          t0=time.time()
+          for key, poll in self.polls.items():
+              self.runCommands()
+              self.call(lambda r: self.cache.set(self.name+'.'+key, poll(r)))
+              if self.resource is None:
+                  break
+          while not self.stopping.is_set() and self.resource is not None:       #commands are run while waiting for the next poll
+              remaining=self.interval-(time.time()-t0)
+              if remaining<=0:
+                  break
+              try:
+                  item=self.commands.get(timeout=remaining)
+              except queue.Empty:
+                  break
+              if item is not None:
+                  self.runCommand(item)
+      self.disconnect()
+      self.runCommands()        #fail commands left in the queue
+
+  def connect(self):
+      try:
+          self.resource=self.open()
+          self.errors=0
+          self.cache.set(self.name+'.connected', True)
+          return True
+      except Exception as e:
+          self.cache.set(self.name+'.error', str(e))
+          return False
+
+  def disconnect(self):
+      if self.resource is not None:
+          try:
+              self.resource.close()
+          except Exception:
+              pass
+      self.resource=None
+      self.cache.set(self.name+'.connected', False)
+
+  def call(self, function):
+      '''function(resource), counts errors and disconnects after maxErrors consecutive errors, returns (ok, result or exception)'''
+      try:
+          result=function(self.resource)
+          self.errors=0
+          return True, result
+      except Exception as e:      #timeouts and I/O errors
+          self.errors+=1
+          self.cache.set(self.name+'.error', str(e))
+          if self.errors>=self.maxErrors:
+              self.disconnect()
+          return False, e
+
+  def runCommand(self, item):
+      command, args, future=item
+      if self.resource is None:
+          future.set_exception(ConnectionError(self.name+' is not connected'))
+          return
+      ok, result=self.call(lambda r: command(r, *args))
+      if ok:
+          future.set_result(result)
+      else:
+          future.set_exception(result)
+
+  def runCommands(self):
+      while True:
+          try:
+              item=self.commands.get_nowait()
+          except queue.Empty:
+              return
+          if item is not None:
+              self.runCommand(item)
+
+#***Opsens fiber optic thermometer
+def openOpsens(rm, address='ASRL10::INSTR', baudRate=9600, timeout=2000):
+    '''open and configure the Opsens thermometer, timeout in ms'''
+    resource=rm.open_resource(address, baud_rate=baudRate)
+    resource.read_termination='\n'
+    resource.write_termination='\r'
+    resource.timeout=timeout
+    return resource
+
+def readOpsensTemperature(resource, channel=1):
+    '''temperature(C) of channel, the first line returned is the number of readings'''
+    resource.write('Channel{}:DATA? 1'.format(channel))
+    resource.read()
+    return float(resource.read())
+
+opsensPolls={'temperature':readOpsensTemperature}
+
+#***PolyScience chiller
+def openPolyScience(rm, port='COM9', baudRate=38400, timeout=2000):
+    '''open and configure the PolyScience chiller, timeout in ms'''
+    resource=rm.open_resource(port, baud_rate=baudRate)
+    resource.read_termination='\r'
+    resource.write_termination='\r'
+    resource.timeout=timeout
+    return resource
+
+def polyScienceQuery(resource, command):
+    return resource.query(command)
+
+polySciencePolls={'temperature':lambda r: float(r.query('RT')), 'setpoint':lambda r: float(r.query('RS'))}
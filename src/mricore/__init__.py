@@ -0,0 +1,16 @@
+'''
+Created on Oct 17, 2026
+
+Headless compute core of MRIcontrol: the pulse sequence physics as pure NumPy functions of parameters in SI units, with no Qt widgets or
+TNMR connection, so protocols can be planned, checked, batch swept and benchmarked without starting the GUI.
+    constants       water proton gyromagnetic ratio
+    protocol        Protocol parameter object, derive() gives all gradient amplitudes and DAC values, TE/TI arrays and delay tables
+    gradients       readout, rewind, phase encode and slice gradients, DAC scaling, field of view and voxel size
+    slices          slice positions, frequencies, spacing and thickness
+    diffusion       Stejskal-Tanner b-values and diffusion gradient arrays
+    rf              RF waveform analysis, slice bandwidth, RF power scaling, attenuation and tip angle
+Every function broadcasts over its arguments, so a sweep is one call with array arguments, e.g.
+    Protocol(FoV=np.linspace(0.02, 0.2, 1000), SW=50000, nAcqPoints=256, Grmax=0.1).derive()['GrDAC']
+MRIcontrol reads its widgets into a Protocol, calls these functions and displays the results.
+'''
+from mricore.protocol import Protocol
@@ -0,0 +1,10 @@
+'''
+Created on Oct 17, 2026
+
+Physical constants used by mricore, SI units
+'''
+import numpy as np
+from scipy import constants
+
+gamma=constants.physical_constants["proton gyromag. ratio"][0]*(1-constants.physical_constants["proton mag. shielding correction"][0])      #water proton, rad/s/T
+gammaf=gamma/2/np.pi        #Hz/T
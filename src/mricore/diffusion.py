@@ -0,0 +1,35 @@
+'''
+Created on Oct 17, 2026
+
+Diffusion weighting of pulsed gradient spin echo (PGSE) sequences
+'''
+import numpy as np
+from mricore.constants import gamma
+
+def stejskalTanner(g, delta, Delta, risetime=0.0001, pulsetype='trap'):
+    '''b-value(s/mm^2) of gradient pulses g(T/m) of duration delta separated by Delta with rise and fall time risetime, times in s,
+    generalized Stejskal-Tanner equation for trapezoidal ('trap') or half sine ('hSin') pulses'''
+    if pulsetype=='trap':
+        epsilon=risetime/delta
+        sigma=1-epsilon
+        lamda=0.5
+        kappa=0.5-sigma/6+epsilon**3/60/sigma**2-epsilon**2/12/sigma
+    elif pulsetype=='hSin':
+        sigma=2/np.pi
+        lamda=0.5
+        kappa=3.0/8.0
+    else:
+        raise ValueError('unknown gradient pulse type ' + pulsetype)
+    return 1E-6*(sigma*gamma*delta*np.asarray(g))**2*(Delta-2*(lamda-kappa)*delta)     #SI s/m^2 converted to s/mm^2
+
+def pgseSeparation(delta, diffDelay, tcrush, tramp):
+    '''diffusion gradient pulse separation Delta of the PGSE_Dif sequence'''
+    return 2*(diffDelay+tcrush+4*tramp)+delta
+
+def gradientArray(kind, n, gmax, gmin=0.0):
+    '''n diffusion gradient amplitudes up to gmax, 'Linear' in gradient or 'Quadratic' (linear in b-value)'''
+    if kind=='Linear':
+        return np.linspace(gmin, gmax, num=n)
+    if kind=='Quadratic':
+        return gmax*np.sqrt(np.arange(n)/(n-1))
+    raise ValueError('unknown gradient array type ' + kind)
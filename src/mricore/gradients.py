@@ -0,0 +1,57 @@
+'''
+Created on Oct 17, 2026
+
+Imaging gradient amplitudes (T/m) from the field of view, spectral width and gradient timing, and their TNMR DAC values (+-100 is the
+maximum gradient of the axis).  Signs are the protocol gradient signs (MRIcontrol setup dictionaries).
+'''
+import numpy as np
+from mricore.constants import gammaf
+
+def toDAC(G, Gmax):
+    '''TNMR amplitude of gradient G, 100 is Gmax'''
+    return 100*np.asarray(G)/Gmax
+
+def fromDAC(DAC, Gmax):
+    return np.asarray(DAC)/100*Gmax
+
+def readoutGradient(SW, FoV, sign=1):
+    '''readout gradient for a field of view FoV(m) sampled with spectral width +-SW(Hz)'''
+    return sign*2*SW/FoV/gammaf
+
+def readoutFoV(SW, Gr):
+    '''field of view(m) of readout gradient Gr'''
+    return 2*SW/(gammaf*np.absolute(Gr))
+
+def readoutRewind(Gr, acqTime, tramp, tpe, sign=1):
+    '''gradient that rewinds half the readout during the phase encode pulse tpe'''
+    return sign*0.5*Gr*(acqTime+tramp)/(tpe+tramp)
+
+def phaseEncodeGradient(nAcqPoints, tpe, tramp, FoV, sign=1):
+    '''maximum phase encode gradient for a square field of view with nAcqPoints readout points'''
+    return sign*0.5*nAcqPoints/((tpe+tramp)*FoV*gammaf)
+
+def phaseEncodeRange(Gp, tpe, tramp, FoV, nAcqPoints):
+    return gammaf*Gp*(tpe+tramp)*FoV/nAcqPoints
+
+def phaseEncodeArray(nPhases, nAcqPoints):
+    '''phase encode table, +-100 = +-180deg, linear from positive to negative'''
+    endvalue=int(nPhases/nAcqPoints*100)
+    a0=2*endvalue/(nPhases-1)
+    return np.linspace(endvalue-a0, -endvalue, nPhases)
+
+def voxelSize(FoV, n):
+    return FoV/n
+
+def sliceGradient(sliceDeltaF, sliceThickness, Gmax, sign=1):
+    '''(Gs, DAC, sliceThickness, clipped) for an RF bandwidth sliceDeltaF(Hz), the gradient is limited to Gmax and the slice thickness
+    is then the thinnest possible, clipped is True where it was limited'''
+    Gs=sign*sliceDeltaF/(gammaf*sliceThickness)
+    DAC=toDAC(Gs, Gmax)
+    clipped=np.absolute(DAC)>100
+    DAC=np.where(clipped, 100*np.sign(DAC), DAC)
+    Gs=np.where(clipped, fromDAC(DAC, Gmax), Gs)
+    thickness=np.where(clipped, np.absolute(sliceDeltaF/(gammaf*Gs)), sliceThickness)
+    return Gs, DAC, thickness, clipped
+
+def sliceRewind(Gs, sign=1):
+    return sign*0.6589*Gs
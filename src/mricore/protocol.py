@@ -0,0 +1,85 @@
+'''
+Created on Oct 17, 2026
+
+Protocol parameter object and the echo/inversion time tables of the MRIcontrol protocols.
+A Protocol holds what updatePS reads from the widgets and TNMR, in SI units, and derive() returns every gradient amplitude and DAC value
+updatePS writes to TNMR.  Any parameter can be a NumPy array to sweep it.
+'''
+import numpy as np
+from mricore import gradients
+
+defaultSigns={'GrSign':1, 'GrrSign':1, 'GpSign':1, 'GsSign':1, 'GsrSign':1}     #protocol gradient signs, see the MRIcontrol setup dictionaries
+
+class Protocol():
+  '''pulse sequence parameters in s, Hz, m and T/m, sliceThickness None for sequences without slice selection'''
+  def __init__(self, name='none', SW=50000.0, nAcqPoints=256, nSlices=1, nPhases=1, acqTime=None, lastDelay=1.0, tpe=1E-3, tramp=1E-4,
+               te0=0.0, ti0=0.0, RFpw=1E-3, FoV=0.1, sliceThickness=None, sliceDeltaF=6000.0, Grmax=0.1, Gpmax=0.1, Gsmax=0.1, signs=None):
+      self.name=name
+      self.SW=SW        #spectral width +-SW
+      self.nAcqPoints=nAcqPoints
+      self.nSlices=nSlices
+      self.nPhases=nPhases
+      self.acqTime=acqTime if acqTime is not None else nAcqPoints*0.5/SW     #dwell time is 0.5/SW
+      self.lastDelay=lastDelay
+      self.tpe=tpe      #phase encode pulse duration
+      self.tramp=tramp      #gradient ramp time
+      self.te0=te0      #TE, TI with no added delays
+      self.ti0=ti0
+      self.RFpw=RFpw
+      self.FoV=FoV      #readout field of view
+      self.sliceThickness=sliceThickness
+      self.sliceDeltaF=sliceDeltaF      #RF excitation bandwidth
+      self.Grmax=Grmax      #gradients at DAC=100
+      self.Gpmax=Gpmax
+      self.Gsmax=Gsmax
+      self.signs=dict(defaultSigns, **(signs or {}))
+
+  def derive(self):
+      '''{name: value} of the readout (Gr, Grr), phase encode (Gp) and slice (Gs, Gsr) gradients and their DAC values, voxelSizeRO and
+      TR for slice interleaved sequences, with the slice gradient limited to Gsmax (sliceThickness is then the achievable thickness and
+      sliceClipped True)'''
+      s=self.signs
+      d={}
+      d['Gr']=gradients.readoutGradient(self.SW, self.FoV, s['GrSign'])
+      d['GrDAC']=gradients.toDAC(d['Gr'], self.Grmax)
+      d['Grr']=gradients.readoutRewind(d['Gr'], self.acqTime, self.tramp, self.tpe, s['GrrSign'])
+      d['GrrDAC']=gradients.toDAC(d['Grr'], self.Grmax)
+      d['voxelSizeRO']=gradients.voxelSize(self.FoV, self.nAcqPoints)
+      d['Gp']=gradients.phaseEncodeGradient(self.nAcqPoints, self.tpe, self.tramp, self.FoV, s['GpSign'])
+      d['GpDAC']=gradients.toDAC(d['Gp'], self.Gpmax)
+      if self.sliceThickness is not None:
+          d['Gs'], d['GsDAC'], d['sliceThickness'], d['sliceClipped']=gradients.sliceGradient(self.sliceDeltaF, self.sliceThickness, self.Gsmax, s['GsSign'])
+          d['Gsr']=gradients.sliceRewind(d['Gs'], s['GsrSign'])
+          d['GsrDAC']=gradients.toDAC(d['Gsr'], self.Gsmax)
+      d['TR']=self.nSlices*(self.lastDelay+self.te0)
+      return d
+
+def timingArray(kind, first, last, n):
+    '''n times from first to last, 'Linear' or 'PowerLaw' (constant ratio)'''
+    if kind=='Linear':
+        return np.linspace(first, last, num=n)
+    if kind=='PowerLaw':
+        power=np.exp(np.log(last/first)/(n-1))      #multiplier from min, max and number of times
+        return first*power**np.arange(n)
+    raise ValueError('unknown array type ' + kind)
+
+def echoDelays(TE, te0, protocol, minDelay=1E-6):
+    '''teDelay table values(s) giving echo times TE: TE=2*teDelay+te0 for spin echo imaging, TE=teDelay+te0 for GEMS, TE=teDelay for T2SE_NMR'''
+    TE=np.asarray(TE)
+    if protocol in ('SEMS', 'SEMS2'):
+        delays=TE/2-te0/2
+    elif protocol=='GEMS':
+        delays=TE-te0
+    else:
+        delays=TE
+    return np.maximum(delays, minDelay)       #must be greater than 1 microsecond
+
+def inversionDelays(TI, ti0, protocol, minDelay=1E-6):
+    '''tiDelay (SEMS_IR, TI=tiDelay+ti0) or ti_times (T1IR_NMR, TI=ti_times) table values(s)'''
+    TI=np.asarray(TI)
+    delays=TI-ti0 if protocol=='SEMS_IR' else TI
+    return np.maximum(delays, minDelay)
+
+def formatTable(values, fmt='%.3f', separator='  '):
+    '''TNMR table string of values, e.g. fmt='%.3fm' for delays in ms'''
+    return np.array2string(np.asarray(values), max_line_width=20000, separator=separator, formatter={'float_kind':lambda x: fmt % x}).replace('[','').replace(']', '')
@@ -0,0 +1,45 @@
+'''
+Created on Oct 17, 2026
+
+RF pulse analysis and power scaling.  Shaped pulses are compared with the hard calibration pulse of width calPW(s) whose 90deg
+attenuation calAttn(dB) was measured (MRIcontrol RF Tx calibration).
+'''
+import numpy as np
+import peakAnalysis
+import fftBackend
+
+def rfWaveform(shape, phase):
+    '''real waveform from the rfShape amplitude and rfPhase (0-3 = 0-270deg) tables'''
+    return np.asarray(shape)*np.cos(np.asarray(phase)*np.pi/2)
+
+def integratedWeight(waveform):
+    '''trapezoidal integral of the waveform per point, 100 for a hard pulse'''
+    waveform=np.asarray(waveform)
+    return (np.sum(waveform)-0.5*(waveform[0]+waveform[-1]))/waveform.shape[0]
+
+def waveformSpectrum(waveform):
+    '''(fftshifted FT of the waveform, FWHM of its magnitude in points)'''
+    ft=np.fft.fftshift(fftBackend.fft(waveform))
+    return ft, peakAnalysis.fwhm(np.absolute(ft))
+
+def sliceBandwidth(fwhmPoints, RFpw):
+    '''excitation bandwidth(Hz) of a pulse of width RFpw(s) whose spectrum FWHM is fwhmPoints'''
+    return fwhmPoints/RFpw
+
+def powerScaling(RFpw, weight, calPW=0.5E-3):
+    '''RF field required by the pulse relative to the hard calibration pulse'''
+    return 100*calPW/RFpw/weight
+
+def attenuationCorrection(scaling):
+    '''dB less attenuation needed for an RF field scaling times larger'''
+    return 20*np.log10(scaling)
+
+def suggestedAttenuation(calAttn, correction, step=0.5):
+    '''(90deg attenuation, the same rounded down to step, field derating of the rounded value) for the pulse'''
+    suggested=calAttn-correction
+    rounded=np.trunc(suggested/step)*step
+    return suggested, rounded, 10**((rounded-suggested)/20)
+
+def tipAngle(rfAttn, attn90):
+    '''tip angle(rad) at attenuation rfAttn of a pulse with 90deg attenuation attn90'''
+    return 0.5*np.pi*10**(-(rfAttn-attn90)/20)
@@ -0,0 +1,28 @@
+'''
+Created on Oct 17, 2026
+
+Slice planning: positions(m) and the RF frequency offsets(Hz) that select them with slice gradient Gs(T/m)
+'''
+import numpy as np
+from mricore.constants import gammaf
+
+def sliceThickness(sliceDeltaF, Gs):
+    '''thickness(m) of a slice excited with RF bandwidth sliceDeltaF(Hz)'''
+    return sliceDeltaF/(gammaf*Gs)
+
+def linearSlicePositions(nSlices, spacing, center=0.0):
+    '''nSlices positions spaced by spacing around center, from positive to negative'''
+    return -1*(np.arange(nSlices)-int(nSlices/2))*spacing+center
+
+def sliceFrequencies(positions, Gs):
+    return -np.asarray(positions)*gammaf*Gs
+
+def slicePositions(frequencies, Gs):
+    return -np.asarray(frequencies)/(gammaf*Gs)
+
+def sliceSpacing(positions):
+    '''smallest distance from the first slice, 0 for a single slice'''
+    positions=np.asarray(positions)
+    if positions.shape[0]<2:
+        return 0.0
+    return np.min(np.absolute(positions-positions[0])[1:])
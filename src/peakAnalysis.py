@@ -0,0 +1,111 @@
+'''
+Created on Oct 17, 2026
+
+Vectorized peak analysis of NMR spectra, every function works on all spectra of an n-d array at once along axis (default 0, the readout
+axis of (RO, slice, phase, parameter) data) and returns arrays with that axis removed.
+    peakIndex, interpolatedPeak     index of the largest point, and its sub-bin position and height from a parabola through the top 3 points
+    fwhm                            full width at half maximum of the peak containing the maximum, with linear interpolation of the half maximum crossings
+    integral                        trapezoidal integral over a window around the peak
+    snr                             peak height / standard deviation of the spectrum edges
+    spectralMoments                 intensity weighted mean frequency and rms width
+    analyzeSpectra                  all of the above in frequency units
+Spectra are analyzed as given, pass the real part of phased spectra or their magnitude.
+'''
+import numpy as np
+
+def columns(spectra, axis=0):
+    '''2d (npoints, nspectra) float view of spectra and the shape of the result'''
+    y=np.moveaxis(np.asarray(spectra), axis, 0)
+    return y.reshape(y.shape[0], -1), y.shape[1:]
+
+def peakIndex(spectra, axis=0):
+    '''index of the maximum of each spectrum'''
+    return np.argmax(spectra, axis=axis)
+
+def interpolatedPeak(spectra, axis=0):
+    '''(fractional peak index, peak height) of each spectrum from a parabola through the maximum and its neighbours'''
+    y, shape=columns(spectra, axis)
+    n=y.shape[0]
+    cols=np.arange(y.shape[1])
+    i=np.argmax(y, axis=0)
+    ic=np.clip(i, 1, n-2) if n>2 else i
+    if n>2:
+        ym, y0, yp=y[ic-1, cols], y[ic, cols], y[ic+1, cols]
+        denom=ym-2*y0+yp
+        with np.errstate(divide='ignore', invalid='ignore'):
+            delta=np.where((denom<0) & (i==ic), 0.5*(ym-yp)/denom, 0.0)
+        height=y0-0.25*(ym-yp)*delta
+        index=ic+delta
+        edge=i!=ic      #maximum at the first or last point, no interpolation
+        index=np.where(edge, i, index)
+        height=np.where(edge, y[i, cols], height)
+    else:
+        index=i.astype(float)
+        height=y[i, cols]
+    return index.reshape(shape), height.reshape(shape)
+
+def fwhm(spectra, axis=0, interpolate=True):
+    '''full width at half maximum in points of the peak containing the maximum of each spectrum'''
+    y, shape=columns(spectra, axis)
+    n=y.shape[0]
+    cols=np.arange(y.shape[1])
+    imax=np.argmax(y, axis=0)
+    half=0.5*y[imax, cols]
+    idx=np.arange(n)[:, None]
+    below=y<=half
+    left=np.where(below & (idx<imax), idx, -1).max(axis=0)      #last point at or below half maximum before the peak
+    right=np.where(below & (idx>imax), idx, n).min(axis=0)      #first point at or below half maximum after the peak
+    if not interpolate:
+        return (right-left-1).reshape(shape)
+    l=np.clip(left, 0, n-2)
+    r=np.clip(right, 1, n-1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        xl=l+np.nan_to_num((half-y[l, cols])/(y[l+1, cols]-y[l, cols]))
+        xr=r-1+np.nan_to_num((y[r-1, cols]-half)/(y[r-1, cols]-y[r, cols]))
+    xl=np.where(left<0, 0, xl)
+    xr=np.where(right>=n, n-1, xr)
+    return (xr-xl).reshape(shape)
+
+def integral(spectra, halfWidth=10, center=None, axis=0, dx=1.0):
+    '''trapezoidal integral of each spectrum over the points center-halfWidth to center+halfWidth-1, center defaults to each peak,
+    a scalar center integrates every spectrum over the same points'''
+    y, shape=columns(spectra, axis)
+    n=y.shape[0]
+    if center is None:
+        center=np.argmax(y, axis=0)
+    center=np.broadcast_to(np.asarray(center).reshape(-1), (y.shape[1],))
+    idx=np.arange(n)[:, None]
+    inside=(idx>=center-halfWidth) & (idx<center+halfWidth)
+    w=0.5*(inside[:-1] & inside[1:])       #trapezoids between neighbouring points inside the window
+    s=np.sum(w*(y[:-1]+y[1:]), axis=0)*dx
+    return s.reshape(shape)
+
+def snr(spectra, axis=0, noiseFraction=0.1):
+    '''peak height divided by the standard deviation of the first and last noiseFraction of the points of each spectrum'''
+    y, shape=columns(spectra, axis)
+    m=max(2, int(noiseFraction*y.shape[0]))
+    noise=np.concatenate((y[:m], y[-m:]))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (np.max(y, axis=0)/np.std(noise, axis=0)).reshape(shape)
+
+def spectralMoments(spectra, freq, axis=0):
+    '''(mean frequency, rms width) of each spectrum weighted by its normalized intensity'''
+    y, shape=columns(spectra, axis)
+    f=np.asarray(freq, dtype=float)[:, None]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        w=y/np.sum(y, axis=0)
+        mean=np.sum(w*f, axis=0)
+        width=np.sqrt(np.sum(w*(f-mean)**2, axis=0))
+    return mean.reshape(shape), width.reshape(shape)
+
+def analyzeSpectra(spectra, freq=None, axis=0, halfWidth=10, noiseFraction=0.1):
+    '''F0, FWHM, peak height, integral and SNR of every spectrum, freq is the (uniformly spaced) frequency of each point,
+    None gives results in points, returns a dictionary of arrays with the analysis axis removed'''
+    index, height=interpolatedPeak(spectra, axis)
+    width=fwhm(spectra, axis)
+    if freq is None:
+        f0, df=0.0, 1.0
+    else:
+        f0, df=float(freq[0]), float(freq[1]-freq[0])
+    return {'peakIndex':np.argmax(spectra, axis=axis), 'F0':f0+index*df, 'FWHM':width*np.abs(df), 'height':height,
+            'integral':integral(spectra, halfWidth=halfWidth, axis=axis, dx=np.abs(df)), 'SNR':snr(spectra, axis, noiseFraction)}
@@ -1,147 +1,53 @@
 #!/usr/bin/python
 
 import sys
+import os
 import io
 from collections import OrderedDict
 import datetime
+import time
 from time import gmtime
 import re
 import numpy as np
 from numpy.fft import fftfreq, fftshift
-import numpy.dual as npfast
 import string
 
 import TNTdtypes
+import fftBackend
 from utils import convert_si, read_pascal_string, make_str as s
 
 
 class TNTfile:
 
-    def __init__(self, tntfilename):
+    # Attributes scraped from the PSEQ/CMNT sections, these are only parsed
+    # when one of them is first accessed
+    lazy_attributes = ('DELAY', 'T180', 'T90', 'tau', 'GrAmp', 'Gs',
+                       'gradPulseRiseTime', 'Grad', 'Delta', 'NutIncrement',
+                       'TNMRComment', 'TNMRCommentRaw')
 
-        self.TNMRComment=''
-        self.tnt_sections = OrderedDict()
+    # Sections small enough that they are always read when the file is opened
+    header_sections = ('TMAG', 'TMG2')
 
-        with open(tntfilename, 'rb') as tntfile:
+    def __init__(self, tntfilename, lazy=True, live=False):
+        """Open a TNT file, reading only the section index and headers
 
-            self.tntmagic = np.fromstring(tntfile.read(TNTdtypes.Magic.itemsize),
-                                          TNTdtypes.Magic, count=1)[0]
+        The DATA section is memory mapped.  The pulse sequence section is read
+        the first time DELAY, T90, TNMRComment etc. are accessed, or
+        immediately if lazy is False.  Use live=True for a file that is still
+        being acquired, see follow(), the file may not exist yet or have
+        only part of its header."""
 
-            if not TNTdtypes.Magic_re.match(self.tntmagic):
-                raise ValueError("Invalid magic number (is '%s' really a TNMR file?): %s" % (tntfilename, self.tntmagic))
-
-            ##Read in the section headers
-            tnthdrbytes = tntfile.read(TNTdtypes.TLV.itemsize)
-            while(TNTdtypes.TLV.itemsize == len(tnthdrbytes)):
-                #print('unpacking header')
-                tntTLV = np.fromstring(tnthdrbytes, TNTdtypes.TLV)[0]
-                data_length = tntTLV['length']
-                hdrdict = {'offset': tntfile.tell(),
-                           'length': data_length,
-                           'bool': bool(tntTLV['bool'])}
-                if data_length <= 4096:
-                    hdrdict['data'] = tntfile.read(data_length)
-                    assert(len(hdrdict['data']) == data_length)
-                else:
-                    tntfile.seek(data_length, io.SEEK_CUR)
-                self.tnt_sections[s(tntTLV['tag'])] = hdrdict
-                tnthdrbytes = tntfile.read(TNTdtypes.TLV.itemsize)
-            # Find and parse the delay tables
-            self.DELAY = {}     #Tables with default naming convention
-            # This RegExp should match only bytearrays containing
-            # things like "deXX:X" or so.
-            #_re = re.compile(b'de[0-9]+:[0-9]')
-            dealyorloopre=b'((at|lp)[0-9]+:[0-9])|((de|lp)[0-9]+:[0-9])|TI_[1-9]|ti_times|cpmgloop|gr0:2|GxTable|GyTable|gztable|rdArray|seloop|HPMW|TX3:2|teDelay|tiDelay|sliceFrequencies|gradRingdownDelay'   #match de0:0 or lp0:0 or TI_0 or ti_times or cpmgloop or gr0:2
-            delay_re = re.compile(dealyorloopre)   #SER added to find loop tables
-            # seek well past the data section so we read as little
-            # of the file into memory as possible
-            tntfile.seek(self.tnt_sections["PSEQ"]["offset"])
-            search_region = tntfile.read()
-            #print (search_region)
-            # Do the search, and iterate over the matches
-            for match in delay_re.finditer(search_region):
-                # Lets go back and read the section properly. Offset back by
-                # four to capture the delay table name length
-                #print('reading tables and PS params')
-                offset = (match.start() - 4)
-                # extract the name length, the name, the delay length,
-                # and the delay.
-                delay_name = read_pascal_string(search_region[offset:])
-                offset = match.start() + len(delay_name)
-                delay = read_pascal_string(search_region[offset:])
-                # Now check for delay tables of length one and discard them
-                if len(delay) > 1:
-                    delay = delay.split()
-                    delay = convert_si(delay)
-                    self.DELAY[delay_name] = delay
+        self.tntfilename = tntfilename
+        if live:
             try:
-                ps=search_region.split(b'Sequence')[1].split(b'INFO')[0]      #kludgy way to pull out T90, T180 and other ps parmaters
-                ps=ps[30:]            
-                try:
-                    T180s=ps.split(b'T180')[1].split(b'u')[0].decode('utf-8')
-                    self.T180=[float(st) for st in re.findall(r'-?\d+\.?\d*', T180s)][0]
-                except:
-                    self.T180=0.0
-                try:
-                    T90s=ps.split(b'T90')[1].split(b'u')[0].decode('utf-8')
-                    self.T90=[float(st) for st in re.findall(r'-?\d+\.?\d*', T90s)][0]
-                except:
-                    self.T90=0.0
-                try:
-                    taus=ps.split(b'tau')[1].split(b'm')[0].decode('utf-8')
-                    self.tau=[float(st) for st in re.findall(r'-?\d+\.?\d*', taus)][0]
-                except:
-                    self.tau=0.0
-                try:
-                    gramp=ps.split(b'GrAmp')[1][:20].decode('utf-8')        #Find gradient amplitude parameter, take 20 bytes after the key 'GrAmp', turn into string
-                    self.GrAmp=[float(st) for st in re.findall(r'-?\d+\.?\d*', gramp)][0]       #search for a number
-                except:
-                    self.GrAmp=0
-                try:
-                    gs=ps.split(b'Gs')[1][:20].decode('utf-8')        #Find gradient amplitude parameter, take 20 bytes after the key 'GrAmp', turn into string
-                    self.Gs=[float(st) for st in re.findall(r'-?\d+\.?\d*', gs)][0]       #search for a number
-                    print('gs=',Gs)
-                except:
-                    self.Gs=0   
-                try:
-                    graramp=ps.split(b'GradRamp')[1][:20].decode('utf-8')        #Find gradient ramptime parameter, take 20 bytes after the key 'GradRamp', turn into string
-                    self.gradPulseRiseTime=[float(st) for st in re.findall(r'-?\d+\.?\d*', graramp)][0]/1000       #search for a number, assume it is in ms, convert to seconds
-                except:
-                    self.gradPulseRiseTime=-1       #flag to indicate value not found
-                    
-                try:
-                    grad=ps.split(b'Grad')[1][:20].decode('utf-8')        #Find gradient amplitude parameter, take 20 bytes after the key 'GrAmp', turn into string
-                    self.Grad=[float(st) for st in re.findall(r'-?\d+\.?\d*', grad)][0]      #search for a number, 
-                except:
-                    self.Grad=0
-                try:
-                    delta=ps.split(b'Delta')[1][:20].decode('utf-8')        #Find gradient amplitude parameter, take 20 bytes after the key 'GrAmp', turn into string
-                    self.Delta=[float(st) for st in re.findall(r'-?\d+\.?\d*', delta)][0]       #search for a number
-                except:
-                    self.Delta=0 
-                try:
-                    NutIncrement=ps.split(b'NutIncrement')[1].split(b'u')[0].decode('utf-8')
-                    self.NutIncrement=[float(st) for st in re.findall(r'-?\d+\.?\d*', NutIncrement)][0]
-                except:
-                    self.NutIncrement=1       
-                try:        #pull out comment, get rid of nonascii and line feeds
-                    comment=ps.split(b'CMNT')[1]
-                    endcomment=comment.find(b'TMG3')
-                    self.TNMRComment= comment[7:endcomment].decode('unicode_escape') #('UTF-16LE ')  # ('utf-8') #
-                    if self.TNMRComment.find('Slice Offset')>-1:
-                        self.TNMRComment=self.TNMRComment.strip(' ')
-                    else:
-                        self.TNMRComment=self.TNMRComment.replace('\r\n', ':  ')        # replace newlines with semicolons
-                        self.TNMRComment=re.sub(r'[^a-zA-Z0-9;=();:.]', '', self.TNMRComment)       #get rid of all nonascii characters
-                        #self.TNMRComment=re.sub(r'_{2,20}', '_', self.TNMRComment)
-                except:
-                    raise
-                    self.TNMRComment='No Comment'                  
-            except:
-                raise                
-#        
+                self.refresh()
+            except OSError:
+                self.tnt_sections = OrderedDict()  # not created yet
+            return
+        self.read_index()
+
         assert(self.tnt_sections['TMAG']['length'] == TNTdtypes.TMAG.itemsize)
-        self.TMAG = np.fromstring(self.tnt_sections['TMAG']['data'],
+        self.TMAG = np.frombuffer(self.tnt_sections['TMAG']['data'],
                                   TNTdtypes.TMAG, count=1)[0]
 
         assert(self.tnt_sections['DATA']['length'] ==
@@ -158,11 +64,180 @@ class TNTfile:
                                order='F')
 
         assert(self.tnt_sections['TMG2']['length'] == TNTdtypes.TMG2.itemsize)
-        self.TMG2 = np.fromstring(self.tnt_sections['TMG2']['data'],
-                                  TNTdtypes.TMG2, count=1)[0]                           
-                                  
-        #print('end of tnt file processing')
-        tntfile.close()
+        self.TMG2 = np.frombuffer(self.tnt_sections['TMG2']['data'],
+                                  TNTdtypes.TMG2, count=1)[0]
+
+        if not lazy:
+            self.read_sequence()
+
+    def read_index(self, strict=True):
+        """Read the magic number and the TLV section index
+
+        Only the small TMAG and TMG2 structures are read, everything else is
+        just indexed by offset and length.  With strict=False header sections
+        cut short by the end of the file (a file still being written) are
+        left out instead of raising, and a magic number that is not
+        completely written yet gives an empty index."""
+        tnt_sections = OrderedDict()
+        with open(self.tntfilename, 'rb') as tntfile:
+
+            magic = tntfile.read(TNTdtypes.Magic.itemsize)
+            if len(magic) < TNTdtypes.Magic.itemsize and not strict:
+                self.tntfilesize = len(magic)
+                self.tnt_sections = tnt_sections
+                return
+            self.tntmagic = np.frombuffer(magic, TNTdtypes.Magic, count=1)[0]
+
+            if not TNTdtypes.Magic_re.match(self.tntmagic):
+                raise ValueError("Invalid magic number (is '%s' really a TNMR file?): %s" % (self.tntfilename, self.tntmagic))
+
+            ##Read in the section headers
+            tnthdrbytes = tntfile.read(TNTdtypes.TLV.itemsize)
+            while(TNTdtypes.TLV.itemsize == len(tnthdrbytes)):
+                tntTLV = np.frombuffer(tnthdrbytes, TNTdtypes.TLV)[0]
+                tag = s(tntTLV['tag'])
+                data_length = tntTLV['length']
+                hdrdict = {'offset': tntfile.tell(),
+                           'length': data_length,
+                           'bool': bool(tntTLV['bool'])}
+                if tag in self.header_sections:
+                    hdrdict['data'] = tntfile.read(data_length)
+                    if len(hdrdict['data']) != data_length and not strict:
+                        break
+                    assert(len(hdrdict['data']) == data_length)
+                else:
+                    tntfile.seek(data_length, io.SEEK_CUR)
+                tnt_sections[tag] = hdrdict
+                tnthdrbytes = tntfile.read(TNTdtypes.TLV.itemsize)
+            self.tntfilesize = os.fstat(tntfile.fileno()).st_size
+        self.tnt_sections = tnt_sections
+
+    def read_section(self, tag, include_header=False):
+        """Read the raw bytes of a single section from the file
+
+        If include_header is True the 12 byte tag/bool/length header is
+        returned in front of the section data."""
+        hdr = self.tnt_sections[tag]
+        start = hdr['offset']
+        if include_header:
+            start -= TNTdtypes.TLV.itemsize
+        with open(self.tntfilename, 'rb') as tntfile:
+            tntfile.seek(start)
+            return tntfile.read(hdr['offset'] + hdr['length'] - start)
+
+    def sequence_region(self):
+        """The bytes from the start of the PSEQ section to the end of the file
+
+        If the DATA section lies after PSEQ it is skipped, so the region only
+        contains the (small) pulse sequence, comment and info sections."""
+        start = self.tnt_sections['PSEQ']['offset']
+        data = self.tnt_sections['DATA']
+        with open(self.tntfilename, 'rb') as tntfile:
+            tntfile.seek(start)
+            if data['offset'] > start:
+                region = tntfile.read(data['offset'] - TNTdtypes.TLV.itemsize - start)
+                tntfile.seek(data['offset'] + data['length'])
+                region += tntfile.read(self.tntfilesize - tntfile.tell())
+            else:
+                region = tntfile.read(self.tntfilesize - start)
+        return region
+
+    def read_tables(self, search_region=None, convert=True):
+        """Find and parse the delay and loop tables in the pulse sequence
+
+        Returns {name: values}, with convert=False the values are the table
+        strings as stored in the file (e.g. '1m 2m 3m') rather than arrays
+        of SI values."""
+        if search_region is None:
+            search_region = self.sequence_region()
+        DELAY = {}     #Tables with default naming convention
+        # This RegExp should match only bytearrays containing
+        # things like "deXX:X" or so.
+        #_re = re.compile(b'de[0-9]+:[0-9]')
+        dealyorloopre=b'((at|lp)[0-9]+:[0-9])|((de|lp)[0-9]+:[0-9])|TI_[1-9]|ti_times|cpmgloop|gr0:2|GxTable|GyTable|gztable|rdArray|seloop|HPMW|TX3:2|teDelay|tiDelay|sliceFrequencies|gradRingdownDelay'   #match de0:0 or lp0:0 or TI_0 or ti_times or cpmgloop or gr0:2
+        delay_re = re.compile(dealyorloopre)   #SER added to find loop tables
+        # Do the search, and iterate over the matches
+        for match in delay_re.finditer(search_region):
+            # Lets go back and read the section properly. Offset back by
+            # four to capture the delay table name length
+            offset = (match.start() - 4)
+            # extract the name length, the name, the delay length,
+            # and the delay.
+            delay_name = read_pascal_string(search_region[offset:])
+            offset = match.start() + len(delay_name)
+            delay = read_pascal_string(search_region[offset:])
+            # Now check for delay tables of length one and discard them
+            if len(delay) > 1:
+                if convert:
+                    delay = delay.split()
+                    delay = convert_si(delay)
+                DELAY[delay_name] = delay
+        return DELAY
+
+    def read_sequence(self):
+        """Parse the delay tables, pulse sequence parameters and comment"""
+        search_region = self.sequence_region()
+        self.DELAY = self.read_tables(search_region)
+
+        ps=search_region.split(b'Sequence')[1].split(b'INFO')[0]      #kludgy way to pull out T90, T180 and other ps parmaters
+        ps=ps[30:]
+        try:
+            T180s=ps.split(b'T180')[1].split(b'u')[0].decode('utf-8')
+            self.T180=[float(st) for st in re.findall(r'-?\d+\.?\d*', T180s)][0]
+        except:
+            self.T180=0.0
+        try:
+            T90s=ps.split(b'T90')[1].split(b'u')[0].decode('utf-8')
+            self.T90=[float(st) for st in re.findall(r'-?\d+\.?\d*', T90s)][0]
+        except:
+            self.T90=0.0
+        try:
+            taus=ps.split(b'tau')[1].split(b'm')[0].decode('utf-8')
+            self.tau=[float(st) for st in re.findall(r'-?\d+\.?\d*', taus)][0]
+        except:
+            self.tau=0.0
+        try:
+            gramp=ps.split(b'GrAmp')[1][:20].decode('utf-8')        #Find gradient amplitude parameter, take 20 bytes after the key 'GrAmp', turn into string
+            self.GrAmp=[float(st) for st in re.findall(r'-?\d+\.?\d*', gramp)][0]       #search for a number
+        except:
+            self.GrAmp=0
+        try:
+            gs=ps.split(b'Gs')[1][:20].decode('utf-8')        #Find gradient amplitude parameter, take 20 bytes after the key 'GrAmp', turn into string
+            self.Gs=[float(st) for st in re.findall(r'-?\d+\.?\d*', gs)][0]       #search for a number
+            print('gs=',Gs)
+        except:
+            self.Gs=0
+        try:
+            graramp=ps.split(b'GradRamp')[1][:20].decode('utf-8')        #Find gradient ramptime parameter, take 20 bytes after the key 'GradRamp', turn into string
+            self.gradPulseRiseTime=[float(st) for st in re.findall(r'-?\d+\.?\d*', graramp)][0]/1000       #search for a number, assume it is in ms, convert to seconds
+        except:
+            self.gradPulseRiseTime=-1       #flag to indicate value not found
+
+        try:
+            grad=ps.split(b'Grad')[1][:20].decode('utf-8')        #Find gradient amplitude parameter, take 20 bytes after the key 'GrAmp', turn into string
+            self.Grad=[float(st) for st in re.findall(r'-?\d+\.?\d*', grad)][0]      #search for a number,
+        except:
+            self.Grad=0
+        try:
+            delta=ps.split(b'Delta')[1][:20].decode('utf-8')        #Find gradient amplitude parameter, take 20 bytes after the key 'GrAmp', turn into string
+            self.Delta=[float(st) for st in re.findall(r'-?\d+\.?\d*', delta)][0]       #search for a number
+        except:
+            self.Delta=0
+        try:
+            NutIncrement=ps.split(b'NutIncrement')[1].split(b'u')[0].decode('utf-8')
+            self.NutIncrement=[float(st) for st in re.findall(r'-?\d+\.?\d*', NutIncrement)][0]
+        except:
+            self.NutIncrement=1
+        #pull out comment, get rid of nonascii and line feeds
+        comment=ps.split(b'CMNT')[1]
+        endcomment=comment.find(b'TMG3')
+        self.TNMRCommentRaw = comment[7:endcomment].decode('unicode_escape') #('UTF-16LE ')  # ('utf-8') #
+        if self.TNMRCommentRaw.find('Slice Offset')>-1:
+            self.TNMRComment=self.TNMRCommentRaw.strip(' ')
+        else:
+            self.TNMRComment=self.TNMRCommentRaw.replace('\r\n', ':  ')        # replace newlines with semicolons
+            self.TNMRComment=re.sub(r'[^a-zA-Z0-9;=();:.]', '', self.TNMRComment)       #get rid of all nonascii characters
+            #self.TNMRComment=re.sub(r'_{2,20}', '_', self.TNMRComment)
 
 
 #    def writefile(self, outfilename):
@@ -207,16 +282,120 @@ class TNTfile:
         return go   
 
     def __getattr__(self, name):
-        """Expose members of the TMAG and TMG2 structures as attributes"""
-        if name in self.TMAG.dtype.names:
+        """Expose members of the TMAG and TMG2 structures as attributes
+
+        The pulse sequence attributes are parsed on first access, a file
+        without the PSEQ/CMNT sections raises AttributeError so hasattr and
+        getattr with a default work"""
+        if name in self.lazy_attributes:
+            try:
+                self.read_sequence()
+                return self.__dict__[name]
+            except (KeyError, IndexError, ValueError) as e:
+                raise AttributeError("'%s' can not be read from the pulse sequence of %s: %r"
+                                     % (name, self.tntfilename, e)) from e
+        elif name in TNTdtypes.TMAG.names:
             return self.TMAG[name]
-        elif name in self.TMG2.dtype.names:
+        elif name in TNTdtypes.TMG2.names:
             return self.TMG2[name]
         else:
             raise AttributeError("'%s' is not a member of the TMAG or TMG2 structs" % name)
 
+    def read_slice(self, slice_index, param_index=None):
+        """Return the (readout, phase[, parameter]) data for a single slice
+
+        Only the part of the file holding that slice is read, for both the
+        memmap and chunked container DATA"""
+        if param_index is None:
+            return np.asarray(self.DATA[:, slice_index, :, :])
+        return np.asarray(self.DATA[:, slice_index, :, param_index])
+
+    def refresh(self):
+        """Re-read the index and headers of a file that is still being written
+
+        The DATA section is remapped as a (readout, column) array of the FIDs
+        in acquisition order, DATA_columns.  Once all the points have been
+        written DATA is remapped with its full shape as well.
+        Returns the number of completely acquired columns."""
+        self.read_index(strict=False)
+        if 'TMAG' not in self.tnt_sections or 'DATA' not in self.tnt_sections:
+            return 0
+        self.TMAG = np.frombuffer(self.tnt_sections['TMAG']['data'],
+                                  TNTdtypes.TMAG, count=1)[0]
+        if 'TMG2' in self.tnt_sections:
+            self.TMG2 = np.frombuffer(self.tnt_sections['TMG2']['data'],
+                                      TNTdtypes.TMG2, count=1)[0]
+        npts = self.TMAG['npts']
+        data = self.tnt_sections['DATA']
+        # Only map the part of the section that is already on disk
+        available = min(int(data['length']),
+                        max(self.tntfilesize - int(data['offset']), 0))
+        ncolumns = min(available // (8 * int(npts[0])), int(npts[1:].prod()))
+        if ncolumns > 0 and ncolumns != self.__dict__.get('DATA_columns', np.empty((0, 0))).shape[1]:
+            self.DATA_columns = np.reshape(
+                np.memmap(self.tntfilename, np.dtype('<c8'), mode='c',
+                          offset=data['offset'],
+                          shape=ncolumns * int(npts[0])),
+                (int(npts[0]), ncolumns), order='F')
+            if ncolumns == npts[1:].prod():
+                self.DATA = np.reshape(self.DATA_columns, npts, order='F')
+        return min(self.n_acquired_columns(), ncolumns)
+
+    def n_acquired_columns(self):
+        """The number of FIDs (readout columns) whose scans are all complete
+
+        The Actual Points 2D/3D/4D counters are taken as the 1-based position
+        of the acquisition in the 2D, 3D and 4D loops (2D fastest, as in the
+        Fortran ordered DATA).  If the scans of the current FID are not
+        finished it is not counted, as in n_complete_spec."""
+        npts = self.TMAG['npts']
+        actual = self.TMAG['actual_npts']
+        if actual[1] < 1:
+            return 0
+        n = (((max(actual[3], 1) - 1) * npts[2] + max(actual[2], 1) - 1)
+             * npts[1] + actual[1])
+        if 0 < self.actual_scans < self.scans:
+            n -= 1
+        return int(min(max(n, 0), npts[1:].prod()))
+
+    def follow(self, poll_interval=1.0, idle_timeout=None, sleep=time.sleep):
+        """Generator yielding the FIDs of a file that is still being acquired
+
+        The file is polled every poll_interval seconds and each newly
+        completed FID is yielded once, in acquisition order, as
+        ((slice, phase, parameter), fid).  The generator finishes when all
+        npts have been acquired, or when nothing new has arrived for
+        idle_timeout seconds.  Files without a complete header yet are
+        polled until it is written."""
+        done = 0
+        last_change = time.time()
+        while True:
+            try:
+                complete = self.refresh()
+            except (ValueError, OSError):
+                complete = done  # file being rewritten, try again
+            if complete > done:
+                npts = self.TMAG['npts']
+                for column in range(done, complete):
+                    index = np.unravel_index(column, npts[1:], order='F')
+                    yield tuple(int(i) for i in index), self.DATA_columns[:, column]
+                done = complete
+                last_change = time.time()
+            if 'TMAG' in self.__dict__ and done >= self.TMAG['npts'][1:].prod():
+                return
+            if idle_timeout is not None and time.time() - last_change > idle_timeout:
+                return
+            sleep(poll_interval)
+
     def LBfft(self, LB=0, zf=0, phase=None, logfile=None, ph1=0,
-              DCoffset=None, altDATA=None):
+              DCoffset=None, altDATA=None, single=False, workspace=None):
+        """Line broaden, zero fill, Fourier transform and phase the FIDs
+
+        With single=True (or a workspace) the processing is done in complex64
+        in a reusable work buffer, see LBfft_inplace."""
+        if single or workspace is not None:
+            return self.LBfft_inplace(LB, zf, phase, logfile, ph1, DCoffset,
+                                      altDATA, workspace)
         if altDATA is None:
             DATA = self.DATA
         else:
@@ -238,7 +417,7 @@ class TNTfile:
         lbweight = np.exp(LBdw * np.arange(npts, dtype=float))
         DATAlb = (DATA - DCoffset) * lbweight[:, np.newaxis, np.newaxis, np.newaxis]
 
-        DATAfft = npfast.fft(DATAlb, n=npts_ft, axis=0)
+        DATAfft = fftBackend.fft(DATAlb, n=npts_ft, axis=0, overwrite_x=True)
         DATAfft = fftshift(DATAfft, axes=[0])
         DATAfft /= np.sqrt(npts_ft)  # To match TNMR behaviour
 
@@ -250,6 +429,60 @@ class TNTfile:
 
         return DATAfft
 
+    def LBfft_inplace(self, LB=0, zf=0, phase=None, logfile=None, ph1=0,
+                      DCoffset=None, altDATA=None, workspace=None):
+        """LBfft in complex64 without full size temporaries
+
+        DC offset removal, line broadening, zero order phase, the 1/sqrt(n)
+        scaling and the fftshift (as a modulation of the FID) are folded into
+        one weight applied while copying the FIDs into the work buffer, which
+        is then Fourier transformed in place.  Peak memory is the data plus
+        the (zero filled) buffer.
+
+        The returned array is the workspace buffer: it is overwritten by the
+        next call using the same workspace, copy it if it must be kept."""
+        if altDATA is None:
+            DATA = self.DATA
+        else:
+            DATA = altDATA
+        if workspace is None:
+            if '_lbfft_workspace' not in self.__dict__:
+                self._lbfft_workspace = LBfftWorkspace()
+            workspace = self._lbfft_workspace
+        npts = DATA.shape[0]
+        npts_ft = npts * (2 ** zf)
+
+        if DCoffset is None:
+            # Same DC offset estimate as LBfft, only reads the last eighth
+            DCoffset = np.mean(DATA[int(npts / -8):, :, :, :],
+                               axis=0, keepdims=True)
+            if logfile is not None:
+                logfile.write("average DC offset is %g\n" % np.mean(DCoffset))
+
+        # exp(2 pi i m t / n) with m = n//2 applies fftshift to the spectrum
+        t = np.arange(npts, dtype=float)
+        weight = (-LB * self.dwell[0] * np.pi * t
+                  + 2j * np.pi * (npts_ft // 2) * t / npts_ft)
+        if phase is not None:
+            weight += 1j * (phase - 0.5 * ph1)
+        weight = (np.exp(weight) / np.sqrt(npts_ft)).astype(np.complex64)
+
+        DATAfft = workspace.buffer((npts_ft,) + DATA.shape[1:])
+        fid = DATAfft[:npts]
+        np.subtract(DATA, np.asarray(DCoffset, dtype=np.complex64), out=fid)
+        fid *= weight[:, np.newaxis, np.newaxis, np.newaxis]
+        DATAfft[npts:] = 0
+        fftBackend.fftInPlace(DATAfft, axis=0)
+
+        if phase is None:  # Phase automatically
+            DATAfft *= np.complex64(np.exp(-1j * np.angle(np.sum(DATAfft, dtype=np.complex128))))
+        elif ph1 != 0:
+            # first order phase, the -ph1/2 offset was applied with the weight
+            DATAfft *= np.exp(1j * ph1 * np.linspace(0, 1, npts_ft)).astype(
+                np.complex64)[:, np.newaxis, np.newaxis, np.newaxis]
+
+        return DATAfft
+
     def freq_Hz(self, altDATA=None):
         """Returns the frequency axis (in Hz) for the NMR spectrum"""
         if altDATA is None:
@@ -322,3 +555,28 @@ class TNTfile:
         else:  # The last scan was not finished, so omit it
             num_spectra = self.actual_npts[1] - 1
         return num_spectra
+
+
+class LBfftWorkspace:
+    """Reusable complex64 work buffers for TNTfile.LBfft_inplace
+
+    One buffer is kept for each requested shape, so repeated processing of
+    same shaped data does not allocate."""
+
+    def __init__(self, dtype=np.complex64, max_buffers=2):
+        self.dtype = np.dtype(dtype)
+        self.max_buffers = max_buffers
+        self.buffers = OrderedDict()
+
+    def buffer(self, shape):
+        shape = tuple(int(n) for n in shape)
+        buf = self.buffers.pop(shape, None)
+        if buf is None:
+            while len(self.buffers) >= self.max_buffers:
+                self.buffers.popitem(last=False)
+            buf = fftBackend.emptyAligned(shape, self.dtype, order='F')
+        self.buffers[shape] = buf
+        return buf
+
+    def clear(self):
+        self.buffers.clear()
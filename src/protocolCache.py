@@ -0,0 +1,127 @@
+'''
+Created on Oct 17, 2026
+
+Template cache of the standard protocols (MRIcontrol.protocolList) used by openProtocol.
+Each template .tnt in the template directory is opened in TNMR once, by preload (which closes it again after reading) or when first
+selected, and a ProtocolTemplate keeps
+its dashboard parameters, tables, table list and data dimensions, and the template data is memory mapped from the file
+(MRIcontrol.getTNMRdata) instead of transferred through COM.  Selecting a
+protocol then costs only the parameters that differ from the template:
+    template is the active TNMR document        the parameters and tables that were changed since are written back (TNMR.pushParams)
+    another document is active                  the template is reopened with the TNMR parameter store seeded from the snapshot,
+                                                so nothing is read back through COM except the volatile parameters
+A template is reread if its file changes.  Derived values of the tables (RF pulse shape FFT and width, slice frequencies, TE/TI
+arrays) are memoized on the table strings, so they are computed once per template however often it is selected.
+'''
+import os
+import time
+import functools
+import numpy as np
+from mricore import rf
+
+def fileStamp(fileName):
+    '''(size, modification time) of a file, None if it does not exist'''
+    try:
+        st=os.stat(fileName)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime
+
+@functools.lru_cache(maxsize=256)
+def tableArray(table, unit=''):
+    '''read only float array of a TNMR table string, unit ('m' or 'u') is stripped and scales the values'''
+    scale={'':1.0, 'm':1E-3, 'u':1E-6}[unit]
+    a=np.fromstring(table.replace(unit, '') if unit else table, sep=' ')*scale
+    a.flags.writeable=False
+    return a
+
+@functools.lru_cache(maxsize=64)
+def rfShapeAnalysis(rfShape, rfPhase):
+    '''(rfWaveform, integrated waveform/npoints, fftshifted FT of the waveform, FWHM of the FT in points) from the rfShape and rfPhase tables'''
+    rfWaveform=rf.rfWaveform(np.fromstring(rfShape, sep=' '), np.fromstring(rfPhase, sep=' '))
+    weight=rf.integratedWeight(rfWaveform)     #maximal value of 100
+    rfWaveformFT, width=rf.waveformSpectrum(rfWaveform)
+    for a in (rfWaveform, rfWaveformFT):
+        a.flags.writeable=False
+    return rfWaveform, weight, rfWaveformFT, width
+
+class ProtocolTemplate():
+  '''snapshot of a protocol template as read by TNMR'''
+  def __init__(self, name, fileName):
+      self.name=name
+      self.fileName=fileName
+      self.stamp=fileStamp(fileName)
+      self.params={}        #dashboard parameter: string, without volatile parameters
+      self.tables={}        #table name: table string
+      self.tableList=''
+      self.ndSize=None
+      self.loadTime=0.0     #s to open and read the template in TNMR
+
+  def current(self):
+      '''True if the template file has not changed since it was read'''
+      return self.stamp is not None and fileStamp(self.fileName)==self.stamp
+
+class ProtocolCache():
+  '''ProtocolTemplate of each protocol, selected into TNMR by select(name)'''
+  def __init__(self, TNMR, templateDirectory, protocols=()):
+      self.TNMR=TNMR
+      self.templateDirectory=templateDirectory
+      self.protocols=[p for p in protocols if p!='none']
+      self.templates={}
+      self.errors={}        #protocol: message of the last failed load
+
+  def fileName(self, name):
+      return os.path.join(self.templateDirectory, name + '.tnt')
+
+  def load(self, name, close=False):
+      '''open the template of protocol name in TNMR and snapshot it, close closes it again afterwards,
+      returns the ProtocolTemplate or None if it can not be opened'''
+      t0=time.perf_counter()
+      template=ProtocolTemplate(name, self.fileName(name))
+      if template.stamp is None or not self.TNMR.openFile(template.fileName):
+          self.errors[name]='Cannot open template ' + template.fileName
+          self.templates.pop(name, None)
+          return None
+      template.tableList=self.TNMR.getTableList()
+      for table in template.tableList.split(','):
+          if table.strip()!='':
+              try:
+                  self.TNMR.getTable(table.strip())
+              except Exception:
+                  pass
+      template.params, template.tables=self.TNMR.snapshotParams()
+      template.ndSize=self.TNMR.ndSize()
+      if close:
+          self.TNMR.closeActiveFile()
+          self.TNMR.currentFileName=''
+      template.loadTime=time.perf_counter()-t0
+      self.templates[name]=template
+      self.errors.pop(name, None)
+      return template
+
+  def preload(self, message=None):
+      '''load every protocol template that is not loaded yet, closing each after it is read so no documents accumulate in TNMR,
+      returns the number loaded'''
+      t0=time.perf_counter()
+      n=sum(self.load(name, close=True) is not None for name in self.protocols if name not in self.templates)
+      if message is not None:
+          message('Protocol templates cached: {} of {} in {:.1f}s'.format(n, len(self.protocols), time.perf_counter()-t0))
+      return n
+
+  def select(self, name, close=False):
+      '''make the template of protocol name the active TNMR document with the template parameters and tables, close closes the active
+      document first if the template has to be reopened, returns the ProtocolTemplate or None if it can not be opened (the active
+      document is then already closed if close)'''
+      template=self.templates.get(name)
+      if template is not None and template.current():
+          if self.TNMR.currentFileName==template.fileName:
+              self.TNMR.pushParams(template.params, template.tables)
+              return template
+          if close:
+              self.TNMR.closeActiveFile()
+          if self.TNMR.openFile(template.fileName, params=template.params, tables=template.tables, tableList=template.tableList):
+              return template
+          return None
+      if close:
+          self.TNMR.closeActiveFile()
+      return self.load(name)
@@ -0,0 +1,155 @@
+'''
+Created on Oct 17, 2026
+
+Static validation of MRIcontrol recipes before they run.
+Every line is parsed once into an AST and must be a call of one of the \a commands in commandSignatures with literal arguments, e.g.
+    \aRunTNMRfile(file="D:\\MRIdata\\SE.tnt", autoSave=True, waitUntilDone=True)
+    \asetTemperature(temperature=20, waitUntilStable=True, temperatureStableRange=1)
+The arguments are bound to the command signature like a Python call and checked for type, range (limits, e.g. the NMR temperature range)
+and allowed values (choices), and referenced .tnt files are checked to exist.  The TMAG headers of all referenced files are then read in
+parallel, which checks the files can be read and fills recipePlanner.sequenceTimeCache for the run time estimate.  All errors are
+collected and raised together as one RecipeError, one line per error, so a recipe fails before it starts instead of hours into a run.
+'''
+import os
+import ast
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from recipeEngine import RecipeError, compileStep, dottedName
+import recipePlanner
+
+Argument=namedtuple('Argument', ['name', 'types', 'default', 'file'])      #file: None, 'required' or 'optional' (an empty string is allowed)
+required=object()       #default of arguments that must be given
+number=(int, float)
+
+commandSignatures={'RunTNMRfile':(Argument('file', str, required, 'required'), Argument('autoSave', bool, False, None),
+                                  Argument('waitUntilDone', bool, False, None), Argument('comment', str, '', None),
+                                  Argument('closeFileAfterUse', bool, True, None), Argument('runtime', str, '', None)),
+                   'runCurrentTNMRFile':(Argument('waitUntilDone', bool, True, None),),
+                   'openTNMRfile':(Argument('file', str, required, 'required'),),
+                   'TNMRShim':(Argument('shimType', str, 'BBnospin', None), Argument('NMRShimFile', str, required, 'optional'),
+                               Argument('waitUntilDone', bool, True, None), Argument('autoSave', bool, True, None),
+                               Argument('startShims', str, 'zero', None)),
+                   'setTemperature':(Argument('temperature', number, required, None), Argument('waitUntilStable', bool, False, None),
+                                     Argument('temperatureStableRange', number, 1, None)),
+                   'pause':(Argument('t', number, required, None),),
+                   'setPSsetpoint':(Argument('tsp', number, required, None),),
+                   'turnOnPolySci':(),
+                   'turnOffPolySci':(),
+                   'saveTNMRfilewDateID':(Argument('fileID', str, '', None),),
+                   'TNMR.zg':(),
+                   'TNMR.stop':()}       #recipe commands (name after \a) and their arguments in positional order
+
+def typeName(types):
+    types=types if isinstance(types, tuple) else (types,)
+    return 'number' if types==number else ' or '.join(t.__name__ for t in types)
+
+def checkType(value, types):
+    '''True if value is of types, bool is not accepted as a number'''
+    types=types if isinstance(types, tuple) else (types,)
+    if isinstance(value, bool) and bool not in types:
+        return False
+    return isinstance(value, types)
+
+def bindArguments(name, call):
+    '''{argument: literal value} of a call of command name with the defaults filled in, raises ValueError describing the first problem'''
+    signature=commandSignatures[name]
+    if len(call.args)>len(signature):
+        raise ValueError('{} takes at most {} arguments'.format(name, len(signature)))
+    names=[a.name for a in signature]
+    kwargs={}
+    for a, node in zip(signature, call.args):
+        kwargs[a.name]=node
+    for k in call.keywords:
+        if k.arg is None:
+            raise ValueError('** arguments are not allowed')
+        if k.arg not in names:
+            raise ValueError('{} has no argument {}'.format(name, k.arg))
+        if k.arg in kwargs:
+            raise ValueError('{} has argument {} twice'.format(name, k.arg))
+        kwargs[k.arg]=k.value
+    for a in signature:
+        if a.name not in kwargs:
+            if a.default is required:
+                raise ValueError('{} needs argument {}'.format(name, a.name))
+            kwargs[a.name]=a.default
+            continue
+        try:
+            kwargs[a.name]=ast.literal_eval(kwargs[a.name])
+        except ValueError:
+            raise ValueError('{} must be a literal value'.format(a.name))
+        if not checkType(kwargs[a.name], a.types):
+            raise ValueError('{} must be a {}, not {!r}'.format(a.name, typeName(a.types), kwargs[a.name]))
+    return kwargs
+
+def checkArguments(name, kwargs, limits, choices):
+    '''list of errors of values out of limits {argument: (min, max)} (None for no bound) or not in choices {argument: allowed values}'''
+    errors=[]
+    for a in commandSignatures[name]:
+        value=kwargs[a.name]
+        if a.name in limits and checkType(value, number):
+            vmin, vmax=limits[a.name]
+            if (vmin is not None and value<vmin) or (vmax is not None and value>vmax):
+                errors.append('{} {} is out of bounds [{}, {}]'.format(a.name, value, vmin, vmax))
+        if a.name in choices and value not in choices[a.name]:
+            errors.append('{} {!r} is not one of {}'.format(a.name, value, ', '.join(str(c) for c in choices[a.name])))
+    return errors
+
+def preloadHeaders(files, maxWorkers=8):
+    '''{file: sequence time} of .tnt files read in parallel into recipePlanner.sequenceTimeCache, nan for files that can not be read'''
+    files=list(files)
+    if not files:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(maxWorkers, len(files))) as pool:
+        return dict(zip(files, pool.map(recipePlanner.sequenceTime, files)))
+
+def compileRecipe(text, commands=(), limits=None, choices=None, resolvePath=None, preload=True, maxWorkers=8, prefix='\a', target='self'):
+    '''list of RecipeStep (see recipeEngine.parseRecipe) of a validated recipe, step.arguments holds the bound literal arguments,
+    lines calling target.<name> with name in commands get precompiled arguments, resolvePath(file) completes relative file names,
+    raises RecipeError listing every error'''
+    limits=limits if limits is not None else {}
+    choices=choices if choices is not None else {}
+    resolvePath=resolvePath if resolvePath is not None else (lambda f: f)
+    steps=[]
+    errors=[]
+    files={}        #resolved path: [line numbers]
+    for i, line in enumerate(text.split('\n')):
+        source=line.replace(prefix, target+'.').strip()
+        if source=='' or source[0]=='#':      #skip whitespace and comments
+            continue
+        try:
+            tree=ast.parse(source, '<recipe line {}>'.format(i+1), 'exec')
+        except SyntaxError as e:
+            errors.append('Line{}: {}: {}'.format(i+1, e.msg, source))
+            continue
+        if len(tree.body)!=1 or not isinstance(tree.body[0], ast.Expr) or not isinstance(tree.body[0].value, ast.Call):
+            errors.append('Line{}: not a recipe command: {}'.format(i+1, source))
+            continue
+        call=tree.body[0].value
+        name=dottedName(call.func, target)
+        if name not in commandSignatures:
+            errors.append('Line{}: unknown command {}'.format(i+1, name if name is not None else source))
+            continue
+        try:
+            kwargs=bindArguments(name, call)
+        except ValueError as e:
+            errors.append('Line{}: {}'.format(i+1, e))
+            continue
+        errors+=['Line{}: {}'.format(i+1, e) for e in checkArguments(name, kwargs, limits, choices)]
+        for a in commandSignatures[name]:
+            if a.file is not None and not (a.file=='optional' and kwargs[a.name]==''):
+                files.setdefault(resolvePath(kwargs[a.name]), []).append(i+1)
+        step=compileStep(i, source, tree, commands, target)
+        step.arguments=kwargs
+        steps.append(step)
+    existing=[f for f in files if os.path.isfile(f)]
+    for f in files:
+        if f not in existing:
+            errors+=['Line{}: File {} does not exist'.format(n, f) for n in files[f]]
+    if preload:
+        for f, ts in preloadHeaders(existing, maxWorkers).items():
+            if np.isnan(ts):
+                errors+=['Line{}: can not read the TNT header of {}'.format(n, f) for n in files[f]]
+    if errors:
+        raise RecipeError('\n'.join(sorted(errors, key=lambda e: int(e[4:e.index(':')]))))
+    return steps
@@ -0,0 +1,292 @@
+'''
+Created on Oct 17, 2026
+
+Event driven execution of MRIcontrol recipes.
+A recipe is parsed once into a list of steps, one per executable line, with every line compiled when the recipe is loaded so syntax errors are
+reported before anything runs.  Lines calling a registered command, e.g. \aRunTNMRfile(...), call a generator that yields wait primitives
+    Delay(seconds)                          a timed wait
+    Until(condition, timeout, description)  waits until condition() is True, e.g. acquisition complete or temperature stable
+instead of spinning in a processEvents loop.  The engine is advanced by calling tick() from a QTimer: each tick runs steps until one waits,
+checks the current wait and returns to the event loop, so the GUI is never blocked by a wait.  Other lines are executed as before.
+Pause holds the recipe between ticks (timed waits are extended by the pause), abort closes the waiting command so its cleanup runs.
+The start, duration, waiting and paused time of every step is recorded in timings.
+'''
+import ast
+import time
+import types
+
+class RecipeError(Exception):
+    pass
+
+class RecipeTimeout(Exception):
+    pass
+
+class Delay():
+  '''wait seconds'''
+  def __init__(self, seconds):
+      self.seconds=float(seconds)
+      self.description='{:.1f}s delay'.format(self.seconds)
+      self.deadline=None
+
+  def start(self, now):
+      self.deadline=now+self.seconds
+
+  def shift(self, dt):
+      '''extend the wait by dt, e.g. the time the recipe was paused'''
+      self.deadline+=dt
+
+  def ready(self, now):
+      return now>=self.deadline
+
+  def expired(self, now):
+      return False
+
+  def remaining(self, now):
+      return max(self.deadline-now, 0.0)
+
+class Until():
+  '''wait until condition() is True, raises RecipeTimeout in the waiting command after timeout seconds (None=wait forever)'''
+  def __init__(self, condition, timeout=None, description='condition'):
+      self.condition=condition
+      self.timeout=timeout
+      self.description=description
+      self.deadline=None
+
+  def start(self, now):
+      self.deadline=None if self.timeout is None else now+self.timeout
+
+  def shift(self, dt):
+      if self.deadline is not None:
+          self.deadline+=dt
+
+  def ready(self, now):
+      return bool(self.condition())
+
+  def expired(self, now):
+      return self.deadline is not None and now>self.deadline
+
+  def remaining(self, now):
+      return float('inf') if self.deadline is None else max(self.deadline-now, 0.0)
+
+class RecipeStep():
+  '''one executable recipe line, command is the registered command name or None for lines that are simply executed'''
+  def __init__(self, lineNumber, source, code, command=None, argsCode=None):
+      self.lineNumber=lineNumber      #index of the line in the recipe text, used to mark the executing line
+      self.source=source
+      self.code=code
+      self.command=command
+      self.argsCode=argsCode
+      self.arguments=None       #literal arguments bound by recipeCompiler.compileRecipe
+
+def dottedName(node, target='self'):
+  '''"TNMR.zg" for the function node of self.TNMR.zg(), None if the call is not on target'''
+  names=[]
+  while isinstance(node, ast.Attribute):
+      names.append(node.attr)
+      node=node.value
+  if isinstance(node, ast.Name) and node.id==target and names:
+      return '.'.join(reversed(names))
+  return None
+
+def packArgs(*args, **kwargs):
+  return args, kwargs
+
+def compileStep(i, source, tree, commands=(), target='self'):
+  '''RecipeStep of recipe line i from its parsed tree, arguments of a call to target.<name> with name in commands are compiled separately'''
+  fileName='<recipe line {}>'.format(i+1)
+  code=compile(tree, fileName, 'exec')
+  command, argsCode=None, None
+  if len(tree.body)==1 and isinstance(tree.body[0], ast.Expr) and isinstance(tree.body[0].value, ast.Call):
+      call=tree.body[0].value
+      name=dottedName(call.func, target)
+      if name in commands:      #evaluate the arguments only, the command itself is called by the engine
+          expr=ast.Expression(ast.Call(func=ast.Name(id='_packArgs', ctx=ast.Load()), args=call.args, keywords=call.keywords))
+          argsCode=compile(ast.fix_missing_locations(expr), fileName, 'eval')
+          command=name
+  return RecipeStep(i, source, code, command, argsCode)
+
+def parseRecipe(text, commands=(), prefix='\a', target='self'):
+  '''list of RecipeStep for the executable lines of the recipe text, the command prefix is replaced by target+'.', lines calling
+  target.<name> with name in commands get precompiled arguments, raises RecipeError listing every line that does not compile'''
+  steps=[]
+  errors=[]
+  for i, line in enumerate(text.split('\n')):
+      source=line.replace(prefix, target+'.').strip()
+      if source=='' or source[0]=='#':      #skip whitespace and comments
+          continue
+      try:
+          steps.append(compileStep(i, source, ast.parse(source, '<recipe line {}>'.format(i+1), 'exec'), commands, target))
+      except SyntaxError as e:
+          errors.append('Line{}: {}: {}'.format(i+1, e.msg, source))
+  if errors:
+      raise RecipeError('\n'.join(errors))
+  return steps
+
+def advance(commandSteps, now, exception=None):
+  '''resume a command generator, returns its next wait (started at now) or None when the command has finished'''
+  try:
+      wait=commandSteps.throw(exception) if exception is not None else commandSteps.send(None)
+  except StopIteration:
+      return None
+  wait.start(now)
+  return wait
+
+def runBlocking(commandSteps, wait=time.sleep, aborted=None, pollInterval=1.0, clock=time.time):
+  '''run a command generator to completion on the calling thread, used when a command is run outside a recipe,
+  wait(t) is called between polls (MRIcontrol.pause processes events), returns False if aborted'''
+  aborted=aborted if aborted is not None else (lambda: False)
+  w=advance(commandSteps, clock())
+  while w is not None:
+      if aborted():
+          commandSteps.close()
+          return False
+      now=clock()
+      if w.ready(now):
+          w=advance(commandSteps, now)
+      elif w.expired(now):
+          w=advance(commandSteps, now, RecipeTimeout(w.description))
+      else:
+          wait(min(pollInterval, w.remaining(now)))
+  return True
+
+class RecipeEngine():
+  '''Runs parsed recipe steps, call tick() periodically (QTimer), the recipe runs until all steps are done, abort() or an error
+      namespace                   globals the recipe lines are executed in, must contain the target (self)
+      commands                    {name: function}, functions returning a generator of Delay/Until waits are awaited, others are called
+      onStep(index, step)         called before each step
+      onFinish(status, error)     called once with status 'completed', 'aborted' or 'error'
+      onWait(wait)                called when a command starts waiting'''
+  def __init__(self, steps, namespace, commands=None, onStep=None, onFinish=None, onWait=None, budget=0.05, clock=time.time):
+      self.steps=steps
+      self.namespace=namespace
+      self.commands=commands if commands is not None else {}
+      self.onStep=onStep
+      self.onFinish=onFinish
+      self.onWait=onWait
+      self.budget=budget        #maximum time (s) spent starting steps in one tick before returning to the event loop
+      self.clock=clock
+      self.state='idle'     #'running', 'paused', 'completed', 'aborted' or 'error'
+      self.index=0      #next step
+      self.current=None     #generator of the waiting command
+      self.wait=None
+      self.ticking=False
+      self.abortRequested=False
+      self.pauseStart=None
+      self.timings=[]       #one dictionary per started step
+      self.error=None
+
+  @property
+  def running(self):
+      return self.state in ('running', 'paused')
+
+  def start(self):
+      self.state='running'
+      self.startTime=self.clock()
+      self.tick()
+
+  def pause(self):
+      if self.state=='running':
+          self.state='paused'
+          self.pauseStart=self.clock()
+
+  def resume(self):
+      if self.state=='paused':
+          dt=self.clock()-self.pauseStart
+          if self.wait is not None:
+              self.wait.shift(dt)
+          if self.timings:
+              self.timings[-1]['paused']+=dt
+          self.state='running'
+
+  def abort(self):
+      '''stop the recipe, the waiting command is closed so it can clean up (e.g. abort the acquisition)'''
+      self.abortRequested=True
+      if not self.ticking:      #otherwise abort when the current step returns to tick
+          self.stop('aborted')
+
+  def tick(self):
+      '''start steps and check the current wait, returns as soon as the recipe waits'''
+      if self.state!='running' or self.ticking:     #ticks from processEvents inside a step are ignored
+          return
+      self.ticking=True
+      try:
+          t0=self.clock()
+          while self.state=='running' and not self.abortRequested:
+              now=self.clock()
+              if self.current is not None:
+                  if self.wait.ready(now):
+                      self.resumeCommand(now)
+                  elif self.wait.expired(now):
+                      self.resumeCommand(now, RecipeTimeout('Line{}: timeout waiting for {}'.format(self.steps[self.index-1].lineNumber+1, self.wait.description)))
+                  else:
+                      break
+              elif self.index>=len(self.steps):
+                  self.stop('completed')
+              elif now-t0>self.budget:
+                  break
+              else:
+                  self.startStep()
+      except Exception as e:
+          self.stop('error', e)
+      finally:
+          self.ticking=False
+      if self.abortRequested and self.running:
+          self.stop('aborted')
+
+  def startStep(self):
+      step=self.steps[self.index]
+      self.index+=1
+      now=self.clock()
+      self.timings.append({'line':step.lineNumber+1, 'source':step.source, 'start':now-self.startTime, 'duration':0.0, 'waiting':0.0, 'paused':0.0})
+      if self.onStep is not None:
+          self.onStep(self.index-1, step)
+      if step.command is None:
+          exec(step.code, self.namespace)
+          self.endStep()
+          return
+      args, kwargs=eval(step.argsCode, self.namespace, {'_packArgs':packArgs})
+      result=self.commands[step.command](*args, **kwargs)
+      if isinstance(result, types.GeneratorType):
+          self.current=result
+          self.resumeCommand(self.clock())
+      else:
+          self.endStep()
+
+  def resumeCommand(self, now, exception=None):
+      if self.wait is not None:
+          self.timings[-1]['waiting']+=now-self.waitStart
+      self.wait=advance(self.current, now, exception)
+      if self.wait is None:
+          self.current=None
+          self.endStep()
+      else:
+          self.waitStart=now
+          if self.onWait is not None:
+              self.onWait(self.wait)
+
+  def endStep(self):
+      t=self.timings[-1]
+      t['duration']=self.clock()-self.startTime-t['start']
+
+  def stop(self, status, error=None):
+      if not self.running:
+          return
+      if self.current is not None:
+          try:
+              self.current.close()
+          except Exception as e:
+              error=error or e
+          self.current=None
+          self.wait=None
+          self.endStep()
+      self.state=status
+      self.error=error
+      if self.onFinish is not None:
+          self.onFinish(status, error)
+
+  def timingReport(self):
+      '''tab separated table of the step timings in seconds'''
+      lines=['line\tstart\tduration\twaiting\tpaused\tcommand']
+      for t in self.timings:
+          lines.append('{line}\t{start:.1f}\t{duration:.1f}\t{waiting:.1f}\t{paused:.1f}\t{source}'.format(**t))
+      return '\n'.join(lines)
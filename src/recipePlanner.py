@@ -0,0 +1,210 @@
+'''
+Created on Oct 17, 2026
+
+Runtime estimate and step reordering of MRIcontrol recipes, used by MRIcontrol.recipePreCheck.
+Step durations:
+    RunTNMRfile(file=...)           sequence time from the .tnt header, scans x (acquisition time + last delay) x 2D x 3D x 4D points
+    setTemperature(..., waitUntilStable=True)   temperature change / ramp rate + settle time, both fitted to the logged monitor data
+    TNMRShim(...)                   the duration of the last shim
+    pause(t)                        t
+Reordering merges the acquisitions of blocks (a setTemperature and the steps up to the next one) at the same temperature and orders the
+blocks by temperature, so the chiller goes through each temperature once and each temperature is shimmed once.  Only recipes made of
+the commands above can be reordered, any other line may depend on the order of the steps.
+'''
+import os
+import ast
+import numpy as np
+from processTNT import TNTfile
+from recipeEngine import RecipeError, dottedName
+
+commandArguments={'setTemperature':('temperature', 'waitUntilStable', 'temperatureStableRange'),
+                  'RunTNMRfile':('file', 'autoSave', 'waitUntilDone', 'comment', 'closeFileAfterUse', 'runtime'),
+                  'TNMRShim':('shimType', 'NMRShimFile', 'waitUntilDone', 'autoSave', 'startShims'),
+                  'pause':('t',)}       #positional argument names of the commands the planner understands
+commandDefaults={'setTemperature':{'temperature':20.0, 'waitUntilStable':False, 'temperatureStableRange':1},
+                 'RunTNMRfile':{'file':None, 'closeFileAfterUse':True},
+                 'TNMRShim':{'NMRShimFile':None},
+                 'pause':{'t':0}}
+fileCloseDelay=2        #pause(s) in RunTNMRfile before closing the file
+
+sequenceTimeCache={}        #(path, size, mtime): sequence time
+
+def sequenceTime(fileName):
+    '''estimated sequence time(s) from the TMAG header of a .tnt file, nan if the file can not be read'''
+    try:
+        st=os.stat(fileName)
+    except OSError:
+        return np.nan
+    key=(os.path.abspath(fileName), st.st_size, st.st_mtime)
+    if key not in sequenceTimeCache:
+        try:
+            tmag=TNTfile(fileName).TMAG
+            npts=np.asarray(tmag['npts']).reshape(-1)
+            tr=float(tmag['acq_time'])+float(tmag['last_delay'])
+            sequenceTimeCache[key]=int(tmag['scans'])*tr*float(np.prod(np.maximum(npts[1:], 1)))
+        except Exception:
+            sequenceTimeCache[key]=np.nan
+    return sequenceTimeCache[key]
+
+class TemperatureModel():
+  '''time to reach a stable temperature after a setpoint change of dT: settleTime + |dT|/rampRate'''
+  def __init__(self, rampRate=0.5/60, settleTime=600.0):
+      self.rampRate=rampRate        #C/s
+      self.settleTime=settleTime        #s
+      self.nTransitions=0       #number of logged setpoint changes the model was fitted to
+
+  def duration(self, dT):
+      return self.settleTime+np.absolute(dT)/self.rampRate
+
+  def fit(self, history, stableRange=1.0, minChange=0.1):
+      '''fit to monitor data, rows of [relTime, recipeStep, PSsetpoint, PSTemperature, opsensTemperature, TNMRbusy],
+      each setpoint change is a transition lasting until the sample temperature stays within stableRange of its final value,
+      keeps the current values if there are no complete transitions'''
+      h=np.asarray(history, dtype=float)
+      if h.ndim!=2 or h.shape[0]<3:
+          return self
+      t, setpoint, temperature=h[:,0], h[:,2], h[:,4]
+      changes=np.flatnonzero(np.absolute(np.diff(setpoint))>=minChange)+1
+      ends=np.append(changes[1:], len(t))
+      dTs, durations=[], []
+      for i0, i1 in zip(changes, ends):
+          final=temperature[i1-1]
+          outside=np.flatnonzero(np.absolute(temperature[i0:i1]-final)>=stableRange)
+          if len(outside)==0 or outside[-1]+1>=i1-i0:       #stable from the start or never stable
+              continue
+          durations.append(t[i0+outside[-1]+1]-t[i0-1])
+          dTs.append(np.absolute(final-temperature[i0-1]))
+      self.nTransitions=len(durations)
+      if len(durations)>=2 and np.ptp(dTs)>0:
+          slope, intercept=np.polyfit(dTs, durations, 1)
+          if slope>0:
+              self.rampRate=1/slope
+              self.settleTime=max(intercept, 0.0)
+      elif len(durations)>=1:       #one transition or all of the same size, keep the settle time and fit the rate
+          ramp=np.mean(durations)-self.settleTime
+          if ramp>0 and np.mean(dTs)>0:
+              self.rampRate=np.mean(dTs)/ramp
+      return self
+
+def parseCommand(line, prefix='\a', target='self'):
+    '''(command name, {argument: value}) of a recipe line, name is None for comments and blank lines,
+    arguments is None if the line is not a call with literal arguments of a command in commandArguments'''
+    source=line.replace(prefix, target+'.').strip()
+    if source=='' or source[0]=='#':
+        return None, None
+    try:
+        tree=ast.parse(source)
+    except SyntaxError:
+        return source, None
+    if len(tree.body)!=1 or not isinstance(tree.body[0], ast.Expr) or not isinstance(tree.body[0].value, ast.Call):
+        return source, None
+    call=tree.body[0].value
+    name=dottedName(call.func, target)
+    if name not in commandArguments:
+        return name or source, None
+    try:
+        kwargs=dict(commandDefaults[name])
+        kwargs.update(zip(commandArguments[name], [ast.literal_eval(a) for a in call.args]))
+        kwargs.update({k.arg: ast.literal_eval(k.value) for k in call.keywords})
+    except ValueError:      #arguments are expressions
+        return name, None
+    return name, kwargs
+
+def planRecipe(text, temperatureModel=None, shimTime=600.0, startTemperature=20.0, resolvePath=None):
+    '''list of {'line', 'command', 'kind', 'duration', 'note'} for the executable lines of a recipe, kind is 'acquisition', 'temperature',
+    'shim', 'pause' or 'other', duration in s (0 for steps that do not wait), resolvePath(file) completes relative file names'''
+    model=temperatureModel if temperatureModel is not None else TemperatureModel()
+    resolvePath=resolvePath if resolvePath is not None else (lambda f: f)
+    temperature=startTemperature
+    plan=[]
+    for i, line in enumerate(text.split('\n')):
+        name, kwargs=parseCommand(line)
+        if name is None:
+            continue
+        step={'line':i+1, 'command':name, 'kind':'other', 'duration':0.0, 'note':''}
+        if kwargs is None:
+            if name in commandArguments:
+                step['note']='arguments are not literals, duration unknown'
+        elif name=='RunTNMRfile':
+            step['kind']='acquisition'
+            ts=sequenceTime(resolvePath(kwargs['file'])) if kwargs['file'] else np.nan
+            if np.isnan(ts):
+                step['note']='can not read sequence time'
+                ts=0.0
+            step['duration']=ts+(fileCloseDelay if kwargs['closeFileAfterUse'] else 0)
+        elif name=='setTemperature':
+            step['kind']='temperature'
+            if kwargs['waitUntilStable']:
+                step['duration']=float(model.duration(kwargs['temperature']-temperature))
+            temperature=kwargs['temperature']
+        elif name=='TNMRShim':
+            step['kind']='shim'
+            step['duration']=shimTime
+        elif name=='pause':
+            step['kind']='pause'
+            step['duration']=float(kwargs['t'])
+        plan.append(step)
+    return plan
+
+def planSummary(plan):
+    '''total time and time per kind of step in s'''
+    summary={'total':0.0}
+    for step in plan:
+        summary[step['kind']]=summary.get(step['kind'], 0.0)+step['duration']
+        summary['total']+=step['duration']
+    return summary
+
+def reorderRecipe(text, startTemperature=20.0):
+    '''recipe text with the blocks at the same temperature merged and the blocks ordered by temperature, starting at the end of the
+    temperature range closest to startTemperature, comment lines move with the step that follows them,
+    raises RecipeError if the recipe has steps that can not be reordered'''
+    lines=text.split('\n')
+    header, blocks, pending=[], [], []
+    for i, line in enumerate(lines):
+        name, kwargs=parseCommand(line)
+        if name is None:
+            pending.append(line)
+            continue
+        if kwargs is None:
+            raise RecipeError('Line{}: {} can not be reordered'.format(i+1, line.replace('\a', '').strip()))
+        if name=='setTemperature':
+            blocks.append({'temperature':float(kwargs['temperature']), 'setTemperature':pending+[line], 'shims':[], 'steps':[]})
+        elif not blocks:
+            header+=pending+[line]
+        elif name=='TNMRShim' and not blocks[-1]['steps']:      #shims at the start of a block belong to its temperature
+            blocks[-1]['shims'].append(pending+[line])
+        else:
+            blocks[-1]['steps'].append(pending+[line])
+        pending=[]
+    merged={}
+    for block in blocks:
+        key=round(block['temperature'], 2)
+        if key not in merged:
+            merged[key]=block
+        else:       #same temperature: keep the first setTemperature and shim, append the steps
+            if not merged[key]['shims']:
+                merged[key]['shims']=block['shims']
+            merged[key]['steps']+=block['steps']
+    temperatures=sorted(merged)
+    if temperatures and np.absolute(temperatures[-1]-startTemperature)<np.absolute(temperatures[0]-startTemperature):
+        temperatures.reverse()
+    out=list(header)
+    for key in temperatures:
+        block=merged[key]
+        out+=block['setTemperature']
+        for group in block['shims']+block['steps']:
+            out+=group
+    return '\n'.join(out+pending)
+
+def temperatureChanges(text):
+    '''number of setTemperature steps that change the temperature and number of shims in a recipe'''
+    nChanges, nShims, temperature=0, 0, None
+    for line in text.split('\n'):
+        name, kwargs=parseCommand(line)
+        if name=='setTemperature' and kwargs is not None:
+            if kwargs['temperature']!=temperature:
+                nChanges+=1
+            temperature=kwargs['temperature']
+        if name=='TNMRShim':
+            nShims+=1
+    return nChanges, nShims
@@ -0,0 +1,90 @@
+'''
+Created on Oct 17, 2026
+
+Headless reconstruction of 4d Tecmag MRI data, shared by TNMRviewer and batchRecon.
+Conventions follow TNMRviewer: tnt data is (RO, slice, phase, parameter) and is rearranged to the internal working array (slice, RO, phase, parameter),
+images are reconstructed with a 2d FFT over the readout and phase axes with k=0 at the center of k-space.
+'''
+import numpy as np
+import fftBackend
+
+protocolList=['SEMS', 'SEMS_IR', 'GE_FLASH', 'GEMS_IR', 'SCOUT', 'PGSE_Dif']     #protocol names recognized in filenames, later entries take precedence
+
+def protocolFromFilename(fileName):
+    '''guess the protocol from the file name the same way TNMRviewer.openTNTFile does, returns "" if not found'''
+    protocol=''
+    for p in protocolList:
+        if fileName.find(p)!=-1:
+            protocol=p
+    return protocol
+
+def tntWorkingArray(DATA):
+    '''rearrange tnt data (RO, slice, phase, parameter) to the working array (slice, RO, phase, parameter), returns a view'''
+    return np.swapaxes(DATA, 0, 1)
+
+def padPhaseToReadout(data, roIndex=1, pIndex=2):
+    '''zero pad the phase encode dimension equally on both sides to match the readout dimension, returns (data, npad)'''
+    columns=data.shape[roIndex]
+    rows=data.shape[pIndex]
+    npad=0
+    if rows< columns:
+        npad=int((columns-rows)/2)
+        pad=[(0,0)]*data.ndim
+        pad[pIndex]=(npad, npad)
+        data=np.pad(data, pad, 'constant')
+    return data, npad
+
+def scoutViews(scout, nRF=-1):
+    '''coronal, sagittal and axial views of a scout (RO, slice, phase[, parameter]) which has the 3 views concatenated along the readout,
+    if nRF!=-1 receive channel nRF is extracted from CH1,2,3,4 data, returns a (3, columns, slice, phase[, parameter]) view without copying'''
+    if nRF !=-1:
+        scout=scout[nRF::4]
+    columns=int(scout.shape[0]/3)
+    views=np.reshape(scout[:3*columns], (columns, 3)+scout.shape[1:], order='F')     #readout index = column + view*columns, splitting one axis is always a view
+    return np.moveaxis(views, 1, 0)
+
+def separateScout(data, nRF=-1):
+    '''Separate a single slice Magnetica scout which has 3 views concatenated along the readout, data is a (slice, RO, phase, parameter) working array,
+    if nRF!=-1 receive channel nRF is extracted from CH1,2,3,4 data,
+    returns the (3, columns, rows, parameter) coronal, sagittal, axial views with the phase encode zero padded to be square and the padding'''
+    views=np.squeeze(scoutViews(np.swapaxes(data, 0, 1), nRF=nRF), axis=2)
+    return padPhaseToReadout(views)
+
+def reconstructScout(scout, nRF=-1, dtype=np.complex64):
+    '''Reconstruct the coronal, sagittal and axial views of a scout (RO, slice, phase) which has the 3 views concatenated along the readout,
+    used by MRIcontrol.processScout.  The views are copied once into a zero padded square (3, slice, columns, columns) work array,
+    centered by alternating signs (instead of fftshift when both dimensions are even) and transformed with one batched 2d FFT.
+    returns (complex images (3, slice, RO, phase), magnitude images normalized to the maximum of each view, phase encode padding)'''
+    views=scoutViews(scout, nRF=nRF)
+    nviews, columns, nslices, rows=views.shape
+    npad=max(0, int((columns-rows)/2))
+    size=rows+2*npad
+    kspace=fftBackend.emptyAligned((nviews, nslices, columns, size), dtype=dtype, order='C')
+    kspace[..., :npad]=0
+    kspace[..., npad+rows:]=0
+    centered=columns%2==0 and size%2==0
+    if centered:        #(-1)^(i+j) modulation shifts k=0 to the image center
+        sign=np.where((np.arange(columns)[:,None]+np.arange(npad, npad+rows)[None,:])%2, -1, 1).astype(kspace.real.dtype)
+        np.multiply(np.moveaxis(views, 2, 1), sign, out=kspace[..., npad:npad+rows])
+    else:
+        kspace[..., npad:npad+rows]=np.moveaxis(views, 2, 1)
+    images=fftBackend.fft2(kspace, axes=(-2,-1), overwrite_x=True)
+    if not centered:
+        images=np.fft.fftshift(images, axes=(-2,-1))
+    mag=np.absolute(images)
+    mag/=mag.max(axis=(1,2,3), keepdims=True)       #normalize each view
+    return images, mag, npad
+
+def fft2Recon(data, roIndex=1, pIndex=2):
+    '''FFTs raw data along the readout and phase axes, assumes k=0 is in the center, returns the centered complex image'''
+    dat=np.fft.fftshift(data,axes=(roIndex,pIndex))   #shift to make k=0 at upper left
+    return np.fft.fftshift(fftBackend.fft2(dat,axes=(roIndex,pIndex),overwrite_x=True),axes=(roIndex,pIndex))     #FFT then shift to center image
+
+def reconstructTNT(tntfile, protocol=None, nRF=-1):
+    '''reconstruct an open TNTfile, returns (complex image array (slice, RO, phase, parameter), protocol)'''
+    if protocol is None:
+        protocol=protocolFromFilename(tntfile.tntfilename)
+    data=tntWorkingArray(tntfile.DATA)
+    if protocol=='SCOUT':
+        data, npad=separateScout(data, nRF=nRF)
+    return fft2Recon(data), protocol
@@ -0,0 +1,223 @@
+'''
+Created on Oct 17, 2026
+
+Simulated pyvisa instruments for the temperature control path of MRIcontrol, so setPSsetpoint, calculateDesiredChillerSetPoint,
+checkTemperatureStable and the instrument workers can be run and benchmarked without the PolyScience chiller and Opsens thermometer.
+SimResourceManager replaces pyvisa.ResourceManager, its resources answer the same serial protocols:
+    PolyScience     'RT' bath temperature, 'RS' setpoint, 'SSxxx.xx' set setpoint ('!'), 'SO0'/'SO1' off/on, 'RF' fault, 'RM' pump speed, 'RO' operating
+    Opsens          '*IDN?', 'Channel1:DATA? 1' (reads the number of readings, then the temperature), 'ch01:diag?' (6 lines)
+Both read a ThermalModel: the bath relaxes to the setpoint (to the room when the chiller is off) with time constant tauBath and the
+sample relaxes to the bath with tauSample while leaking to the room with tauLeak, which gives the steady sample/setpoint offset the
+ChillerOffsetSlope of MRIcontrol corrects.  Time runs speedup times faster than real time, each call waits latency seconds and
+readings have gaussian noise.
+
+usage:
+    set PYMRI_SIMULATE_INSTRUMENTS=1        (MRIcontrol then uses SimResourceManager)
+    python simInstruments.py                benchmark of the instrument workers and the thermal step response
+'''
+import os
+import time
+import threading
+import numpy as np
+
+class ThermalModel():
+  '''first order chiller bath and sample temperatures(C), time in simulated seconds'''
+  def __init__(self, ambient=21.0, setpoint=20.0, tauBath=600.0, tauSample=300.0, tauLeak=2400.0, speedup=1.0):
+      self.ambient=ambient
+      self.setpoint=setpoint
+      self.tauBath=tauBath
+      self.tauSample=tauSample
+      self.tauLeak=tauLeak
+      self.speedup=speedup
+      self.on=True
+      self.bath=setpoint
+      self.sample=self.steadySample(setpoint)
+      self.lock=threading.Lock()        #both instruments may be read from different worker threads
+      self.t=0.0
+      self.lastUpdate=time.monotonic()
+
+  def steadySample(self, bath):
+      return (bath/self.tauSample+self.ambient/self.tauLeak)/(1/self.tauSample+1/self.tauLeak)
+
+  def update(self):
+      '''advance the model to the current simulated time in steps of at most 1s'''
+      now=time.monotonic()
+      dt=(now-self.lastUpdate)*self.speedup
+      self.lastUpdate=now
+      self.advance(dt)
+
+  def advance(self, dt):
+      n=int(np.ceil(dt))
+      for i in range(n):
+          h=dt/n
+          target=self.setpoint if self.on else self.ambient
+          self.bath+=(target-self.bath)*(1-np.exp(-h/self.tauBath))
+          self.sample+=(self.steadySample(self.bath)-self.sample)*(1-np.exp(-h/self.tauSample))
+      self.t+=dt
+
+  def read(self):
+      '''(bath, sample) temperature'''
+      with self.lock:
+          self.update()
+          return self.bath, self.sample
+
+  def setSetpoint(self, setpoint):
+      with self.lock:
+          self.update()
+          self.setpoint=setpoint
+
+  def setOn(self, on):
+      with self.lock:
+          self.update()
+          self.on=on
+
+class SimTimeout(Exception):
+    '''raised like pyvisa.errors.VisaIOError when a read has nothing to return'''
+    pass
+
+class SimResource():
+  '''serial resource with the pyvisa write/read/query/close interface'''
+  def __init__(self, model, latency=0.0, noise=0.0, seed=None):
+      self.model=model
+      self.latency=latency
+      self.noise=noise
+      self.rng=np.random.default_rng(seed)
+      self.read_termination='\n'
+      self.write_termination='\r'
+      self.timeout=2000
+      self.pending=[]       #lines waiting to be read
+      self.closed=False
+      self.calls=0
+
+  def wait(self):
+      self.calls+=1
+      if self.closed:
+          raise SimTimeout('resource is closed')
+      if self.latency>0:
+          time.sleep(self.latency)
+
+  def noisy(self, value):
+      return value+self.noise*self.rng.standard_normal() if self.noise>0 else value
+
+  def write(self, command):
+      self.wait()
+      self.pending+=self.respond(command.strip())
+
+  def read(self):
+      self.wait()
+      if not self.pending:
+          raise SimTimeout('timeout, nothing to read')
+      return self.pending.pop(0)
+
+  def query(self, command):
+      self.write(command)
+      return self.read()
+
+  def close(self):
+      self.closed=True
+
+  def respond(self, command):
+      '''list of lines answering command'''
+      return []
+
+class SimPolyScience(SimResource):
+  def __init__(self, model, latency=0.0, noise=0.0, seed=None):
+      super().__init__(model, latency, noise, seed)
+      self.read_termination='\r'
+
+  def respond(self, command):
+      if command=='RT':
+          return ['{:.2f}'.format(self.noisy(self.model.read()[0]))]
+      if command=='RS':
+          return ['{:.2f}'.format(self.model.setpoint)]
+      if command.startswith('SS'):
+          self.model.setSetpoint(float(command[2:]))
+          return ['!']
+      if command in ('SO0', 'SO1'):
+          self.model.setOn(command=='SO1')
+          return ['!']
+      if command=='RO':
+          return ['1' if self.model.on else '0']
+      if command=='RF':
+          return ['0']
+      if command=='RM':
+          return ['005']
+      return ['?']
+
+class SimOpsens(SimResource):
+  def respond(self, command):
+      c=command.lower()
+      if c=='*idn?':
+          return ['Opsens,Simulated,0,1.0']
+      if c.startswith('channel') and 'data?' in c:
+          return ['1', '{:.3f}'.format(self.noisy(self.model.read()[1]))]
+      if c.endswith(':diag?'):
+          return ['OK', '0', '0', '0', '0', '0']
+      return []
+
+class SimResourceManager():
+  '''stand-in for pyvisa.ResourceManager, addresses are mapped to simulated instruments by kind ('opsens' or 'polyscience')'''
+  def __init__(self, model=None, latency=0.0, noise=0.0, addresses=None, seed=0):
+      self.model=model if model is not None else ThermalModel()
+      self.latency=latency
+      self.noise=noise
+      self.addresses=addresses if addresses is not None else {'ASRL10::INSTR':'opsens', 'COM10':'opsens', 'COM9':'polyscience', 'ASRL9::INSTR':'polyscience'}
+      self.seed=seed
+      self.resources=[]
+
+  def list_resources(self):
+      return tuple(self.addresses)
+
+  def open_resource(self, address, **kwargs):
+      kind=self.addresses.get(address)
+      if kind is None:
+          raise SimTimeout('no simulated instrument at '+address)
+      cls=SimOpsens if kind=='opsens' else SimPolyScience
+      resource=cls(self.model, self.latency, self.noise, seed=self.seed+len(self.resources))
+      self.resources.append(resource)
+      return resource
+
+def simulationEnabled():
+    return os.environ.get('PYMRI_SIMULATE_INSTRUMENTS', '').lower() in ('1', 'true', 'yes')
+
+def resourceManager():
+    '''SimResourceManager configured from PYMRI_SIM_LATENCY(s), PYMRI_SIM_NOISE(C) and PYMRI_SIM_SPEEDUP'''
+    model=ThermalModel(speedup=float(os.environ.get('PYMRI_SIM_SPEEDUP', 1)))
+    return SimResourceManager(model, latency=float(os.environ.get('PYMRI_SIM_LATENCY', 0.01)), noise=float(os.environ.get('PYMRI_SIM_NOISE', 0.005)))
+
+def benchWorkers(duration=5.0, latency=0.05, interval=0.1):
+    '''readings per second published by the Opsens and PolyScience workers'''
+    import instrumentWorkers
+    rm=SimResourceManager(latency=latency, noise=0.005)
+    cache=instrumentWorkers.ReadingCache()
+    workers=[instrumentWorkers.InstrumentWorker('Opsens', lambda: instrumentWorkers.openOpsens(rm), instrumentWorkers.opsensPolls, cache, interval=interval),
+             instrumentWorkers.InstrumentWorker('PolyScience', lambda: instrumentWorkers.openPolyScience(rm), instrumentWorkers.polySciencePolls, cache, interval=interval)]
+    for w in workers:
+        w.start()
+    n=0
+    t0=time.perf_counter()
+    while time.perf_counter()-t0<duration:     #GUI side: reading the cache never waits for an instrument
+        cache.get('Opsens.temperature')
+        cache.get('PolyScience.temperature')
+        n+=1
+        time.sleep(0.001)
+    for w in workers:
+        w.stop(timeout=5)
+    calls=sum(r.calls for r in rm.resources)
+    print('instrument calls/s={:.1f}, cache reads/s={:.0f}, sample={:.3f}C, bath={:.2f}C'.format(calls/duration, n/duration,
+          cache.get('Opsens.temperature'), cache.get('PolyScience.temperature')))
+
+def benchStepResponse(step=10.0, stableRange=0.1, dt=10.0, tmax=4*3600):
+    '''simulated time for the sample to settle within stableRange after a setpoint step, with the default model'''
+    model=ThermalModel()
+    final=model.steadySample(model.setpoint+step)
+    model.setpoint+=step
+    t=0.0
+    while t<tmax and abs(model.sample-final)>=stableRange:
+        model.advance(dt)
+        t+=dt
+    print('setpoint step {:.1f}C: sample within {:.2f}C of {:.2f}C after {:.0f}s'.format(step, stableRange, final, t))
+
+if __name__ == '__main__':
+    benchWorkers()
+    benchStepResponse()
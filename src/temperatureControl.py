@@ -0,0 +1,167 @@
+'''
+Created on Oct 17, 2026
+
+Sample temperature control through the chiller setpoint.
+The sample temperature y responds to the chiller setpoint u as a first order plus dead time (FOPDT) system
+    dy/dt(t) = (gain*u(t-deadTime) + offset - y(t))/tau
+identified by least squares from the logged setpoint and Opsens history (MRIcontrol.monitorData).  The controller drives the setpoint with
+    feed-forward       u=(target-offset)/gain, the setpoint that holds the sample at the target
+    overdrive          u=feed-forward +- maxOverdrive while the temperature predicted one dead time ahead is outside band of the target
+    PI                 feed-forward + kp*error + ki*integral(error) inside the band
+clipped to uMin..uMax, which must lie strictly inside the range the chiller accepts.  A reading that jumps more than maxJump from the
+last accepted one is taken as an Opsens glitch and ignored unless the next reading confirms it,
+so the chiller works at its limit for most of a temperature change instead of relaxing exponentially to the final setpoint.
+Predicted times to a stable temperature are from simulating the controller on the model.
+'''
+from collections import deque
+import numpy as np
+
+class FOPDTModel():
+  '''first order plus dead time model of sample temperature vs chiller setpoint, times in s, temperatures in C'''
+  def __init__(self, gain=1/1.125, offset=0.125*16/1.125, tau=900.0, deadTime=60.0):
+      self.gain=gain        #default from MRIcontrol ChillerOffsetSlope=0.125, ChillerOffsetTemperature=16
+      self.offset=offset
+      self.tau=tau
+      self.deadTime=deadTime
+      self.residual=np.nan      #rms error(C/s) of the fitted derivative, nan if not fitted
+
+  def steadyState(self, u):
+      return self.gain*u+self.offset
+
+  def inputFor(self, y):
+      '''setpoint that holds the sample at y'''
+      return (y-self.offset)/self.gain
+
+  def step(self, y, u, dt):
+      '''temperature dt after y with the delayed setpoint u constant'''
+      return self.steadyState(u)+(y-self.steadyState(u))*np.exp(-dt/self.tau)
+
+  def fit(self, t, u, y, dt=10.0, deadTimes=None, minExcitation=0.5):
+      '''identify the model from time, setpoint and sample temperature histories, returns False and keeps the current values
+      if the setpoint varied by less than minExcitation or no physical model fits'''
+      t, u, y=np.asarray(t, dtype=float), np.asarray(u, dtype=float), np.asarray(y, dtype=float)
+      ok=np.isfinite(t) & np.isfinite(u) & np.isfinite(y)
+      t, u, y=t[ok], u[ok], y[ok]
+      if len(t)<10 or np.ptp(u)<minExcitation or np.any(np.diff(t)<=0):
+          return False
+      tg=np.arange(t[0], t[-1], dt)     #uniform grid
+      ug, yg=np.interp(tg, t, u), np.interp(tg, t, y)
+      dy=np.diff(yg)/dt
+      n=len(dy)
+      deadTimes=np.arange(0, min(600, (n//2)*dt)+dt, 3*dt) if deadTimes is None else deadTimes
+      best=None
+      for d in deadTimes:
+          k=int(round(d/dt))
+          if n-k<10:
+              continue
+          A=np.column_stack((ug[:n-k], np.ones(n-k), -yg[k:n]))       #dy[i]=a1*u[i-k]+a0-a2*y[i]
+          p, res, rank, sv=np.linalg.lstsq(A, dy[k:], rcond=None)
+          if rank<3 or p[0]<=0 or p[2]<=0:
+              continue
+          rms=np.sqrt(np.mean((A @ p-dy[k:])**2))
+          if best is None or rms<best[0]:
+              best=(rms, k*dt, p)
+      if best is None:
+          return False
+      rms, self.deadTime, (a1, a0, a2)=best
+      self.tau, self.gain, self.offset, self.residual=1/a2, a1/a2, a0/a2, rms
+      return True
+
+class TemperatureController():
+  '''feed-forward plus overdrive/PI controller of the chiller setpoint, call update(time, sampleTemperature) every control interval'''
+  def __init__(self, model=None, uMin=-10.0, uMax=60.0, maxOverdrive=10.0, band=0.5, kp=1.0, ki=None, maxJump=1.0):
+      self.model=model if model is not None else FOPDTModel()
+      self.uMin=uMin        #chiller setpoint limits
+      self.uMax=uMax
+      self.maxOverdrive=maxOverdrive      #maximum setpoint deviation from the feed-forward setpoint
+      self.band=band        #PI control within band(C) of the target, overdrive outside
+      self.kp=kp
+      self.ki=ki        #None = kp/tau
+      self.maxJump=maxJump      #C between readings, larger jumps are glitches
+      self.target=None
+      self.reset()
+
+  def reset(self):
+      self.integral=0.0
+      self.lastTime=None
+      self.history=deque()      #(time, setpoint) applied during the last dead time
+      self.lastReading=None     #last accepted sample temperature
+      self.pendingReading=None      #rejected reading waiting for confirmation
+      self.glitches=0
+
+  def filterReading(self, y):
+      '''y, or the last accepted reading if y jumped by more than maxJump from it and is not confirmed by the previous rejected reading'''
+      if self.lastReading is None or np.absolute(y-self.lastReading)<=self.maxJump or \
+         (self.pendingReading is not None and np.absolute(y-self.pendingReading)<=self.maxJump):
+          self.lastReading, self.pendingReading=y, None
+          return y
+      self.pendingReading=y
+      self.glitches+=1
+      return self.lastReading
+
+  def setTarget(self, target):
+      if target!=self.target:
+          self.integral=0.0
+      self.target=target
+
+  def feedForward(self):
+      return self.model.inputFor(self.target)
+
+  def predict(self, y, now):
+      '''sample temperature one dead time ahead, from the setpoints already applied that have not acted yet'''
+      yp=y
+      for (t0, u), (t1, _) in zip(self.history, list(self.history)[1:]+[(now, None)]):
+          dt=min(t1, now)-max(t0, now-self.model.deadTime)
+          if dt>0:
+              yp=self.model.step(yp, u, dt)
+      return yp
+
+  def update(self, now, y):
+      '''new chiller setpoint for sample temperature y at time now(s)'''
+      dt=0.0 if self.lastTime is None else now-self.lastTime
+      self.lastTime=now
+      y=self.filterReading(y)
+      uff=self.feedForward()
+      error=self.target-y
+      yp=self.predict(y, now)
+      if np.absolute(self.target-yp)>self.band:
+          u=uff+np.sign(self.target-yp)*self.maxOverdrive
+          self.integral=0.0
+      else:
+          ki=self.kp/self.model.tau if self.ki is None else self.ki
+          self.integral+=error*dt
+          if ki>0:      #anti windup
+              self.integral=np.clip(self.integral, -self.maxOverdrive/ki, self.maxOverdrive/ki)
+          u=uff+self.kp*error+ki*self.integral
+      u=float(np.clip(np.clip(u, uff-self.maxOverdrive, uff+self.maxOverdrive), self.uMin, self.uMax))
+      self.history.append((now, u))
+      while len(self.history)>1 and self.history[1][0]<=now-self.model.deadTime:
+          self.history.popleft()
+      return u
+
+  def simulate(self, y0, target, duration=6*3600, dt=10.0, closedLoop=True):
+      '''(times, temperatures) of the model driven by a copy of this controller, or by the feed-forward setpoint if closedLoop is False'''
+      c=TemperatureController(self.model, self.uMin, self.uMax, self.maxOverdrive, self.band, self.kp, self.ki, self.maxJump)
+      c.setTarget(target)
+      k=int(round(self.model.deadTime/dt))
+      u0=self.model.inputFor(y0)
+      delayed=deque([u0]*k)
+      n=int(duration/dt)
+      times=np.arange(n+1)*dt
+      y=np.empty(n+1)
+      y[0]=y0
+      for i in range(n):
+          u=c.update(times[i], y[i]) if closedLoop else c.feedForward()
+          delayed.append(u)
+          y[i+1]=self.model.step(y[i], delayed.popleft(), dt)
+      return times, y
+
+  def timeToStable(self, y0, target, stableRange=1.0, closedLoop=True, duration=6*3600, dt=10.0):
+      '''predicted time(s) after which the sample stays within stableRange of target, inf if not within duration'''
+      times, y=self.simulate(y0, target, duration, dt, closedLoop)
+      outside=np.flatnonzero(np.absolute(y-target)>=stableRange)
+      if len(outside)==0:
+          return 0.0
+      if outside[-1]==len(y)-1:
+          return np.inf
+      return float(times[outside[-1]+1])
@@ -0,0 +1,116 @@
+'''
+Created on Oct 17, 2026
+
+Ring buffer store for the monitor data of MRIcontrol.monitorInstruments.
+Rows of channels (e.g. relTime, recipeStep, PSsetpoint, PSTemperature, opsensTemperature, TNMRbusy) are written into a preallocated array
+that doubles in size when full, up to maxRows, after which the oldest rows are overwritten, so appending costs the same however long a
+recipe runs and memory is bounded.  Every row can also be appended to a text log (np.loadtxt format, same as plotWindow.saveData) that is
+never rewritten.  For display, displayRows picks the rows holding the minimum and maximum of each channel in equal blocks of rows,
+which keeps the plotted envelope of a long recording with a bounded number of points.
+'''
+import numpy as np
+
+class TimeSeries():
+  '''growable ring buffer of rows with a fixed number of channels, np.asarray(series) gives the rows oldest first'''
+  def __init__(self, channels, capacity=1024, maxRows=None, dtype=np.float64):
+      self.channels=list(channels)
+      self.maxRows=maxRows      #None = grow without bound
+      self.buffer=np.zeros((min(capacity, maxRows) if maxRows else capacity, len(self.channels)), dtype=dtype)
+      self.start=0      #buffer index of the oldest row
+      self.count=0
+      self.log=None
+      self.logFile=None
+
+  def __len__(self):
+      return self.count
+
+  def __array__(self, dtype=None, copy=None):
+      return self.data() if dtype is None else self.data().astype(dtype)
+
+  def clear(self):
+      '''remove all rows, the log is not changed'''
+      self.start=0
+      self.count=0
+
+  def append(self, row):
+      '''add one row, grows the buffer when full or overwrites the oldest row when maxRows is reached'''
+      n=self.buffer.shape[0]
+      if self.count==n:
+          if self.maxRows is None or n<self.maxRows:
+              self.grow(n*2 if self.maxRows is None else min(2*n, self.maxRows))
+          else:
+              self.start=(self.start+1) % n       #drop the oldest row
+              self.count-=1
+      n=self.buffer.shape[0]
+      self.buffer[(self.start+self.count) % n]=row
+      self.count+=1
+      if self.log is not None:
+          self.log.write(' '.join('{:8.2f}'.format(v) for v in row)+'\n')
+          self.log.flush()
+
+  def grow(self, size):
+      '''copy the rows oldest first into a buffer of size rows'''
+      buffer=np.zeros((size, self.buffer.shape[1]), dtype=self.buffer.dtype)
+      buffer[:self.count]=self.data()
+      self.buffer=buffer
+      self.start=0
+
+  def indices(self, rows):
+      '''buffer indices of rows counted from the oldest'''
+      return (self.start+np.asarray(rows)) % self.buffer.shape[0]
+
+  def data(self, rows=None):
+      '''copy of the rows (all by default) oldest first'''
+      if rows is not None:
+          return self.buffer[self.indices(rows)]
+      end=self.start+self.count
+      n=self.buffer.shape[0]
+      if end<=n:
+          return self.buffer[self.start:end].copy()
+      return np.concatenate((self.buffer[self.start:], self.buffer[:end-n]))
+
+  def latest(self):
+      return self.buffer[self.indices(self.count-1)]
+
+  def column(self, channel):
+      '''all values of one channel given by name or index, oldest first'''
+      c=self.channels.index(channel) if isinstance(channel, str) else channel
+      end=self.start+self.count
+      n=self.buffer.shape[0]
+      if end<=n:
+          return self.buffer[self.start:end, c].copy()
+      return np.concatenate((self.buffer[self.start:, c], self.buffer[:end-n, c]))
+
+  def displayRows(self, columns=None, maxPoints=2000):
+      '''sorted indices (oldest=0) of the rows holding the minimum and maximum of each of columns (default all) in each of about
+      maxPoints/2 blocks of rows, all rows if there are fewer than maxPoints'''
+      if self.count<=maxPoints:
+          return np.arange(self.count)
+      columns=range(len(self.channels)) if columns is None else columns
+      block=int(np.ceil(2*self.count/maxPoints))
+      nblocks=self.count//block
+      rows=[np.arange(nblocks*block, self.count)]     #partial last block is kept as is
+      for c in columns:
+          y=self.column(c)[:nblocks*block].reshape(nblocks, block)
+          first=np.arange(nblocks)*block
+          rows+=[first+np.argmin(y, axis=1), first+np.argmax(y, axis=1)]
+      return np.unique(np.concatenate(rows))
+
+  def openLog(self, fileName, header=''):
+      '''append every new row to the text file fileName, written with header if it is new'''
+      self.closeLog()
+      new=True
+      try:
+          with open(fileName, 'r') as f:
+              new=f.read(1)==''
+      except OSError:
+          pass
+      self.log=open(fileName, 'a')
+      self.logFile=fileName
+      if new and header!='':
+          self.log.write('# '+header+'\n')
+
+  def closeLog(self):
+      if self.log is not None:
+          self.log.close()
+      self.log=None
@@ -0,0 +1,186 @@
+'''
+Created on Oct 17, 2026
+
+Persistent SQLite catalog of Tecmag .tnt files.
+A scan walks a directory tree and stores the TMAG/TMG2 header values and the comment fields written by
+MRIcontrol.writeTNMRComment (Protocol, SampleID, SampleTemperature(C), FoV(mm), b-Values(s/mm^2) ...) in an indexed table.
+Rescans only reopen files whose size or modification time has changed.
+
+usage:
+    python tntCatalog.py studies.db scan D:\\MRIdata
+    python tntCatalog.py studies.db query --protocol SEMS_IR --temperature 20 --fov 160
+
+Units follow the TNMR comment: temperatures in C, lengths in mm, b-values in s/mm^2
+'''
+import os, re, time, sqlite3, argparse
+from processTNT import TNTfile
+from utils import make_str
+from reconTNT import protocolFromFilename
+
+commentFields={'Protocol':'protocol', 'SampleID':'sampleID', 'SampleTemperature(C)':'sampleTemperature', 'ImageOrientation':'imageOrientation',
+               'GradientOrientation':'gradientOrientation', 'FoV(mm)':'FoV', 'SliceThickness(mm)':'sliceThickness', 'SliceSpacing(mm)':'sliceSpacing',
+               'sliceArrayCenter(mm)':'sliceArrayCenter', 'RunTime':'runTime', 'b-Values(s/mm^2)':'bValues'}     #comment key: catalog column
+floatColumns=('sampleTemperature', 'FoV', 'sliceThickness', 'sliceSpacing', 'sliceArrayCenter')
+
+columns=[('path','TEXT PRIMARY KEY'), ('directory','TEXT'), ('filename','TEXT'), ('size','INTEGER'), ('mtime','REAL'),
+         ('protocol','TEXT'), ('sampleID','TEXT'), ('sampleTemperature','REAL'), ('imageOrientation','TEXT'), ('gradientOrientation','TEXT'),
+         ('FoV','REAL'), ('sliceThickness','REAL'), ('sliceSpacing','REAL'), ('sliceArrayCenter','REAL'), ('runTime','TEXT'), ('bValues','TEXT'),
+         ('sequence','TEXT'), ('obFreq','REAL'), ('nReadout','INTEGER'), ('nSlice','INTEGER'), ('nPhase','INTEGER'), ('nParameter','INTEGER'),
+         ('scans','INTEGER'), ('actualScans','INTEGER'), ('dwell','REAL'), ('acqTime','REAL'), ('lastDelay','REAL'), ('experimentTime','REAL'),
+         ('startTime','REAL'), ('finishTime','REAL'), ('grdOrientation','TEXT'), ('comment','TEXT'), ('error','TEXT')]
+indexedColumns=('protocol', 'sampleTemperature', 'FoV', 'sampleID', 'directory', 'startTime')
+
+def parseCommentFields(comment):
+    '''returns a dictionary of the key=value fields in a TNMR comment, bracketed values (numpy arrays) may be wrapped over several lines'''
+    fields={}
+    for m in re.finditer(r'([A-Za-z][\w\-\(\)/\^]*)\s*=\s*(\[[^\]]*\]|[^\r\n;]*)', comment):
+        value=m.group(2)
+        fields[m.group(1)]=' '.join(value.split()) if value.startswith('[') else value.strip()      #join wrapped array lines
+    return fields
+
+def readTNTEntry(path):
+    '''open a .tnt file by its section index and return a dictionary of catalog columns'''
+    st=os.stat(path)
+    entry={'path':os.path.abspath(path), 'directory':os.path.dirname(os.path.abspath(path)), 'filename':os.path.basename(path),
+           'size':st.st_size, 'mtime':st.st_mtime}
+    try:
+        tnt=TNTfile(path)
+        npts=tnt.TMAG['actual_npts']
+        entry.update({'sequence':make_str(tnt.TMAG['sequence']).strip('\x00'), 'obFreq':float(tnt.TMAG['ob_freq'][0]),
+                      'nReadout':int(npts[0]), 'nSlice':int(npts[1]), 'nPhase':int(npts[2]), 'nParameter':int(npts[3]),
+                      'scans':int(tnt.TMAG['scans']), 'actualScans':int(tnt.TMAG['actual_scans']), 'dwell':float(tnt.TMAG['dwell'][0]),
+                      'acqTime':float(tnt.TMAG['acq_time']), 'lastDelay':float(tnt.TMAG['last_delay']),
+                      'experimentTime':float(tnt.TMAG['experiment_time']), 'startTime':float(tnt.TMAG['start_time']),
+                      'finishTime':float(tnt.TMAG['finish_time']), 'grdOrientation':make_str(tnt.TMAG['grd_orientation'])})
+        try:
+            comment=tnt.TNMRCommentRaw
+        except:
+            comment=''      #no PSEQ or comment section
+        entry['comment']=comment
+        for key, value in parseCommentFields(comment).items():
+            if key in commentFields:
+                column=commentFields[key]
+                if column in floatColumns:
+                    try:
+                        value=float(value)
+                    except ValueError:
+                        value=None
+                entry[column]=value
+        del tnt     #release the DATA memmap
+    except Exception as e:
+        entry['error']='{}: {}'.format(type(e).__name__, e)
+    if not entry.get('protocol'):
+        entry['protocol']=protocolFromFilename(entry['filename'])
+    return entry
+
+class TNTCatalog():
+    '''SQLite catalog of .tnt files, use scan() to add or refresh a directory tree and query() to find files'''
+    def __init__(self, dbFile='tntCatalog.db'):
+        self.dbFile=dbFile
+        self.db=sqlite3.connect(dbFile)
+        self.db.row_factory=sqlite3.Row
+        self.db.execute('CREATE TABLE IF NOT EXISTS tntfiles ({})'.format(', '.join(' '.join(c) for c in columns)))
+        for c in indexedColumns:
+            self.db.execute('CREATE INDEX IF NOT EXISTS idx_{0} ON tntfiles ({0})'.format(c))
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
+
+    def scan(self, rootDirectory, message=print):
+        '''walk rootDirectory, (re)read new or modified .tnt files and drop entries for deleted files, returns (added/updated, unchanged, removed)'''
+        t0=time.time()
+        rootDirectory=os.path.abspath(rootDirectory)
+        known={row['path']:(row['size'], row['mtime']) for row in
+               self.db.execute("SELECT path, size, mtime FROM tntfiles WHERE path LIKE ? ESCAPE '!'", (self.likePrefix(rootDirectory),))}
+        found=set()
+        nUpdated=0
+        nUnchanged=0
+        for dirpath, dirnames, filenames in os.walk(rootDirectory):
+            for f in filenames:
+                if not f.lower().endswith('.tnt'):
+                    continue
+                path=os.path.join(dirpath, f)
+                try:
+                    st=os.stat(path)
+                except OSError:
+                    continue
+                found.add(path)
+                if known.get(path)==(st.st_size, st.st_mtime):
+                    nUnchanged+=1
+                    continue
+                self.addEntry(readTNTEntry(path))
+                nUpdated+=1
+        removed=[p for p in known if p not in found]
+        self.db.executemany('DELETE FROM tntfiles WHERE path=?', [(p,) for p in removed])
+        self.db.commit()
+        if message is not None:
+            message('Catalog scan of {}: {} new/updated, {} unchanged, {} removed in {:.2f}s'.format(rootDirectory, nUpdated, nUnchanged, len(removed), time.time()-t0))
+        return nUpdated, nUnchanged, len(removed)
+
+    def addEntry(self, entry):
+        '''insert or replace a catalog entry'''
+        names=[c[0] for c in columns]
+        self.db.execute('INSERT OR REPLACE INTO tntfiles ({}) VALUES ({})'.format(', '.join(names), ', '.join('?'*len(names))),
+                        [entry.get(n) for n in names])
+
+    def query(self, protocol=None, temperature=None, temperatureTol=0.5, FoV=None, FoVTol=0.5, sampleID=None, directory=None, where=None, args=()):
+        '''returns a list of sqlite3.Row matching all of the given conditions, temperature in C, FoV in mm'''
+        conditions=[]
+        values=[]
+        if protocol is not None:
+            conditions.append('protocol=?')
+            values.append(protocol)
+        if temperature is not None:
+            conditions.append('sampleTemperature BETWEEN ? AND ?')
+            values+=[temperature-temperatureTol, temperature+temperatureTol]
+        if FoV is not None:
+            conditions.append('FoV BETWEEN ? AND ?')
+            values+=[FoV-FoVTol, FoV+FoVTol]
+        if sampleID is not None:
+            conditions.append('sampleID=?')
+            values.append(sampleID)
+        if directory is not None:
+            conditions.append("path LIKE ? ESCAPE '!'")
+            values.append(self.likePrefix(os.path.abspath(directory)))
+        if where is not None:       #additional raw SQL condition
+            conditions.append(where)
+            values+=list(args)
+        sql='SELECT * FROM tntfiles'
+        if conditions:
+            sql+=' WHERE ' + ' AND '.join(conditions)
+        sql+=' ORDER BY startTime'
+        return self.db.execute(sql, values).fetchall()
+
+    def likePrefix(self, directory):
+        '''LIKE pattern matching every path below directory'''
+        d=directory.rstrip('\\/') + os.sep
+        return d.replace('!', '!!').replace('%', '!%').replace('_', '!_') + '%'
+
+if __name__ == '__main__':
+    parser=argparse.ArgumentParser(description='Catalog of Tecmag .tnt files')
+    parser.add_argument('database', help='SQLite catalog file')
+    sub=parser.add_subparsers(dest='command')
+    pscan=sub.add_parser('scan', help='add or refresh directory trees')
+    pscan.add_argument('directories', nargs='+')
+    pquery=sub.add_parser('query', help='list matching files')
+    pquery.add_argument('--protocol')
+    pquery.add_argument('--temperature', type=float, help='sample temperature (C)')
+    pquery.add_argument('--ttol', type=float, default=0.5, help='temperature tolerance (C)')
+    pquery.add_argument('--fov', type=float, help='field of view (mm)')
+    pquery.add_argument('--sample', help='sample ID')
+    pquery.add_argument('--directory')
+    a=parser.parse_args()
+    catalog=TNTCatalog(a.database)
+    if a.command=='scan':
+        for d in a.directories:
+            catalog.scan(d)
+    elif a.command=='query':
+        t0=time.time()
+        rows=catalog.query(protocol=a.protocol, temperature=a.temperature, temperatureTol=a.ttol, FoV=a.fov, sampleID=a.sample, directory=a.directory)
+        for r in rows:
+            print('{}\t{}\t{}\t{}'.format(r['path'], r['protocol'], r['sampleTemperature'], r['FoV']))
+        print('{} files, query time {:.1f}ms'.format(len(rows), 1000*(time.time()-t0)))
+    else:
+        parser.print_help()
+    catalog.close()
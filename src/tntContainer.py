@@ -0,0 +1,229 @@
+'''
+Created on Oct 17, 2026
+
+Chunked, optionally compressed HDF5 (.h5, .hdf5) or Zarr (.zarr) containers for Tecmag .tnt data.
+DATA is stored as a complex64 (readout, slice, phase, parameter) array chunked by default as one readout x phase plane per slice and parameter,
+so single slices can be read without touching the rest of the file.
+TMAG/TMG2 (raw structure bytes as hex), the DELAY tables and the pulse sequence parameters are stored as attributes, and the raw bytes of
+every other section (PSEQ, CMNT ...) as uint8 arrays in the sections group, so the TNTfile section and pulse sequence parsing works on
+containers.  TNTcontainer has the same interface as processTNT.TNTfile, DATA is a ChunkedArray that reads the chunks it is indexed with
+and converts to an ndarray in arithmetic; openTNT() opens either.
+
+usage:
+    python tntContainer.py scan.tnt scan.h5
+'''
+import os, sys, json
+from collections import OrderedDict
+import numpy as np
+from numpy.lib.mixins import NDArrayOperatorsMixin
+import TNTdtypes
+from processTNT import TNTfile
+try:
+    import h5py
+except:
+    h5py=None
+    print ('Can not import h5py needed for HDF5 containers, try pip install h5py')
+try:
+    import zarr
+    import numcodecs
+except:
+    zarr=None
+    print ('Can not import zarr needed for Zarr containers, try pip install zarr')
+
+containerExtensions=('.h5', '.hdf5', '.zarr')
+sequenceAttributes=('T180', 'T90', 'tau', 'GrAmp', 'Gs', 'gradPulseRiseTime', 'Grad', 'Delta', 'NutIncrement', 'TNMRComment', 'TNMRCommentRaw')
+
+def isContainer(fileName):
+    return os.path.splitext(fileName.rstrip('\\/'))[1].lower() in containerExtensions
+
+def openTNT(fileName):
+    '''open a .tnt file or a container with the TNTfile interface'''
+    if isContainer(fileName):
+        return TNTcontainer(fileName)
+    return TNTfile(fileName)
+
+def defaultChunks(shape):
+    '''one readout x phase plane for each slice and parameter'''
+    return (int(shape[0]), 1, int(shape[2]), 1)
+
+def zarrCompressor(compression, compressionLevel):
+    '''numcodecs compressor ('gzip', 'zstd', 'blosc' or 'lz4') for zarr 2 arrays, or the zarr.codecs equivalent for zarr 3'''
+    if compression is None:
+        return None
+    zarr3=hasattr(zarr, 'codecs') and hasattr(zarr.codecs, 'GzipCodec')
+    if compression=='gzip':
+        return zarr.codecs.GzipCodec(level=compressionLevel) if zarr3 else numcodecs.GZip(level=compressionLevel)
+    if compression=='zstd':
+        return zarr.codecs.ZstdCodec(level=compressionLevel) if zarr3 else numcodecs.Zstd(level=compressionLevel)
+    if compression in ('blosc', 'lz4'):
+        cname='lz4' if compression=='lz4' else 'zstd'
+        return zarr.codecs.BloscCodec(cname=cname, clevel=compressionLevel) if zarr3 else numcodecs.Blosc(cname=cname, clevel=compressionLevel)
+    raise ValueError('Unknown zarr compression {}, use gzip, zstd, blosc or lz4'.format(compression))
+
+def zarrArray(root, name, **kwargs):
+    '''create an array in a zarr 2 or zarr 3 group, compressor=None for uncompressed data'''
+    if hasattr(root, 'create_array'):       #zarr 3
+        if 'compressor' in kwargs:
+            compressor=kwargs.pop('compressor')
+            kwargs['compressors']=None if compressor is None else compressor
+        return root.create_array(name, **kwargs)
+    if 'data' in kwargs:
+        data=kwargs.pop('data')
+        a=root.create_dataset(name, shape=data.shape, dtype=data.dtype, **kwargs)
+        a[...]=data
+        return a
+    return root.create_dataset(name, **kwargs)
+
+def rawSections(tnt):
+    '''{tag: uint8 array} of the raw bytes, with their TLV headers, of every section except DATA'''
+    return {tag:np.frombuffer(tnt.read_section(tag, include_header=True), dtype=np.uint8) for tag in tnt.tnt_sections if tag!='DATA'}
+
+def exportTNT(tnt, fileName, chunks=None, compression='gzip', compressionLevel=4):
+    '''write a TNTfile (or .tnt file name) to a chunked HDF5 or Zarr container, chunks=(readout, slice, phase, parameter) chunk shape,
+    compression=None for uncompressed data, 'gzip' (both), 'lzf' (HDF5), 'zstd', 'blosc' or 'lz4' (Zarr), returns the container file name'''
+    if isinstance(tnt, str):
+        tnt=TNTfile(tnt)
+    shape=tuple(int(n) for n in tnt.DATA.shape)
+    if chunks is None:
+        chunks=defaultChunks(shape)
+    chunks=tuple(min(int(c), n) for c, n in zip(chunks, shape))
+    attrs=containerAttributes(tnt)
+    sections=rawSections(tnt)
+    if os.path.splitext(fileName.rstrip('\\/'))[1].lower()=='.zarr':
+        if zarr is None:
+            raise ImportError('zarr is required to write {}'.format(fileName))
+        root=zarr.open_group(fileName, mode='w')
+        compressor=zarrCompressor(compression, compressionLevel)
+        data=zarrArray(root, 'DATA', shape=shape, chunks=chunks, dtype=np.complex64, compressor=compressor)
+        for tag, raw in sections.items():
+            zarrArray(root, 'sections/'+tag, data=raw, chunks=(max(len(raw), 1),), compressor=compressor)
+        root.attrs.update(attrs)
+        writeChunks(tnt.DATA, data, chunks)
+    else:
+        if h5py is None:
+            raise ImportError('h5py is required to write {}'.format(fileName))
+        with h5py.File(fileName, 'w') as root:
+            opts={'compression':compression, 'compression_opts':compressionLevel} if compression=='gzip' else {'compression':compression}
+            data=root.create_dataset('DATA', shape=shape, chunks=chunks, dtype=np.complex64, **opts)
+            for tag, raw in sections.items():
+                root.create_dataset('sections/'+tag, data=raw)
+            for key, value in attrs.items():
+                root.attrs[key]=value
+            writeChunks(tnt.DATA, data, chunks)
+    return fileName
+
+def writeChunks(source, dest, chunks):
+    '''copy source to dest one block of whole chunks along the slice and parameter dimensions at a time'''
+    shape=source.shape
+    for j in range(0, shape[3], chunks[3]):
+        for i in range(0, shape[1], chunks[1]):
+            dest[:, i:i+chunks[1], :, j:j+chunks[3]]=np.asarray(source[:, i:i+chunks[1], :, j:j+chunks[3]], dtype=np.complex64)
+
+def containerAttributes(tnt):
+    '''attributes describing a TNTfile, all JSON compatible so they can be stored in either container type'''
+    attrs={'TMAG':tnt.TMAG.tobytes().hex(), 'TMG2':tnt.TMG2.tobytes().hex(),
+           'tntmagic':bytes(tnt.tntmagic).decode('latin1'), 'source':os.path.abspath(tnt.tntfilename),
+           'tnt_sections':json.dumps({k:{'offset':int(v['offset']), 'length':int(v['length']), 'bool':v['bool']} for k, v in tnt.tnt_sections.items()})}
+    try:
+        attrs['DELAY']=json.dumps({k:np.asarray(v).tolist() for k, v in tnt.DELAY.items()})
+        for a in sequenceAttributes:
+            attrs[a]=getattr(tnt, a)
+    except Exception:
+        pass        #no pulse sequence section
+    return attrs
+
+class ChunkedArray(NDArrayOperatorsMixin):
+  '''ndarray-like view of an h5py or zarr array: indexing reads only the chunks needed and returns an ndarray, arithmetic, ufuncs and
+  np.asarray read the whole array'''
+  def __init__(self, dataset):
+      self.dataset=dataset
+      self.shape=tuple(int(n) for n in dataset.shape)
+      self.dtype=np.dtype(dataset.dtype)
+      self.ndim=len(self.shape)
+      self.size=int(np.prod(self.shape))
+      self.nbytes=self.size*self.dtype.itemsize
+
+  def __len__(self):
+      return self.shape[0]
+
+  def __getitem__(self, key):
+      return np.asarray(self.dataset[key])
+
+  def __array__(self, dtype=None, copy=None):
+      a=np.asarray(self.dataset[...])
+      return a if dtype is None else a.astype(dtype, copy=False)
+
+  def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+      inputs=tuple(np.asarray(x) if isinstance(x, ChunkedArray) else x for x in inputs)
+      if 'out' in kwargs:
+          kwargs['out']=tuple(np.asarray(x) if isinstance(x, ChunkedArray) else x for x in kwargs['out'])
+      return getattr(ufunc, method)(*inputs, **kwargs)
+
+  def __repr__(self):
+      return 'ChunkedArray(shape={}, dtype={})'.format(self.shape, self.dtype)
+
+class TNTcontainer(TNTfile):
+    '''Read a container written by exportTNT with the TNTfile interface, DATA is a ChunkedArray read on indexing'''
+    def __init__(self, fileName):
+        self.tntfilename=fileName
+        if os.path.splitext(fileName.rstrip('\\/'))[1].lower()=='.zarr':
+            if zarr is None:
+                raise ImportError('zarr is required to read {}'.format(fileName))
+            self.container=zarr.open_group(fileName, mode='r')
+        else:
+            if h5py is None:
+                raise ImportError('h5py is required to read {}'.format(fileName))
+            self.container=h5py.File(fileName, 'r')
+        self.attrs=dict(self.container.attrs)
+        self.tntmagic=np.bytes_(self.attrs['tntmagic'].encode('latin1'))
+        self.tnt_sections=OrderedDict(json.loads(self.attrs['tnt_sections']))
+        self.TMAG=np.frombuffer(bytes.fromhex(self.attrs['TMAG']), TNTdtypes.TMAG, count=1)[0]
+        self.TMG2=np.frombuffer(bytes.fromhex(self.attrs['TMG2']), TNTdtypes.TMG2, count=1)[0]
+        self.DATA=ChunkedArray(self.container['DATA'])
+
+    def close(self):
+        if h5py is not None and isinstance(self.container, h5py.File):
+            self.container.close()
+
+    def hasSections(self):
+        '''True if the raw sections were stored (containers written before they were are read from the attributes)'''
+        try:
+            self.container['sections']
+            return True
+        except KeyError:
+            return False
+
+    def read_section(self, tag, include_header=False):
+        """Read the raw bytes of a single section, as TNTfile.read_section"""
+        if tag=='DATA':
+            raw=np.asarray(self.DATA, dtype='<c8').tobytes(order='F')
+            if include_header:
+                raw=np.array((b'DATA', self.tnt_sections['DATA']['bool'], len(raw)), TNTdtypes.TLV).tobytes()+raw
+            return raw
+        if tag not in self.tnt_sections or not self.hasSections():
+            raise KeyError('{} has no section {}'.format(self.tntfilename, tag))
+        raw=np.asarray(self.container['sections/'+tag]).tobytes()
+        return raw if include_header else raw[TNTdtypes.TLV.itemsize:]
+
+    def sequence_region(self):
+        """The PSEQ section and all sections after it except DATA, as TNTfile.sequence_region"""
+        start=self.tnt_sections['PSEQ']['offset']
+        after=sorted((tag for tag in self.tnt_sections if tag not in ('DATA', 'PSEQ') and self.tnt_sections[tag]['offset']>start),
+                     key=lambda tag: self.tnt_sections[tag]['offset'])
+        return self.read_section('PSEQ')+b''.join(self.read_section(tag, include_header=True) for tag in after)
+
+    def read_sequence(self):
+        """Parse the pulse sequence from the stored sections, or read the delay tables, parameters and comment from the attributes"""
+        if self.hasSections() and 'PSEQ' in self.tnt_sections:
+            return TNTfile.read_sequence(self)
+        if 'DELAY' not in self.attrs:
+            raise KeyError('{} has no pulse sequence attributes'.format(self.tntfilename))
+        self.DELAY={k:np.array(v) for k, v in json.loads(self.attrs['DELAY']).items()}
+        for a in sequenceAttributes:
+            setattr(self, a, self.attrs[a])
+
+if __name__ == '__main__':
+    if len(sys.argv)!=3:
+        print('usage: python tntContainer.py input.tnt output.h5|output.zarr')
+        sys.exit(1)
+    exportTNT(sys.argv[1], sys.argv[2])
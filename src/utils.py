@@ -68,9 +68,30 @@ def convert_si(si_num_list):
     return np.array(si_num_list)
 
 
+def interleaved_to_complex(raw, shape=None, dtype=np.complex64):
+    """Convert interleaved real/imaginary values to a complex array
+
+    raw can be any sequence of numbers, e.g. the tuple returned by the TNMR
+    getData COM call, or a buffer of floats.  It is converted once to float32
+    (float64 for complex128) and viewed as complex without a further copy,
+    then reshaped in Fortran order to shape (readout, slice, phase, param)."""
+    dtype = np.dtype(dtype)
+    float_type = np.float32 if dtype == np.complex64 else np.float64
+    if isinstance(raw, np.ndarray):
+        data = np.ascontiguousarray(raw, dtype=float_type).ravel()
+    elif isinstance(raw, (bytes, bytearray, memoryview)):
+        data = np.frombuffer(raw, dtype=float_type)
+    else:
+        data = np.fromiter(raw, dtype=float_type, count=len(raw))
+    data = data.view(dtype)
+    if shape is not None:
+        data = np.reshape(data, shape, order='F')
+    return data
+
+
 def read_pascal_string(data, number_type='<i4', encoding='ascii'):
     number_type = np.dtype(number_type)
-    length = np.fromstring(data, dtype=number_type, count=1)[0]
+    length = np.frombuffer(data, dtype=number_type, count=1)[0]
     number_size = number_type.itemsize
     text = data[number_size:number_size + length]
     if not isinstance(text, str):
@@ -78,7 +99,7 @@ def read_pascal_string(data, number_type='<i4', encoding='ascii'):
     return text
 
 
-def save_gnuplot_matrix(tnt, mat_file, max_ppm=np.Inf, min_ppm=-np.Inf,
+def save_gnuplot_matrix(tnt, mat_file, max_ppm=np.inf, min_ppm=-np.inf,
                         altDATA=None, times=None, logfile=None):
     """Save a file suitable for use as a gnuplot 'binary matrix'
 
@@ -0,0 +1,14 @@
+import os, sys
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from temperatureControl import TemperatureController
+
+def test_saturation_inside_chiller_range():
+    '''saturated overdrive steps stay strictly inside the chiller range and a single glitch does not move the setpoint'''
+    uMin, uMax, margin, start=-10.0, 60.0, 0.1, 20.0
+    for target in (0.0, 50.0):
+        c=TemperatureController(uMin=uMin+margin, uMax=uMax-margin)
+        c.setTarget(target)
+        u=c.update(0.0, start)
+        assert uMin<u<uMax
+        assert u in (uMin+margin, uMax-margin)
+        assert c.update(10.0, start+20.0)==u
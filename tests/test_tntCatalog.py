@@ -0,0 +1,13 @@
+import os, sys
+import numpy as np
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+from tntCatalog import parseCommentFields
+
+def test_wrapped_bvalues():
+    bValues=np.linspace(0, 2500, 40)
+    wrapped=np.array2string(bValues, precision=2, separator=',', suppress_small=True)
+    assert '\n' in wrapped
+    comment='Protocol=DWI\r\nb-Values(s/mm^2)={}\r\nFoV(mm)= 30.00\r\n'.format(wrapped.replace('\n', '\r\n'))
+    fields=parseCommentFields(comment)
+    assert np.allclose(np.array(fields['b-Values(s/mm^2)'].strip('[]').split(','), dtype=float), bValues, atol=0.01)     #written with precision=2
+    assert fields['Protocol']=='DWI' and fields['FoV(mm)']=='30.00'